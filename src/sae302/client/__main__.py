@@ -10,33 +10,17 @@ from sae302.client.views.connection import Connect
 from sae302.client.views.enter_chat import ChatWithServer
 from sae302.client.views.stopwatch import Stopwatch
 from sae302.client.views.upload import Upload
+from sae302.client.views.windows.benchmark import BenchmarkReportWindow
 from sae302.client.views.windows.logs import LogsWindow
+from sae302.client.views.windows.profile import ProfileWindow
+from sae302.client.views.windows.terminal import TerminalWindow
+from sae302.client.views.windows.test_report import TestReportWindow
 from sae302.commons import messages
 from sae302.commons.events import Events
 
 _log = logging.getLogger(__name__)
 
 
-class MessageWorker(QtCore.QThread):
-    """Worker thread used to receive message and send them to the main thread."""
-
-    on_broken = QtCore.pyqtSignal()
-
-    def __init__(self, app: "MainApplication", socket: SocketClient):
-        super().__init__()
-        self.app = app
-        self.socket = socket
-
-    def run(self):
-        _log.debug("Starting message worker.")
-        while True:
-            message = self.socket.receive()
-            if not message:
-                self.on_broken.emit()
-                break
-            message.emit(self.app.events)
-
-
 class ViewManager:
     """The View Manager is in charge of changing the application's current widget, when requested,
     and make public methods to easily change widgets programmatically.
@@ -45,7 +29,8 @@ class ViewManager:
     def __init__(self, app: "MainApplication"):
         self.app = app
 
-    def on_message_worker_broken(self):
+    def on_connection_broken(self):
+        self.app.disconnect_socket()
         self.setup_login_view()
         self.app.status_bar.showMessage("Déconnecté par le serveur de force", 10000)
 
@@ -56,22 +41,11 @@ class ViewManager:
     def setup_chat_view(self) -> None:
         self.app.status_bar.showMessage("Connecté", 0)
         self.app.setCentralWidget(ChatWithServer(self.app))
-        self.start_message_worker()
 
     def setup_upload_view(self) -> None:
         self.app.status_bar.showMessage("Connecté", 0)
         self.app.setCentralWidget(Upload(self.app))
-        self.start_message_worker()
-
-    def start_message_worker(self):
-        assert self.app.current_socket
-        self.message_worker = MessageWorker(self.app, self.app.current_socket)
-        self.message_worker.on_broken.connect(self.on_message_worker_broken)  # type: ignore
-        self.message_worker.start()
-        # Do NOT remove this! For some reason, view will crash if this isn't here.
-        # I just won't question it and accept the faith.
-        # Apparently not impactful for both the socket and the UI... So......? Super good I guess?
-        self.message_worker.usleep(1)
+        self.app.fetch_pending_results()
 
 
 class MainApplication(QtWidgets.QMainWindow):
@@ -82,11 +56,23 @@ class MainApplication(QtWidgets.QMainWindow):
         self.events.on_capabilities.connect(self.on_capabilities)  # type: ignore
         self.events.on_logs.connect(self.on_logs)  # type: ignore
         self.events.on_error.connect(self.on_error)  # type: ignore
+        self.events.on_job.connect(self.on_job)  # type: ignore
+        self.events.on_test_report.connect(self.on_test_report)  # type: ignore
+        self.events.on_benchmark_report.connect(self.on_benchmark_report)  # type: ignore
+        self.events.on_profile.connect(self.on_profile)  # type: ignore
+        self.events.on_output.connect(self.on_output)  # type: ignore
+        self.events.on_credit.connect(self.on_credit)  # type: ignore
+
+        # Jobs whose result has not been received yet. They are kept between two
+        # launches, so that results can be fetched back after a disconnection.
+        self.settings = QtCore.QSettings("sae302", "client")
 
         self.current_socket: SocketClient | None = None
-        self.message_worker: MessageWorker | None = None
         self.server_is_capable_of: dict[str, bool] | None = None
         self.timer_window: Stopwatch | None = None
+        self.logs_windows: list[QtWidgets.QDialog] = []
+        self.terminals: dict[str, TerminalWindow] = {}
+        """The windows of the interactive jobs that are not over, by job."""
 
         self.setWindowTitle("Send Files to Server")
 
@@ -106,13 +92,73 @@ class MainApplication(QtWidgets.QMainWindow):
     def on_logs(self, message: messages.LogsMessage):
         _log.debug("Logs received.")
         self.stop_timer()
-        LogsWindow(message.logs).exec()
+        if message.job_id:
+            self.forget_job(message.job_id)
+        if terminal := self.terminals.pop(message.job_id or "", None):
+            # The output has already been displayed as it came.
+            terminal.finish(f"Terminée, code de sortie {message.status}", message.stats)
+            return
+        self.show_window(LogsWindow(message.logs, message.stats))
+
+    def on_test_report(self, message: messages.TestReportMessage):
+        _log.debug("Test report received.")
+        self.stop_timer()
+        self.forget_job(message.job_id)
+        self.show_window(TestReportWindow(message))
+
+    def on_benchmark_report(self, message: messages.BenchmarkReportMessage):
+        _log.debug("Benchmark report received.")
+        self.stop_timer()
+        self.forget_job(message.job_id)
+        self.show_window(BenchmarkReportWindow(message))
+
+    def on_profile(self, message: messages.ProfileMessage):
+        # The logs of the job follow.
+        _log.debug("Profile received.")
+        self.show_window(ProfileWindow(message))
+
+    def open_terminal(self, job_id: str):
+        """Open the window of an interactive job, that has just been accepted by the
+        server."""
+        assert self.current_socket
+        terminal = TerminalWindow(job_id, self.current_socket)
+        self.terminals[job_id] = terminal
+        self.show_window(terminal)
+
+    def on_output(self, message: messages.OutputMessage):
+        if terminal := self.terminals.get(message.job_id):
+            terminal.on_output(message)
+
+    def on_credit(self, message: messages.CreditMessage):
+        if terminal := self.terminals.get(message.job_id):
+            terminal.on_credit(message)
+
+    def show_window(self, window: QtWidgets.QDialog):
+        # Not modal, as the results of multiple detached jobs may be received at once.
+        window.finished.connect(lambda: self.logs_windows.remove(window))  # type: ignore
+        self.logs_windows.append(window)
+        window.show()
+
+    def on_job(self, message: messages.JobMessage):
+        _log.debug("Job %s is %s.", message.job_id, message.state)
+        if message.state == "CANCELLED":
+            self.stop_timer()
+            self.forget_job(message.job_id)
+            if terminal := self.terminals.pop(message.job_id, None):
+                terminal.finish("Annulée")
+        else:
+            self.remember_job(message.job_id)
+        self.status_bar.showMessage(f"Tâche {message.job_id[:8]} : {message.state}", 0)
 
     def on_capabilities(self, message: messages.CapabilitiesMessage):
         self.server_is_capable_of = message.capabilities
 
     def on_error(self, message: messages.ErrorMessage):
         self.stop_timer()
+        if message.job_id:
+            self.forget_job(message.job_id)
+            if terminal := self.terminals.pop(message.job_id, None):
+                terminal.finish("Échouée")
         if message.gravity == "ERROR":
             method = QtWidgets.QMessageBox.critical
         elif message.gravity == "WARNING":
@@ -121,6 +167,29 @@ class MainApplication(QtWidgets.QMainWindow):
             method = QtWidgets.QMessageBox.information
         method(None, "Error received from server", message.message)
 
+    @property
+    def pending_jobs(self) -> list[str]:
+        """The identifiers of the jobs whose result has not been received yet."""
+        return self.settings.value("pending_jobs", [], list)
+
+    def remember_job(self, job_id: str):
+        if job_id not in (pending := self.pending_jobs):
+            self.settings.setValue("pending_jobs", [*pending, job_id])
+
+    def forget_job(self, job_id: str):
+        pending = [
+            pending_id for pending_id in self.pending_jobs if pending_id != job_id
+        ]
+        self.settings.setValue("pending_jobs", pending)
+
+    def fetch_pending_results(self):
+        """Ask the server for the results of jobs submitted during a previous
+        connection."""
+        assert self.current_socket
+        for job_id in self.pending_jobs:
+            _log.debug("Fetching result of job %s.", job_id)
+            self.current_socket.send(messages.ResultMessage.create_message(job_id))
+
     def start_timer(self):
         self.timer_window = Stopwatch()
         self.timer_window.show()
@@ -131,7 +200,8 @@ class MainApplication(QtWidgets.QMainWindow):
             self.timer_window.stop()
 
     def connect_socket(self, host: str, port: int):
-        sock = SocketClient(host, port)
+        sock = SocketClient(host, port, self.events)
+        sock.on_broken.connect(self.view.on_connection_broken)  # type: ignore
         self.status_bar.showMessage("Connecté", 0)
         self.current_socket = sock
 
@@ -146,8 +216,6 @@ class MainApplication(QtWidgets.QMainWindow):
             If True, the current view of the main window will be replaced
             by the connection view.
         """
-        if self.message_worker:
-            self.message_worker.terminate()
         if self.current_socket:
             self.current_socket.close()
             self.current_socket = None
@@ -1,43 +1,205 @@
 from __future__ import annotations
 
+import collections
 import contextlib
 import logging
+import pathlib
 import socket
+import typing
 
-from sae302.commons.messages import Message, MessageBuffer
+from PyQt6 import QtCore
+
+from sae302.commons.messages import (
+    RECV_SIZE,
+    BlobMessage,
+    DeltaMessage,
+    Message,
+    MessageBuffer,
+    MessageWriter,
+    MissingMessage,
+    OfferMessage,
+    PackedMessage,
+    blob_hash,
+)
+
+if typing.TYPE_CHECKING:
+    from sae302.commons.events import Events
 
 _log = logging.getLogger(__name__)
 
 
-class SocketClient:
-    def __init__(self, host: str, port: int):
+class SocketClient(QtCore.QObject):
+    """The connection to the server.
+
+    The socket is non-blocking, and is watched by the Qt event loop: received messages
+    are parsed as data comes in and emitted through the application's events, while
+    messages to send are queued and written whenever the socket can accept more data.
+    Nothing ever blocks the UI.
+
+    Parameters
+    ----------
+    host : str
+        The address of the server.
+    port : int
+        The port of the server.
+    events : Events
+        The events received messages are emitted in.
+    """
+
+    on_broken = QtCore.pyqtSignal()
+    """Emitted when the connection has been closed by the server, or is broken."""
+    on_sent = QtCore.pyqtSignal(int)
+    """Emitted with the amount of bytes written in the socket, every time some are."""
+    on_upload = QtCore.pyqtSignal(int, int)
+    """Emitted with the size of a message sent with :py:meth:`send_by_hash` and of the
+    files uploaded with it, then with the amount of bytes that were waiting to be sent
+    before them."""
+
+    def __init__(self, host: str, port: int, events: "Events"):
+        super().__init__()
+        self.events = events
         self.socket: socket.socket = socket.create_connection((host, port))
+        self.socket.setblocking(False)
+
+        self._buffer = MessageBuffer()
+        self._writer = MessageWriter()
+        self._offers: collections.deque[
+            tuple[dict[str, pathlib.Path], PackedMessage]
+        ] = collections.deque()
+        """The files offered to the server, and the message giving them, in the order
+        they were offered."""
+        self._versions: dict[pathlib.Path, str] = {}
+        """The hash of the last version of each file offered to the server."""
+
+        self._read_notifier = QtCore.QSocketNotifier(
+            self.socket.fileno(), QtCore.QSocketNotifier.Type.Read, self
+        )
+        self._read_notifier.activated.connect(self._on_readable)  # type: ignore
+        self._write_notifier = QtCore.QSocketNotifier(
+            self.socket.fileno(), QtCore.QSocketNotifier.Type.Write, self
+        )
+        self._write_notifier.setEnabled(False)
+        self._write_notifier.activated.connect(self._on_writable)  # type: ignore
+
+    def send(self, message: str | PackedMessage):
+        """Queue a message to be sent to the server. Plain strings are sent as a
+        :py:class:`Message`, while already packed messages (such as files) are sent as
+        they are.
+        """
+        if isinstance(message, str):
+            _log.debug("Sending message: %s", message)
+            message = Message.create_message(message)
+        self._writer.push(message)
+        self._on_writable()
 
-    def send(self, message: str):
-        _log.debug("Sending message: %s", message)
-        self.socket.send(Message.create_message(message).encode())
+    def send_by_hash(self, files: list[pathlib.Path], message: PackedMessage):
+        """Send a message giving files by hash, such as a
+        :py:class:`sae302.commons.messages.FileMessage` created with ``by_hash``.
 
-    def receive(self):
-        message_buffer = MessageBuffer()
+        The hashes of the files are offered to the server first. Once it has answered,
+        the files it does not have are uploaded, then the message is sent. Files that
+        were offered before are uploaded as their differences with their last version,
+        when the server still has it.
+        """
+        offered = {blob_hash(file): file for file in files}
+        bases: dict[str, str] = {}
+        for blob, file in offered.items():
+            base = self._versions.get(file)
+            if base and base != blob:
+                bases[blob] = base
+            self._versions[file] = blob
+        self._offers.append((offered, message))
+        self.send(OfferMessage.create_message(list(offered), bases))
 
+    def _upload_missing(self, missing: MissingMessage):
+        if not self._offers:
+            _log.error("Received missing files that were not offered.")
+            return
+        offered, message = self._offers.popleft()
+        uploads: list[PackedMessage] = []
+        for blob in missing.hashes:
+            if blob not in offered:
+                continue
+            upload = BlobMessage.create_message(offered[blob])
+            if blob in missing.signatures:
+                delta = DeltaMessage.create_message(
+                    offered[blob], missing.signatures[blob]
+                )
+                # Little of the file may be left from its last version.
+                if len(delta) < len(upload):
+                    upload.discard()
+                    upload = delta
+            uploads.append(upload)
+        self.on_upload.emit(sum(map(len, uploads)) + len(message), self.pending_bytes)
+        _log.debug("Uploading %s of %s file(s).", len(uploads), len(offered))
+        for upload in uploads:
+            self._writer.push(upload)
+        self.send(message)
+
+    @property
+    def pending_bytes(self) -> int:
+        """Amount of bytes waiting to be sent."""
+        return self._writer.pending_bytes
+
+    def _on_writable(self):
+        try:
+            written = self._writer.flush(self.socket)
+        except OSError as e:
+            _log.debug("Could not send data: %s", e)
+            self._broken()
+            return
+        if written:
+            self.on_sent.emit(written)
+        # Only watch for the socket to be writable when there is something left to
+        # write.
+        self._write_notifier.setEnabled(bool(self._writer))
+
+    def _on_readable(self):
         while True:
             try:
-                message = self.socket.recv(1024)
+                data = self.socket.recv(RECV_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return
             except OSError:
-                message = None
-            if not message:
-                # When no message has been received, this generally mean that the client has
-                # willingly disconnected. We can break the loop and end the thread.
-                break
-            message_buffer.push(message)
-
-            if message_buffer.is_complete:
-                message = message_buffer.get_message(self.socket)
+                data = b""
+            if not data:
+                # When no message has been received, this generally mean that the server
+                # has closed the connection.
+                self._broken()
+                return
+
+            try:
+                self._receive(data)
+            except ValueError as e:
+                _log.error("Received an invalid message: %s", e)
+                self._broken()
+                return
+
+    def _receive(self, data: bytes):
+        # A single read may hold the end of a message and the start of the next one.
+        while data:
+            data = self._buffer.push(data)
+
+            if self._buffer.is_complete:
+                message = self._buffer.get_message(self.socket)
                 # New buffer
-                message_buffer = MessageBuffer()
-                return message
+                self._buffer = MessageBuffer()
+                if isinstance(message, MissingMessage):
+                    self._upload_missing(message)
+                message.emit(self.events)
+
+    def _broken(self):
+        self.close()
+        self.on_broken.emit()
 
     def close(self):
+        self._read_notifier.setEnabled(False)
+        self._write_notifier.setEnabled(False)
+        self._writer.clear()
+        while self._offers:
+            self._offers.popleft()[1].discard()
+        if self.socket.fileno() == -1:
+            return
         with contextlib.suppress(OSError):
             self.socket.shutdown(socket.SHUT_RDWR)
         self.socket.close()
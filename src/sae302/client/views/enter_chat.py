@@ -5,6 +5,7 @@ import typing
 
 from PyQt6 import QtWidgets
 
+from sae302.client.views.log_view import LogView
 from sae302.commons.messages import RawMessage
 
 if typing.TYPE_CHECKING:
@@ -25,8 +26,7 @@ class ChatWithServer(QtWidgets.QWidget):
 
         layout = QtWidgets.QGridLayout()
 
-        self.text_box_ui = QtWidgets.QTextEdit()
-        self.text_box_ui.setReadOnly(True)
+        self.text_box_ui = LogView()
         layout.addWidget(self.text_box_ui, 0, 0)
 
         self.send_msg_ui = QtWidgets.QLineEdit()
@@ -60,5 +60,4 @@ class ChatWithServer(QtWidgets.QWidget):
         message : str
             The message that has been received by the client.
         """
-        current_content = self.text_box_ui.toPlainText()
-        self.text_box_ui.setText(f"{current_content}\n{str(message)}")
+        self.text_box_ui.append(f"{str(message)}\n")
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import array
+import collections
+import itertools
+import logging
+import os
+import tempfile
+import typing
+
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_MAX_LINES = 50_000
+"""Number of lines kept in memory by default. Older lines are spilled to the disk."""
+
+
+class LinesModel(QtCore.QAbstractListModel):
+    """An append-only list of lines, used to display logs without ever copying them as a
+    whole.
+
+    Only the last ``max_lines`` lines are kept in memory. Older lines are either spilled
+    to a temporary file, from which they are read back only when displayed, or dropped.
+
+    Parameters
+    ----------
+    max_lines : int
+        The number of lines to keep in memory.
+    spill_to_disk : bool, default to :py:obj:`True`
+        If True, lines going out of memory are written to a temporary file. Otherwise,
+        they are lost.
+    """
+
+    def __init__(
+        self,
+        max_lines: int = DEFAULT_MAX_LINES,
+        spill_to_disk: bool = True,
+        parent: QtCore.QObject | None = None,
+    ):
+        super().__init__(parent)
+        self.max_lines = max_lines
+        self.spill_to_disk = spill_to_disk
+
+        self._lines: collections.deque[str] = collections.deque()
+        self._partial = ""
+        """The last line, as long as it is not terminated by a line break."""
+
+        self._spill: typing.IO[bytes] | None = None
+        self._spill_offsets = array.array("Q")
+        self._spill_end = 0
+
+        # Views call rowCount() a lot, it must stay cheap.
+        self._row_count = 0
+
+    @property
+    def spilled_count(self) -> int:
+        return len(self._spill_offsets)
+
+    def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return self._row_count
+
+    def _update_row_count(self) -> None:
+        self._row_count = (
+            self.spilled_count + len(self._lines) + (1 if self._partial else 0)
+        )
+
+    def data(
+        self,
+        index: QtCore.QModelIndex,
+        role: int = QtCore.Qt.ItemDataRole.DisplayRole,
+    ) -> typing.Any:
+        if role != QtCore.Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        return self.line(index.row())
+
+    def line(self, row: int) -> str:
+        """Obtain a line, reading it back from the disk if it has been spilled."""
+        if row < self.spilled_count:
+            assert self._spill
+            self._spill.seek(self._spill_offsets[row])
+            return self._spill.readline().decode(errors="replace").rstrip("\n")
+        row -= self.spilled_count
+        if row < len(self._lines):
+            return self._lines[row]
+        return self._partial
+
+    def append(self, text: str) -> None:
+        """Append text at the end of the model. It does not have to end with a line
+        break."""
+        if not text:
+            return
+
+        lines = (self._partial + text).split("\n")
+        if self._partial:
+            row = self.rowCount() - 1
+            self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+            self._partial = ""
+            self._update_row_count()
+            self.endRemoveRows()
+
+        partial = lines.pop()
+        first = self.rowCount()
+        last = first + len(lines) + (1 if partial else 0) - 1
+        if last >= first:
+            self.beginInsertRows(QtCore.QModelIndex(), first, last)
+            self._lines.extend(lines)
+            self._partial = partial
+            self._update_row_count()
+            self.endInsertRows()
+
+        self._enforce_limit()
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self._lines.clear()
+        self._partial = ""
+        self._spill_offsets = array.array("Q")
+        self._spill_end = 0
+        if self._spill:
+            self._spill.close()
+            self._spill = None
+        self._update_row_count()
+        self.endResetModel()
+
+    def find(self, text: str, start: int = 0) -> int | None:
+        """Find the first line containing the given text, starting at the given row.
+        The search wraps around once the end is reached.
+
+        Returns
+        -------
+        int | None
+            The row of the line, or None if no line contains the text.
+        """
+        if not text:
+            return None
+        count = self.rowCount()
+        for row in self._rows_from(start % count if count else 0):
+            if text in self.line(row):
+                return row
+        return None
+
+    def _rows_from(self, start: int) -> typing.Iterator[int]:
+        count = self.rowCount()
+        yield from range(start, count)
+        yield from range(0, start)
+
+    def _enforce_limit(self) -> None:
+        overflow = len(self._lines) - self.max_lines
+        if overflow <= 0:
+            return
+
+        if not self.spill_to_disk:
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._lines.popleft()
+            self._update_row_count()
+            self.endRemoveRows()
+            return
+
+        # Rows are not changing, they are just moved to the disk.
+        old_lines = [self._lines.popleft() for _ in range(overflow)]
+        if not self._spill:
+            self._spill = tempfile.TemporaryFile(prefix="sae302-logs-")
+            _log.debug("Spilling logs to the disk.")
+        data = [f"{line}\n".encode() for line in old_lines]
+        offsets = itertools.accumulate(map(len, data), initial=self._spill_end)
+        self._spill_offsets.extend(itertools.islice(offsets, len(data)))
+        self._spill_end += sum(map(len, data))
+        self._spill.seek(0, os.SEEK_END)
+        self._spill.write(b"".join(data))
+
+
+class LogView(QtWidgets.QWidget):
+    """A read-only view of logs, that only renders the lines that are visible, and can
+    be searched.
+
+    Parameters
+    ----------
+    max_lines : int
+        The number of lines kept in memory. See :py:class:`LinesModel`.
+    spill_to_disk : bool
+        Whether older lines are spilled to the disk, or dropped.
+    """
+
+    def __init__(
+        self,
+        max_lines: int = DEFAULT_MAX_LINES,
+        spill_to_disk: bool = True,
+        *,
+        parent: QtWidgets.QWidget | None = None,
+    ):
+        super().__init__(parent=parent)
+
+        self.model = LinesModel(max_lines, spill_to_disk, parent=self)
+
+        layout = QtWidgets.QGridLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.search_ui = QtWidgets.QLineEdit()
+        self.search_ui.setPlaceholderText("Rechercher")
+        self.search_ui.returnPressed.connect(self.on_btn_search_clicked)  # type: ignore
+        layout.addWidget(self.search_ui, 0, 0)
+
+        search_button = QtWidgets.QPushButton("Suivant")
+        search_button.clicked.connect(self.on_btn_search_clicked)  # type: ignore
+        layout.addWidget(search_button, 0, 1)
+
+        self.lines_ui = QtWidgets.QListView()
+        self.lines_ui.setModel(self.model)
+        # Every line has the same height, so that only visible lines have to be laid
+        # out.
+        self.lines_ui.setUniformItemSizes(True)
+        # Lay out lines in batches, so that huge logs do not freeze the UI once
+        # displayed.
+        self.lines_ui.setLayoutMode(QtWidgets.QListView.LayoutMode.Batched)
+        self.lines_ui.setFont(
+            QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.SystemFont.FixedFont)
+        )
+        self.lines_ui.setEditTriggers(
+            QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers
+        )
+        self.lines_ui.setSelectionMode(
+            QtWidgets.QAbstractItemView.SelectionMode.ExtendedSelection
+        )
+        layout.addWidget(self.lines_ui, 1, 0, 1, 2)
+
+        self.setLayout(layout)
+
+    def append(self, text: str) -> None:
+        """Append text at the end of the view. The view follows the new lines, unless
+        the user has scrolled up."""
+        scrollbar = self.lines_ui.verticalScrollBar()
+        assert scrollbar
+        follow = scrollbar.value() == scrollbar.maximum()
+        self.model.append(text)
+        if follow:
+            self.lines_ui.scrollToBottom()
+
+    def clear(self) -> None:
+        self.model.clear()
+
+    def on_btn_search_clicked(self):
+        current = self.lines_ui.currentIndex()
+        start = current.row() + 1 if current.isValid() else 0
+        row = self.model.find(self.search_ui.text(), start)
+        if row is None:
+            QtWidgets.QApplication.beep()
+            return
+        index = self.model.index(row)
+        self.lines_ui.setCurrentIndex(index)
+        self.lines_ui.scrollTo(
+            index, QtWidgets.QAbstractItemView.ScrollHint.PositionAtCenter
+        )
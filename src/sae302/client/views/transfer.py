@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import time
+
+from PyQt6 import QtWidgets
+
+REFRESH_INTERVAL = 0.1
+"""Minimum time, in seconds, between two refreshes of the displayed rate."""
+
+
+def format_size(size: float) -> str:
+    """Format an amount of bytes to be displayed."""
+    if size < 1024:
+        return f"{size:.0f} o"
+    for unit in ("Kio", "Mio", "Gio"):
+        size /= 1024
+        if size < 1024:
+            break
+    return f"{size:.1f} {unit}"
+
+
+class TransferProgress(QtWidgets.QWidget):
+    """Displays the progress of an upload: a progress bar, the transfer rate and the
+    estimated remaining time.
+
+    The widget is fed with the amount of bytes written in the socket, as reported by
+    :py:attr:`sae302.client.socket_client.SocketClient.on_sent`.
+    """
+
+    def __init__(self, *, parent: QtWidgets.QWidget | None = None):
+        super().__init__(parent=parent)
+
+        self.total = 0
+        self.sent = 0
+        self._skip = 0
+        """Bytes of messages queued before the upload, that must not be counted."""
+        self._started_at = 0.0
+        self._refreshed_at = 0.0
+
+        layout = QtWidgets.QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.bar = QtWidgets.QProgressBar()
+        self.bar.setRange(0, 1000)
+        layout.addWidget(self.bar)
+
+        self.details = QtWidgets.QLabel()
+        layout.addWidget(self.details)
+
+        self.setLayout(layout)
+        self.hide()
+
+    @property
+    def is_done(self) -> bool:
+        return self.sent >= self.total
+
+    def start(self, total: int, skip: int = 0) -> None:
+        """Start following a new upload.
+
+        Parameters
+        ----------
+        total : int
+            The size of the message being uploaded, in bytes.
+        skip : int
+            The amount of bytes that were still waiting to be sent before the upload
+            started.
+        """
+        self.total = total
+        self.sent = 0
+        self._skip = skip
+        self._started_at = self._refreshed_at = time.monotonic()
+        self.bar.setValue(0)
+        self.details.setText("Envoi...")
+        self.show()
+
+    def advance(self, written: int) -> None:
+        """Account for bytes written in the socket."""
+        if self.is_done:
+            return
+        skipped = min(self._skip, written)
+        self._skip -= skipped
+        self.sent = min(self.total, self.sent + written - skipped)
+
+        now = time.monotonic()
+        if not self.is_done and now - self._refreshed_at < REFRESH_INTERVAL:
+            return
+        self._refreshed_at = now
+        self.refresh(now)
+
+    def refresh(self, now: float) -> None:
+        self.bar.setValue(int(self.sent * 1000 / self.total) if self.total else 1000)
+        elapsed = max(now - self._started_at, 1e-6)
+        rate = self.sent / elapsed
+        sent, total = format_size(self.sent), format_size(self.total)
+        text = f"{sent} / {total} — {format_size(rate)}/s"
+        if self.is_done:
+            text += f" — envoyé en {elapsed:.1f} s"
+        elif rate:
+            text += f" — reste {(self.total - self.sent) / rate:.0f} s"
+        self.details.setText(text)
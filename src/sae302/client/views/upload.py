@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import json
 import logging
 import pathlib
 import typing
 
-from PyQt6 import QtWidgets, QtCore
+from PyQt6 import QtCore, QtWidgets
 
+from sae302.client.views.transfer import TransferProgress
+from sae302.client.views.windows.benchmark import BenchmarkDialog
 from sae302.commons import messages
 
 if typing.TYPE_CHECKING:
@@ -13,6 +16,26 @@ if typing.TYPE_CHECKING:
 
 _log = logging.getLogger(__name__)
 
+JOB_STATES = {
+    "QUEUED": "En file d'attente",
+    "COMPILING": "Compilation",
+    "BUILT": "Compilée, en attente d'exécution",
+    "RUNNING": "Exécution",
+    "DONE": "Terminée",
+    "FAILED": "Échouée",
+    "CANCELLED": "Annulée",
+}
+"""Text displayed for each state of a job."""
+
+BUILD_PROFILES = {
+    None: "Compilation par défaut",
+    "debug": "Débogage (-O0 -g)",
+    "release": "Optimisée (-O2)",
+    "native": "Optimisée pour le serveur (-O3 -march=native)",
+    "sanitize": "Avec sanitizers (adresses et comportements indéfinis)",
+}
+"""Build profiles that can be chosen, as known by default by the server."""
+
 
 class Upload(QtWidgets.QWidget):
     def __init__(
@@ -25,6 +48,13 @@ class Upload(QtWidgets.QWidget):
         self.app = app
 
         self.file: pathlib.Path | None = None
+        self.current_job: str | None = None
+        """The job of the last sent file, as long as it is not over."""
+        self._known_jobs: list[str] | None = None
+        """The jobs known before the last file was sent, while its job is not known
+        yet."""
+        self._interactive = False
+        """Whether the last sent file is ran interactively."""
 
         layout = QtWidgets.QGridLayout()
 
@@ -34,24 +64,101 @@ class Upload(QtWidgets.QWidget):
 
         self.selected_file_text = QtWidgets.QLabel()
         self.selected_file_text.hide()
-        layout.addWidget(self.selected_file_text, 2, 0, alignment=QtCore.Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(
+            self.selected_file_text, 2, 0, alignment=QtCore.Qt.AlignmentFlag.AlignCenter
+        )
+
+        self.build_profile_box = QtWidgets.QComboBox()
+        self.build_profile_box.setToolTip(
+            "Options de compilation, pour le C et le C++."
+        )
+        for name, text in BUILD_PROFILES.items():
+            self.build_profile_box.addItem(text, name)
+        layout.addWidget(self.build_profile_box, 3, 0)
 
         self.send_to_server_button = QtWidgets.QPushButton("Envoyer le fichier")
         self.send_to_server_button.setDisabled(True)
         self.send_to_server_button.clicked.connect(self.on_btn_send_to_server_clicked)  # type: ignore
-        layout.addWidget(self.send_to_server_button, 3, 0)
+        layout.addWidget(self.send_to_server_button, 4, 0)
+
+        self.run_tests_button = QtWidgets.QPushButton("Tester avec un fichier de cas")
+        self.run_tests_button.setToolTip(
+            "Un fichier JSON listant les cas : entrée (stdin), arguments (args) et"
+            " sortie attendue (expected)."
+        )
+        self.run_tests_button.setDisabled(True)
+        self.run_tests_button.clicked.connect(self.on_btn_run_tests_clicked)  # type: ignore
+        layout.addWidget(self.run_tests_button, 5, 0)
+
+        self.benchmark_button = QtWidgets.QPushButton("Mesurer les performances")
+        self.benchmark_button.setToolTip(
+            "Exécute le fichier plusieurs fois, et donne des statistiques sur sa durée."
+        )
+        self.benchmark_button.setDisabled(True)
+        self.benchmark_button.clicked.connect(self.on_btn_benchmark_clicked)  # type: ignore
+        layout.addWidget(self.benchmark_button, 6, 0)
+
+        self.detached_checkbox = QtWidgets.QCheckBox("Exécution détachée")
+        self.detached_checkbox.setToolTip(
+            "Le résultat n'est pas attendu, il pourra être récupéré plus tard."
+        )
+        layout.addWidget(self.detached_checkbox, 7, 0)
+
+        self.interactive_checkbox = QtWidgets.QCheckBox("Exécution interactive")
+        self.interactive_checkbox.setToolTip(
+            "La sortie du programme est affichée au fur et à mesure, et son entrée"
+            " peut être saisie pendant qu'il s'exécute."
+        )
+        layout.addWidget(self.interactive_checkbox, 8, 0)
+
+        self.profiled_checkbox = QtWidgets.QCheckBox("Profiler l'exécution")
+        self.profiled_checkbox.setToolTip(
+            "Le serveur indique les fonctions dans lesquelles le programme passe le"
+            " plus de temps."
+        )
+        layout.addWidget(self.profiled_checkbox, 9, 0)
+
+        self.transfer_progress = TransferProgress()
+        layout.addWidget(self.transfer_progress, 10, 0)
+
+        self.job_state_text = QtWidgets.QLabel()
+        self.job_state_text.hide()
+        layout.addWidget(
+            self.job_state_text, 11, 0, alignment=QtCore.Qt.AlignmentFlag.AlignCenter
+        )
+
+        self.cancel_button = QtWidgets.QPushButton("Annuler l'exécution")
+        self.cancel_button.hide()
+        self.cancel_button.clicked.connect(self.on_btn_cancel_clicked)  # type: ignore
+        layout.addWidget(self.cancel_button, 12, 0)
+
+        self.fetch_results_button = QtWidgets.QPushButton(
+            "Récupérer les résultats en attente"
+        )
+        self.fetch_results_button.clicked.connect(self.on_btn_fetch_results_clicked)  # type: ignore
+        layout.addWidget(self.fetch_results_button, 13, 0)
 
         self.open_logs_button = QtWidgets.QPushButton("Ouvrir les logs d'exécution")
         self.open_logs_button.hide()
-        layout.addWidget(self.open_logs_button, 4, 0)
+        layout.addWidget(self.open_logs_button, 14, 0)
 
         self.disconnect_button = QtWidgets.QPushButton("Déconnecter")
         self.disconnect_button.clicked.connect(self.on_btn_disconnect_clicked)  # type: ignore
-        layout.addWidget(self.disconnect_button, 5, 0)
+        layout.addWidget(self.disconnect_button, 15, 0)
 
         self.setLayout(layout)
         self.app.resize(200, 100)
 
+        self.app.events.on_job.connect(self.on_job)  # type: ignore
+        self.app.events.on_logs.connect(self.on_job_result)  # type: ignore
+        self.app.events.on_error.connect(self.on_job_result)  # type: ignore
+        self.app.events.on_test_report.connect(self.on_job_result)  # type: ignore
+        self.app.events.on_benchmark_report.connect(self.on_job_result)  # type: ignore
+        if self.app.current_socket:
+            self.app.current_socket.on_sent.connect(self.transfer_progress.advance)  # type: ignore
+            # Only the files the server does not have yet are uploaded.
+            self.app.current_socket.on_upload.connect(self.transfer_progress.start)  # type: ignore
+
     def on_btn_select_file_clicked(self):
         """Method to call when the user want to pick which file to send to the server."""
         file = QtWidgets.QFileDialog().getOpenFileUrl(  # type: ignore
@@ -64,18 +171,153 @@ class Upload(QtWidgets.QWidget):
             self.selected_file_text.setText(f"Fichier : {self.file.name}")
             self.selected_file_text.show()
             self.send_to_server_button.setDisabled(False)
+            self.run_tests_button.setDisabled(False)
+            self.benchmark_button.setDisabled(False)
         else:
             self.selected_file_text.hide()
             self.send_to_server_button.setDisabled(True)
+            self.run_tests_button.setDisabled(True)
+            self.benchmark_button.setDisabled(True)
 
     def on_btn_send_to_server_clicked(self):
         assert self.app.current_socket
+        self._interactive = self.interactive_checkbox.isChecked()
+        profiled = self.profiled_checkbox.isChecked() and not self._interactive
+        # Interactive jobs cannot be detached, someone is in front of them. The profile
+        # of a job is only sent to the connection waiting for it.
+        detached = self.detached_checkbox.isChecked() and not (
+            self._interactive or profiled
+        )
         if self.file:
-            self.app.current_socket.send(
-                messages.FileMessage.create_message(self.file, "auto")
+            message = messages.FileMessage.create_message(
+                self.file,
+                "auto",
+                build_profile=self.build_profile_box.currentData(),
+                detached=detached,
+                interactive=self._interactive,
+                profiled=profiled,
+                by_hash=True,
             )
+            self._known_jobs = self.app.pending_jobs
+            self.show_job_state(None)
+            self.app.current_socket.send_by_hash([self.file], message)
+        if not (detached or self._interactive):
+            self.app.start_timer()
+
+    def on_btn_run_tests_clicked(self):
+        """Send the selected file with test cases read from a JSON file, to be checked
+        by the server."""
+        assert self.app.current_socket
+        file = QtWidgets.QFileDialog().getOpenFileUrl(  # type: ignore
+            self,
+            "Choisir le fichier de cas",
+            filter="Test cases (*.json)",
+        )
+        if not (self.file and file and file[0]):
+            return
+        try:
+            with open(file[0].toLocalFile(), encoding="utf-8") as cases_file:
+                cases = messages.parse_test_cases(json.load(cases_file))
+        except (OSError, ValueError) as e:
+            QtWidgets.QMessageBox.critical(self, "Fichier de cas invalide", str(e))
+            return
+
+        message = messages.TestSuiteMessage.create_message(
+            self.file,
+            cases,
+            build_profile=self.build_profile_box.currentData(),
+            by_hash=True,
+        )
+        self._known_jobs = self.app.pending_jobs
+        self._interactive = False
+        self.show_job_state(None)
+        self.app.current_socket.send_by_hash([self.file], message)
+        self.app.start_timer()
+
+    def on_btn_benchmark_clicked(self):
+        """Send the selected file to be ran several times, once the user has chosen
+        how."""
+        assert self.app.current_socket
+        dialog = BenchmarkDialog(self)
+        if not (self.file and dialog.exec()):
+            return
+
+        message = messages.BenchmarkMessage.create_message(
+            self.file,
+            runs=dialog.runs_box.value(),
+            warmups=dialog.warmups_box.value(),
+            stdin=dialog.stdin_box.toPlainText(),
+            baseline=dialog.baseline,
+            build_profile=self.build_profile_box.currentData(),
+            by_hash=True,
+        )
+        self._known_jobs = self.app.pending_jobs
+        self._interactive = False
+        self.show_job_state(None)
+        files = [self.file, dialog.baseline] if dialog.baseline else [self.file]
+        self.app.current_socket.send_by_hash(files, message)
         self.app.start_timer()
 
+    def on_job(self, message: messages.JobMessage):
+        if self.current_job is None and self._known_jobs is not None:
+            # The first new job is the one of the file that has just been sent.
+            if message.job_id in self._known_jobs:
+                return
+            self.current_job = message.job_id
+            self._known_jobs = None
+            if self._interactive:
+                self.app.open_terminal(message.job_id)
+        if message.job_id != self.current_job:
+            return
+
+        if message.state in ("DONE", "FAILED", "CANCELLED"):
+            self.current_job = None
+        self.show_job_state(message.state, message.queue_position)
+
+    def on_job_result(
+        self,
+        message: (
+            messages.LogsMessage
+            | messages.ErrorMessage
+            | messages.TestReportMessage
+            | messages.BenchmarkReportMessage
+        ),
+    ):
+        if message.job_id and message.job_id == self.current_job:
+            self.current_job = None
+            self.show_job_state(
+                "FAILED" if isinstance(message, messages.ErrorMessage) else "DONE"
+            )
+
+    def show_job_state(self, state: str | None, queue_position: int | None = None):
+        if state is None:
+            self.job_state_text.hide()
+            self.cancel_button.hide()
+            return
+        text = JOB_STATES.get(state, state)
+        if queue_position is not None:
+            text += f" (position {queue_position})"
+        self.job_state_text.setText(text)
+        self.job_state_text.show()
+        self.cancel_button.setVisible(self.current_job is not None)
+        self.cancel_button.setEnabled(True)
+
+    def on_btn_cancel_clicked(self):
+        if not (self.current_job and self.app.current_socket):
+            return
+        self.app.current_socket.send(
+            messages.CancelMessage.create_message(self.current_job)
+        )
+        self.cancel_button.setDisabled(True)
+
+    def on_btn_fetch_results_clicked(self):
+        """Ask the server for the results of every job that has not been answered
+        yet."""
+        if not self.app.pending_jobs:
+            self.app.status_bar.showMessage("Aucune tâche en attente", 5000)
+            return
+        self.app.fetch_pending_results()
+
     def on_btn_disconnect_clicked(self):
         self.app.disconnect_socket()
         self.app.view.setup_login_view()
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import pathlib
+
+from PyQt6 import QtWidgets
+
+from sae302.client.views.windows.logs import format_stat
+from sae302.commons import messages
+
+SUMMARY_LABELS = {
+    "min": "Minimum",
+    "median": "Médiane",
+    "mean": "Moyenne",
+    "stddev": "Écart type",
+    "outliers": "Valeurs aberrantes",
+}
+"""Text displayed for each statistic of a benchmark."""
+
+
+class BenchmarkDialog(QtWidgets.QDialog):
+    """Asks how a file must be measured: the number of runs, its input, and another
+    version of the file to compare it with."""
+
+    def __init__(self, parent: QtWidgets.QWidget | None = None):
+        super().__init__(parent)
+
+        self.baseline: pathlib.Path | None = None
+        self.setWindowTitle("Benchmark")
+
+        layout = QtWidgets.QFormLayout()
+
+        self.runs_box = QtWidgets.QSpinBox()
+        self.runs_box.setRange(1, messages.MAX_BENCHMARK_RUNS)
+        self.runs_box.setValue(messages.DEFAULT_BENCHMARK_RUNS)
+        layout.addRow("Exécutions mesurées :", self.runs_box)
+
+        self.warmups_box = QtWidgets.QSpinBox()
+        self.warmups_box.setRange(0, messages.MAX_BENCHMARK_RUNS)
+        self.warmups_box.setValue(messages.DEFAULT_WARMUP_RUNS)
+        self.warmups_box.setToolTip("Exécutions préalables, qui ne sont pas mesurées.")
+        layout.addRow("Exécutions de chauffe :", self.warmups_box)
+
+        self.stdin_box = QtWidgets.QPlainTextEdit()
+        self.stdin_box.setPlaceholderText(
+            "Entrée donnée au programme à chaque exécution"
+        )
+        layout.addRow("Entrée :", self.stdin_box)
+
+        self.baseline_button = QtWidgets.QPushButton("Choisir une version de référence")
+        self.baseline_button.setToolTip(
+            "Une autre version du fichier, mesurée en même temps pour les comparer."
+        )
+        self.baseline_button.clicked.connect(self.on_btn_baseline_clicked)  # type: ignore
+        layout.addRow("Référence :", self.baseline_button)
+
+        buttons = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.StandardButton.Ok
+            | QtWidgets.QDialogButtonBox.StandardButton.Cancel
+        )
+        buttons.accepted.connect(self.accept)  # type: ignore
+        buttons.rejected.connect(self.reject)  # type: ignore
+        layout.addRow(buttons)
+
+        self.setLayout(layout)
+
+    def on_btn_baseline_clicked(self):
+        file = QtWidgets.QFileDialog().getOpenFileUrl(  # type: ignore
+            self,
+            "Choisir la version de référence",
+            filter="Allowed Files (*.py *.java *.c *.h *.cpp *.hpp)",
+        )
+        if file and file[0]:
+            self.baseline = pathlib.Path(file[0].toLocalFile()).resolve()
+            self.baseline_button.setText(self.baseline.name)
+        else:
+            self.baseline = None
+            self.baseline_button.setText("Choisir une version de référence")
+
+
+class BenchmarkReportWindow(QtWidgets.QDialog):
+    """Displays the statistics of the runs of a benchmark, next to the ones of its
+    baseline."""
+
+    def __init__(self, message: messages.BenchmarkReportMessage):
+        super().__init__()
+
+        report = message.report
+        self.setWindowTitle("Benchmark Report")
+
+        layout = QtWidgets.QVBoxLayout()
+
+        results = [report["program"]]
+        if "baseline" in report:
+            results.append(report["baseline"])
+        runs = len(report["program"]["wall"]["samples"])
+        if report["cpu"] is None:
+            where = "sur un processeur quelconque"
+        elif report["isolated"]:
+            where = f"sur le processeur réservé {report['cpu']}"
+        else:
+            where = f"sur le processeur {report['cpu']}, partagé avec les autres tâches"
+        layout.addWidget(QtWidgets.QLabel(f"{runs} exécutions mesurées, {where}."))
+
+        rows = [
+            (f"{label} ({kind})", measure, name)
+            for measure, kind in (("wall", "temps réel"), ("cpu", "temps processeur"))
+            for name, label in SUMMARY_LABELS.items()
+        ]
+        self.table = QtWidgets.QTableWidget(len(rows), len(results))
+        self.table.setHorizontalHeaderLabels(
+            [result["file_name"] for result in results]
+        )
+        self.table.setVerticalHeaderLabels([label for label, _, _ in rows])
+        self.table.setEditTriggers(
+            QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers
+        )
+        for row, (_, measure, name) in enumerate(rows):
+            for column, result in enumerate(results):
+                value = result[measure][name]
+                text = (
+                    str(value) if name == "outliers" else format_stat("run_time", value)
+                )
+                self.table.setItem(row, column, QtWidgets.QTableWidgetItem(text))
+        self.table.resizeColumnsToContents()
+        layout.addWidget(self.table)
+
+        if "speedup" in report:
+            speedup = report["speedup"]
+            if speedup >= 1:
+                text = f"{speedup:.2f} fois plus rapide que la référence (médianes)."
+            elif speedup > 0:
+                text = f"{1 / speedup:.2f} fois plus lent que la référence (médianes)."
+            else:
+                text = "Aucune comparaison possible avec la référence."
+            layout.addWidget(QtWidgets.QLabel(text))
+
+        self.setLayout(layout)
+        self.resize(500, 450)
@@ -1,5 +1,50 @@
 from PyQt6 import QtWidgets
 
+from sae302.client.views.log_view import LogView
+from sae302.commons import messages
+
+STATS_LABELS = {
+    "queue_time": "Attente",
+    "compile_time": "Préparation",
+    "run_time": "Exécution",
+    "user_time": "CPU utilisateur",
+    "system_time": "CPU système",
+    "max_rss": "Mémoire maximale",
+    "voluntary_switches": "Changements de contexte volontaires",
+    "involuntary_switches": "Changements de contexte forcés",
+}
+"""Text displayed for each measurement of an execution."""
+
+
+def format_stat(name: str, value: float) -> str:
+    """Format a measurement of an execution for display."""
+    if name == "max_rss":
+        return f"{value / (1024 * 1024):.1f} Mio"
+    if name.endswith("_time"):
+        return f"{value * 1000:.1f} ms" if value < 1 else f"{value:.3f} s"
+    return str(value)
+
+
+class StatsView(QtWidgets.QWidget):
+    """Displays the measurements of an execution, made by the server."""
+
+    def __init__(
+        self, stats: messages.ExecutionStats, *, parent: QtWidgets.QWidget | None = None
+    ):
+        super().__init__(parent=parent)
+
+        layout = QtWidgets.QFormLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        for name, label in STATS_LABELS.items():
+            if name not in stats:
+                continue
+            text = format_stat(name, stats[name])
+            if name == "max_rss" and stats.get("max_rss_upper_bound"):
+                # The server could only tell the peak is at most this value.
+                text = f"≤ {text}"
+            layout.addRow(f"{label} :", QtWidgets.QLabel(text))
+        self.setLayout(layout)
+
 
 class LogsWindow(QtWidgets.QDialog):
     """
@@ -7,19 +52,21 @@ class LogsWindow(QtWidgets.QDialog):
     will appear as a free-floating window as we want.
     """
 
-    def __init__(self, logs: str):
+    def __init__(self, logs: str, stats: messages.ExecutionStats | None = None):
         super().__init__()
 
         self.setWindowTitle("Received Logs")
 
         layout = QtWidgets.QVBoxLayout()
 
+        if stats:
+            layout.addWidget(StatsView(stats, parent=self))
+
         layout.addWidget(QtWidgets.QLabel("Logs d'exécution du programme"))
 
-        self.logs_box = QtWidgets.QTextEdit(self)
-        self.logs_box.setReadOnly(True)
-        self.logs_box.setText(logs)
-        self.logs_box.resize(300, 600)
+        self.logs_box = LogView(parent=self)
+        self.logs_box.model.append(logs)
         layout.addWidget(self.logs_box)
 
         self.setLayout(layout)
+        self.resize(600, 600)
@@ -0,0 +1,81 @@
+from PyQt6 import QtWidgets
+
+from sae302.client.views.windows.logs import format_stat
+from sae302.commons import messages
+
+
+def format_counter(counter: messages.ProfileCounter) -> str:
+    """Format an event counted while a program ran for display."""
+    if counter["value"] is None:
+        return "Non mesuré"
+    value = (
+        f"{counter['value']:,.0f}"
+        if counter["value"] >= 100
+        else f"{counter['value']:g}"
+    )
+    return f"{value} {counter['unit']}".strip()
+
+
+class ProfileWindow(QtWidgets.QDialog):
+    """Displays the profile of a program: the functions it spent the most time in, and
+    the events counted while it ran."""
+
+    def __init__(self, message: messages.ProfileMessage):
+        super().__init__()
+
+        report = message.report
+        self.setWindowTitle("Profile")
+
+        layout = QtWidgets.QVBoxLayout()
+
+        functions = report["functions"]
+        summary = f"Mesuré par {report['tool']}"
+        if functions:
+            summary += f", {format_stat('run_time', report['total_time'])} au total"
+        layout.addWidget(QtWidgets.QLabel(f"{summary}."))
+
+        if functions:
+            self.functions_table = QtWidgets.QTableWidget(len(functions), 4)
+            self.functions_table.setHorizontalHeaderLabels(
+                ["Fonction", "Appels", "Temps propre", "Temps total"]
+            )
+            self.functions_table.setEditTriggers(
+                QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers
+            )
+            for row, function in enumerate(functions):
+                total = function["total_time"]
+                cells = (
+                    function["name"],
+                    "" if function["calls"] is None else str(function["calls"]),
+                    format_stat("run_time", function["self_time"]),
+                    "" if total is None else format_stat("run_time", total),
+                )
+                for column, text in enumerate(cells):
+                    self.functions_table.setItem(
+                        row, column, QtWidgets.QTableWidgetItem(text)
+                    )
+            self.functions_table.resizeColumnsToContents()
+            layout.addWidget(self.functions_table)
+
+        counters = report["counters"]
+        if counters:
+            self.counters_table = QtWidgets.QTableWidget(len(counters), 1)
+            self.counters_table.setHorizontalHeaderLabels(["Valeur"])
+            self.counters_table.setVerticalHeaderLabels(
+                [counter["name"] for counter in counters]
+            )
+            self.counters_table.setEditTriggers(
+                QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers
+            )
+            for row, counter in enumerate(counters):
+                self.counters_table.setItem(
+                    row, 0, QtWidgets.QTableWidgetItem(format_counter(counter))
+                )
+            self.counters_table.resizeColumnsToContents()
+            layout.addWidget(self.counters_table)
+
+        if not (functions or counters):
+            layout.addWidget(QtWidgets.QLabel("Le profileur n'a rien mesuré."))
+
+        self.setLayout(layout)
+        self.resize(700, 500)
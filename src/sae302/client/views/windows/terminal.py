@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import collections
+
+from PyQt6 import QtWidgets
+
+from sae302.client.socket_client import SocketClient
+from sae302.client.views.log_view import LogView
+from sae302.client.views.windows.logs import StatsView
+from sae302.commons import messages
+
+MAX_LINE_LENGTH = messages.STREAM_WINDOW // 4
+"""Number of characters of a line of input, so that any line fits in the credit of the
+client, whatever its encoding."""
+
+
+class TerminalWindow(QtWidgets.QDialog):
+    """Displays the output of an interactive job as it runs, and sends it the lines
+    typed by the user.
+
+    Input is only sent as long as the server has room for it (See
+    :py:class:`sae302.commons.messages.CreditMessage`), the rest waits in the window.
+    Output is acknowledged once displayed.
+    """
+
+    def __init__(self, job_id: str, socket: SocketClient):
+        super().__init__()
+
+        self.job_id = job_id
+        self.socket = socket
+        self.input_credit = messages.STREAM_WINDOW
+        self.pending_input: collections.deque[str | None] = collections.deque()
+        """Lines waiting for credit. None stands for the end of the input."""
+        self.setWindowTitle(f"Interactive Job {job_id[:8]}")
+
+        layout = QtWidgets.QGridLayout()
+
+        self.output_view = LogView(parent=self)
+        layout.addWidget(self.output_view, 0, 0, 1, 2)
+
+        self.input_ui = QtWidgets.QLineEdit()
+        self.input_ui.setPlaceholderText("Entrée du programme")
+        self.input_ui.setMaxLength(MAX_LINE_LENGTH)
+        self.input_ui.returnPressed.connect(self.on_input_entered)  # type: ignore
+        layout.addWidget(self.input_ui, 1, 0)
+
+        self.eof_button = QtWidgets.QPushButton("Fin de l'entrée")
+        self.eof_button.setToolTip("Ferme l'entrée standard du programme.")
+        self.eof_button.clicked.connect(self.on_btn_eof_clicked)  # type: ignore
+        layout.addWidget(self.eof_button, 1, 1)
+
+        self.state_text = QtWidgets.QLabel("Exécution")
+        layout.addWidget(self.state_text, 2, 0, 1, 2)
+
+        self.setLayout(layout)
+        self.resize(600, 600)
+
+    def on_input_entered(self):
+        self.pending_input.append(self.input_ui.text() + "\n")
+        self.input_ui.clear()
+        self.send_pending_input()
+
+    def on_btn_eof_clicked(self):
+        self.pending_input.append(None)
+        self.input_ui.setDisabled(True)
+        self.eof_button.setDisabled(True)
+        self.send_pending_input()
+
+    def send_pending_input(self):
+        while self.pending_input:
+            line = self.pending_input[0]
+            if line is None:
+                message = messages.InputMessage.create_message(
+                    self.job_id, "", eof=True
+                )
+            elif len(line.encode()) <= self.input_credit:
+                self.input_credit -= len(line.encode())
+                message = messages.InputMessage.create_message(self.job_id, line)
+            else:
+                return
+            self.pending_input.popleft()
+            self.socket.send(message)
+
+    def on_output(self, message: messages.OutputMessage):
+        self.output_view.append(message.data)
+        self.socket.send(
+            messages.CreditMessage.create_message(
+                self.job_id, "OUTPUT", len(message.data.encode())
+            )
+        )
+
+    def on_credit(self, message: messages.CreditMessage):
+        if message.stream == "INPUT":
+            self.input_credit += message.bytes
+            self.send_pending_input()
+
+    def finish(self, text: str, stats: messages.ExecutionStats | None = None):
+        """Show that the job is over, with the given description of its end and its
+        measurements."""
+        self.state_text.setText(text)
+        if stats:
+            self.layout().addWidget(StatsView(stats, parent=self), 3, 0, 1, 2)  # type: ignore
+        self.input_ui.setDisabled(True)
+        self.eof_button.setDisabled(True)
+        self.pending_input.clear()
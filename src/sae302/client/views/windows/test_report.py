@@ -0,0 +1,75 @@
+from PyQt6 import QtGui, QtWidgets
+
+from sae302.client.views.log_view import LogView
+from sae302.commons import messages
+
+TEST_STATUSES = {
+    "PASSED": "Réussi",
+    "FAILED": "Échoué",
+    "TIMEOUT": "Temps dépassé",
+    "ERROR": "Non exécuté",
+}
+"""Text displayed for each result of a test case."""
+
+
+class TestReportWindow(QtWidgets.QDialog):
+    """Displays the results of a test suite: one line per case, and the differences with
+    the expected output of the selected case."""
+
+    def __init__(self, report: messages.TestReportMessage):
+        super().__init__()
+
+        self.results = report.results
+        self.setWindowTitle("Test Report")
+
+        layout = QtWidgets.QVBoxLayout()
+
+        layout.addWidget(
+            QtWidgets.QLabel(f"{report.passed} / {report.total} cas réussis")
+        )
+
+        self.table = QtWidgets.QTableWidget(len(self.results), 4)
+        self.table.setHorizontalHeaderLabels(["Cas", "Résultat", "Code", "Durée"])
+        self.table.setEditTriggers(
+            QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers
+        )
+        self.table.setSelectionBehavior(
+            QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows
+        )
+        self.table.setSelectionMode(
+            QtWidgets.QAbstractItemView.SelectionMode.SingleSelection
+        )
+        for row, result in enumerate(self.results):
+            duration = result["duration"]
+            cells = (
+                result["name"],
+                TEST_STATUSES.get(result["status"], result["status"]),
+                "" if result["code"] is None else str(result["code"]),
+                "" if duration is None else f"{duration:.3f} s",
+            )
+            for column, text in enumerate(cells):
+                item = QtWidgets.QTableWidgetItem(text)
+                if result["status"] != "PASSED":
+                    item.setForeground(QtGui.QColor("red"))
+                self.table.setItem(row, column, item)
+        self.table.resizeColumnsToContents()
+        self.table.itemSelectionChanged.connect(self.on_selection_changed)  # type: ignore
+        layout.addWidget(self.table)
+
+        self.diff_view = LogView(parent=self)
+        layout.addWidget(self.diff_view)
+
+        self.setLayout(layout)
+        self.resize(600, 600)
+
+        failures = [row for row, result in enumerate(self.results) if "diff" in result]
+        if failures:
+            self.table.selectRow(failures[0])
+
+    def on_selection_changed(self):
+        self.diff_view.clear()
+        rows = self.table.selectionModel().selectedRows()  # type: ignore
+        if rows:
+            self.diff_view.append(
+                self.results[rows[0].row()].get("diff", "Sortie identique.")
+            )
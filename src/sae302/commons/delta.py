@@ -0,0 +1,158 @@
+"""Module used to send a new version of a file as its differences with an older version
+that the other side already has, like rsync does.
+
+The side holding the old version cuts it in blocks, and sends the signature of each of
+them: a weak checksum, that can be rolled over a text one character at a time, and a
+strong hash, that confirms the matches of the weak one (See :py:func:`signature`). The
+side holding the new version slides a window over it, looking for the blocks of the old
+version, and sends instructions: the blocks to copy, and the text between them (See
+:py:func:`diff`). The other side then rebuilds the new version from its old one (See
+:py:func:`apply`).
+
+Files are compared by characters rather than by bytes, as payloads are decoded as text
+once received.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import typing
+
+if typing.TYPE_CHECKING:
+    from sae302.commons.messages import FileSignature
+
+MIN_BLOCK_SIZE = 64
+"""Smallest block, in characters. Smaller blocks find more matches, but have more
+signatures."""
+MAX_BLOCK_SIZE = 4096
+"""Largest block, in characters."""
+_MODULO = 1 << 16
+
+type Instruction = str | list[int]
+"""An instruction to rebuild a file: either text to insert, or the index of the first
+block of the old version to copy and the number of blocks to copy."""
+
+
+def block_size_for(length: int) -> int:
+    """Choose the size of the blocks of a file, growing with the square root of its
+    length, so that the number of signatures does too."""
+    return min(MAX_BLOCK_SIZE, max(MIN_BLOCK_SIZE, math.isqrt(length)))
+
+
+def _weak_checksum(codes: list[int]) -> tuple[int, int]:
+    """Compute both halves of the weak checksum of a block, as in Adler-32."""
+    first = sum(codes) % _MODULO
+    second = (
+        sum((len(codes) - index) * code for index, code in enumerate(codes)) % _MODULO
+    )
+    return first, second
+
+
+def _strong_hash(block: str) -> str:
+    return hashlib.blake2b(
+        block.encode(errors="surrogatepass"), digest_size=8
+    ).hexdigest()
+
+
+def signature(base: str, blob: str) -> FileSignature:
+    """Compute the signature of the blocks of the old version of a file.
+
+    Parameters
+    ----------
+    base : str
+        The old version of the file.
+    blob : str
+        Its hash, which the other side gives back with its instructions.
+    """
+    block_size = block_size_for(len(base))
+    blocks = []
+    for start in range(0, len(base), block_size):
+        block = base[start : start + block_size]
+        first, second = _weak_checksum([ord(character) for character in block])
+        blocks.append((first | second << 16, _strong_hash(block)))
+    return {"base": blob, "block_size": block_size, "blocks": blocks}
+
+
+def diff(text: str, base: FileSignature) -> list[Instruction]:
+    """Compute the instructions rebuilding a new version of a file from an old one.
+
+    Parameters
+    ----------
+    text : str
+        The new version of the file.
+    base : FileSignature
+        The signature of the old version.
+    """
+    block_size = base["block_size"]
+    candidates: dict[int, list[int]] = {}
+    for index, (weak, _) in enumerate(base["blocks"]):
+        candidates.setdefault(weak, []).append(index)
+
+    codes = [ord(character) for character in text]
+    instructions: list[Instruction] = []
+    literal_start = 0
+    position = 0
+    first, second = _weak_checksum(codes[:block_size])
+    while position + block_size <= len(text):
+        match = None
+        for index in candidates.get(first | second << 16, ()):
+            if base["blocks"][index][1] == _strong_hash(
+                text[position : position + block_size]
+            ):
+                match = index
+                break
+
+        if match is None:
+            if position + block_size < len(text):
+                # Roll the window one character further.
+                leaving, entering = codes[position], codes[position + block_size]
+                first = (first - leaving + entering) % _MODULO
+                second = (second - block_size * leaving + first) % _MODULO
+            position += 1
+            continue
+
+        if literal_start < position:
+            instructions.append(text[literal_start:position])
+        previous = instructions[-1] if instructions else None
+        if isinstance(previous, list) and previous[0] + previous[1] == match:
+            previous[1] += 1
+        else:
+            instructions.append([match, 1])
+        position += block_size
+        literal_start = position
+        first, second = _weak_checksum(codes[position : position + block_size])
+
+    if literal_start < len(text):
+        instructions.append(text[literal_start:])
+    return instructions
+
+
+def apply(base: str, block_size: int, instructions: typing.Any) -> str:
+    """Rebuild a new version of a file from its old one.
+
+    Raises
+    ------
+    ValueError
+        The instructions are not valid for this old version.
+    """
+    if block_size < 1 or not isinstance(instructions, list):
+        raise ValueError("Invalid delta.")
+    blocks = math.ceil(len(base) / block_size)
+    parts: list[str] = []
+    for instruction in instructions:
+        if isinstance(instruction, str):
+            parts.append(instruction)
+            continue
+        if not (
+            isinstance(instruction, list)
+            and len(instruction) == 2
+            and all(type(value) is int for value in instruction)
+            and instruction[0] >= 0
+            and instruction[1] >= 1
+            and instruction[0] + instruction[1] <= blocks
+        ):
+            raise ValueError(f"Invalid delta instruction: {instruction!r}.")
+        first, count = instruction
+        parts.append(base[first * block_size : (first + count) * block_size])
+    return "".join(parts)
@@ -18,3 +18,35 @@ class Events(QtCore.QObject):
     """Emitted upon capabilities were received."""
     on_error = QtCore.pyqtSignal(messages.ErrorMessage)
     """Emitted upon an error was received."""
+    on_job = QtCore.pyqtSignal(messages.JobMessage)
+    """Emitted upon the state of a job was received."""
+    on_result = QtCore.pyqtSignal(messages.ResultMessage)
+    """Emitted upon the result of a job was requested."""
+    on_status = QtCore.pyqtSignal(messages.StatusMessage)
+    """Emitted upon the state of a job was requested."""
+    on_cancel = QtCore.pyqtSignal(messages.CancelMessage)
+    """Emitted upon the cancellation of a job was requested."""
+    on_test_suite = QtCore.pyqtSignal(messages.TestSuiteMessage)
+    """Emitted upon a test suite was received."""
+    on_test_report = QtCore.pyqtSignal(messages.TestReportMessage)
+    """Emitted upon the results of a test suite were received."""
+    on_input = QtCore.pyqtSignal(messages.InputMessage)
+    """Emitted upon input for an interactive job was received."""
+    on_output = QtCore.pyqtSignal(messages.OutputMessage)
+    """Emitted upon output of an interactive job was received."""
+    on_credit = QtCore.pyqtSignal(messages.CreditMessage)
+    """Emitted upon credit for a stream of an interactive job was received."""
+    on_benchmark = QtCore.pyqtSignal(messages.BenchmarkMessage)
+    """Emitted upon a benchmark was received."""
+    on_benchmark_report = QtCore.pyqtSignal(messages.BenchmarkReportMessage)
+    """Emitted upon the report of a benchmark was received."""
+    on_profile = QtCore.pyqtSignal(messages.ProfileMessage)
+    """Emitted upon the profile of a job was received."""
+    on_offer = QtCore.pyqtSignal(messages.OfferMessage)
+    """Emitted upon hashes of files were offered."""
+    on_missing = QtCore.pyqtSignal(messages.MissingMessage)
+    """Emitted upon the files missing from the server were received."""
+    on_blob = QtCore.pyqtSignal(messages.BlobMessage)
+    """Emitted upon the content of a file was uploaded."""
+    on_delta = QtCore.pyqtSignal(messages.DeltaMessage)
+    """Emitted upon the differences of a file with an older version were uploaded."""
@@ -1,17 +1,27 @@
 """Module used for the process and the preparation of messages in the communication
 between the client and the server.
+
+Every message is made of a text header, listing its metadata as ``KEY: value`` lines and
+terminated by a ``DATA_END: True`` line, directly followed by a binary payload of
+exactly ``DATA_LENGTH`` bytes.
 """
 
 import abc
+import collections
 import enum
 import hashlib
 import json
 import logging
 import os
 import pathlib
+import re
+import shutil
 import socket
+import tempfile
+import threading
 import typing
-from io import BytesIO
+
+from sae302.commons import delta
 
 if typing.TYPE_CHECKING:
     from sae302.commons import events
@@ -22,11 +32,37 @@ _log = logging.getLogger(__name__)
 
 type ERROR_GRAVITY = typing.Literal["ERROR", "WARNING", "INFO"]
 
+HEADER_END = b"DATA_END: True\n"
+"""Line marking the end of a message's header. The payload starts right after it."""
+MAX_HEADER_SIZE = 64 * 1024
+"""Maximum size of a header. Anything bigger is considered as a broken message."""
+MAX_PAYLOAD_SIZE = 64 * 1024 * 1024
+"""Maximum size of a payload. Anything bigger is considered as a broken message, as the
+payload is read back into memory once received."""
+SPOOL_MAX_SIZE = 1024 * 1024
+"""Size after which a received payload is spooled to the disk instead of being kept in
+memory."""
+RECV_SIZE = 64 * 1024
+"""Amount of bytes to read from a socket at once."""
+MAX_TEST_CASES = 1000
+"""Maximum number of cases of a test suite."""
+MAX_BENCHMARK_RUNS = 100
+"""Maximum number of measured runs, or of warmup runs, of a benchmark."""
+DEFAULT_BENCHMARK_RUNS = 10
+DEFAULT_WARMUP_RUNS = 2
+MAX_OFFERED_BLOBS = 100
+"""Number of files that may be offered at once. See :py:class:`OfferMessage`."""
+STREAM_WINDOW = 64 * 1024
+"""Number of bytes of a stream of an interactive job that may be sent before receiving
+credit for more. See :py:class:`CreditMessage`."""
+_BLOB_HASH = re.compile(r"[0-9a-f]{64}")
+
 
 class KnownMetadata(enum.StrEnum):
     """A class listing known metadata."""
 
     LENGTH = "DATA_LENGTH"
+    """The length of the payload, in bytes."""
     CHECKSUM = "DATA_CHECKSUM"
     FILENAME = "DATA_FILENAME"
     """The name of the file that is sent."""
@@ -41,11 +77,35 @@ class BaseMetadata(typing.TypedDict):
     DATA_CHECKSUM: str
     """Checksum of the data we are supposedly receiving."""
     DATA_LENGTH: str
-    """The length of the message. Used to know when the message is fully received."""
-    DATA_TYPE: typing.Literal["MSG", "FILE", "LOGS", "ERROR", "CAPABILITIES"]
+    """The length of the payload, in bytes. Used to know when the message is fully
+    received."""
+    DATA_TYPE: typing.Literal[
+        "MSG",
+        "FILE",
+        "LOGS",
+        "ERROR",
+        "CAPABILITIES",
+        "JOB",
+        "RESULT",
+        "STATUS",
+        "CANCEL",
+        "TEST_SUITE",
+        "TEST_REPORT",
+        "INPUT",
+        "OUTPUT",
+        "CREDIT",
+        "BENCHMARK",
+        "BENCHMARK_REPORT",
+        "PROFILE",
+        "OFFER",
+        "MISSING",
+        "BLOB",
+        "DELTA",
+    ]
     """The type of the message we are sending/receiving."""
-    DATA: str
-    """The data sent in the message."""
+    DATA: typing.NotRequired[str]
+    """The data sent in the message. It is not part of the header, and is filled by the
+    receiver once the payload has been fully received."""
 
 
 class MessageMetadata(BaseMetadata): ...
@@ -54,6 +114,11 @@ class MessageMetadata(BaseMetadata): ...
 class LogsMetadata(BaseMetadata):
     STATUS: str
     """The exit code that was returned by the executor."""
+    JOB_ID: typing.NotRequired[str]
+    """The job these logs belong to."""
+    STATS: typing.NotRequired[str]
+    """The measurements of the execution, as a JSON object. See
+    :py:class:`ExecutionStats`."""
 
 
 class CapabilitiesMetadata(BaseMetadata): ...
@@ -63,42 +128,543 @@ class FileMetadata(BaseMetadata):
     DATA_FILENAME: str
     """The name of the file that is sent."""
     CHOSEN_EXECUTOR: typing.NotRequired[str]
+    BUILD_PROFILE: typing.NotRequired[str]
+    """The build profile to compile the file with, such as ``debug`` or ``release``. The
+    profiles allowed depend on the server."""
+    PRIORITY: typing.NotRequired[str]
+    """The priority class of the job. Can either be ``interactive``, ``normal`` or
+    ``batch``."""
+    DETACHED: typing.NotRequired[str]
+    """If ``True``, the logs are not sent back once the job is over. They must be
+    fetched with a :py:class:`ResultMessage`, from any connection."""
+    INTERACTIVE: typing.NotRequired[str]
+    """If ``True``, the input and the output of the program are streamed while it runs.
+    See :py:class:`InputMessage`."""
+    PROFILED: typing.NotRequired[str]
+    """If ``True``, the program is profiled, and a :py:class:`ProfileMessage` is sent
+    before the logs."""
+    BLOB: typing.NotRequired[str]
+    """The hash of the file, already uploaded with a :py:class:`BlobMessage`. The
+    payload is then empty."""
 
 
 class ErrorMetadata(BaseMetadata):
     GRAVITY: ERROR_GRAVITY
     """The gravity of the error."""
+    JOB_ID: typing.NotRequired[str]
+    """The job this error is about, if any."""
+
+
+class JobMetadata(BaseMetadata):
+    JOB_ID: str
+    """The identifier given by the server to the job."""
+    STATE: str
+    """The current state of the job. See :py:class:`sae302.server.journal.JobState`."""
+    QUEUE_POSITION: typing.NotRequired[str]
+    """The position of the job in the queue, starting at 1, while it is waiting."""
+
+
+class ResultMetadata(BaseMetadata):
+    JOB_ID: str
+    """The job whose result is requested."""
+
+
+class StatusMetadata(BaseMetadata):
+    JOB_ID: str
+    """The job whose state is requested."""
+    SUBSCRIBE: typing.NotRequired[str]
+    """If ``True``, the result of the job will also be sent to this connection once
+    over."""
+
+
+class CancelMetadata(BaseMetadata):
+    JOB_ID: str
+    """The job to cancel."""
+
+
+class InputMetadata(BaseMetadata):
+    JOB_ID: str
+    """The interactive job the input is for."""
+    EOF: typing.NotRequired[str]
+    """If ``True``, the input of the program is closed after this data."""
+
+
+class OutputMetadata(BaseMetadata):
+    JOB_ID: str
+    """The interactive job that produced the output."""
+
+
+class CreditMetadata(BaseMetadata):
+    JOB_ID: str
+    """The interactive job the credit is for."""
+    STREAM: typing.Literal["INPUT", "OUTPUT"]
+    """The stream the receiver of the credit may send more of."""
+    BYTES: str
+    """The number of bytes that may be sent in addition."""
+
+
+class TestSuiteMetadata(BaseMetadata):
+    DATA_FILENAME: str
+    """The name of the file to test."""
+    CHOSEN_EXECUTOR: typing.NotRequired[str]
+    BUILD_PROFILE: typing.NotRequired[str]
+    PRIORITY: typing.NotRequired[str]
+    """The priority class of the job. Can either be ``normal`` or ``batch``, the
+    default."""
+
+
+class BenchmarkMetadata(BaseMetadata):
+    DATA_FILENAME: str
+    """The name of the file to measure."""
+    CHOSEN_EXECUTOR: typing.NotRequired[str]
+    BUILD_PROFILE: typing.NotRequired[str]
+    PRIORITY: typing.NotRequired[str]
+    """The priority class of the job. Can either be ``normal`` or ``batch``, the
+    default."""
+
+
+class BenchmarkReportMetadata(BaseMetadata):
+    JOB_ID: str
+    """The benchmark these measurements belong to."""
+
+
+class ProfileMetadata(BaseMetadata):
+    JOB_ID: str
+    """The profiled job."""
+
+
+class OfferMetadata(BaseMetadata): ...
+
+
+class MissingMetadata(BaseMetadata): ...
+
+
+class BlobMetadata(BaseMetadata): ...
+
+
+class DeltaMetadata(BaseMetadata):
+    BLOB: str
+    """The hash of the uploaded file, once rebuilt."""
+    BASE: str
+    """The hash of the version of the file it is rebuilt from."""
+    BLOCK_SIZE: str
+    """The size of the blocks of the base, as given by its signature."""
+
+
+class TestReportMetadata(BaseMetadata):
+    JOB_ID: str
+    """The test suite these results belong to."""
+    PASSED: str
+    """The number of cases that passed."""
+    TOTAL: str
+    """The number of cases of the suite."""
+
+
+class TestCase(typing.TypedDict):
+    """A case of a test suite: what is given to the program, and what it must print."""
+
+    name: str
+    stdin: typing.NotRequired[str]
+    """The standard input of the program. Empty by default."""
+    args: typing.NotRequired[list[str]]
+    """The arguments given to the program."""
+    expected: str
+    """The expected output. Trailing spaces and blank lines at the end are ignored."""
+    code: typing.NotRequired[int]
+    """The expected exit code. It is not checked if not given."""
+    timeout: typing.NotRequired[float]
+    """The maximum time, in seconds, the program may run. The timeout of the server
+    still applies."""
+
+
+type TEST_STATUS = typing.Literal["PASSED", "FAILED", "TIMEOUT", "ERROR"]
+
+
+class TestCaseResult(typing.TypedDict):
+    """The outcome of a case of a test suite."""
+
+    name: str
+    status: TEST_STATUS
+    """``ERROR`` is used when the case could not be ran at all."""
+    code: int | None
+    duration: float | None
+    """The time, in seconds, the program ran for."""
+    diff: typing.NotRequired[str]
+    """What differs between the expected and the actual output, only for failed
+    cases."""
+
+
+class ExecutionStats(typing.TypedDict, total=False):
+    """Measurements of a job, made by the server. Times are in seconds. Only what
+    applies to the job is given: a script that could not be compiled has no run time,
+    for instance.
+    """
 
+    queue_time: float
+    """The time the job waited for a free execution slot."""
+    compile_time: float
+    """The time taken to prepare the file, mostly compiling it."""
+    run_time: float
+    """The wall-clock time the program ran for."""
+    user_time: float
+    """The processor time spent by the program, and the children it waited for, in user
+    mode."""
+    system_time: float
+    """The processor time spent by the kernel on behalf of the program."""
+    max_rss: int
+    """The peak resident memory of the program, in bytes."""
+    max_rss_upper_bound: bool
+    """Given, and True, when :py:attr:`max_rss` is only an upper bound of the peak
+    memory, as the server could not measure the one of the program alone."""
+    voluntary_switches: int
+    """The number of times the program gave the processor up, such as to wait for
+    input."""
+    involuntary_switches: int
+    """The number of times the program was preempted."""
+
+
+class BenchmarkBaseline(typing.TypedDict):
+    """Another version of the measured file, to compare it with."""
 
-def pack_message(metadata: BaseMetadata) -> str:
-    """Prepares the message to be sent.
-    The message must be set as a metadata.
+    file_name: str
+    source: str
+
+
+class BenchmarkSettings(typing.TypedDict):
+    """How a file is measured."""
+
+    runs: int
+    """The number of measured runs."""
+    warmups: int
+    """The number of runs before the measured ones, whose times are not kept."""
+    stdin: typing.NotRequired[str]
+    args: typing.NotRequired[list[str]]
+    timeout: typing.NotRequired[float]
+    """A timeout for each run, shorter than the one of the server."""
+    baseline: typing.NotRequired[BenchmarkBaseline]
+
+
+class TimingSummary(typing.TypedDict):
+    """Statistics of the measured runs of a program. Times are in seconds."""
+
+    samples: list[float]
+    min: float
+    median: float
+    mean: float
+    stddev: float
+    outliers: int
+    """The number of runs further than 1.5 interquartile ranges from the quartiles."""
+
+
+class BenchmarkResult(typing.TypedDict):
+    """The measurements of a program."""
+
+    file_name: str
+    wall: TimingSummary
+    """The wall-clock time of each run."""
+    cpu: TimingSummary
+    """The processor time of each run, in user and system mode."""
+
+
+class BenchmarkReport(typing.TypedDict):
+    """The outcome of a benchmark."""
+
+    program: BenchmarkResult
+    baseline: typing.NotRequired[BenchmarkResult]
+    speedup: typing.NotRequired[float]
+    """How many times faster the program is than the baseline, comparing the medians of
+    their wall-clock times."""
+    cpu: int | None
+    """The processor the runs were pinned to, if any."""
+    isolated: bool
+    """Whether the processor is reserved for benchmarks, or shared with the other
+    jobs."""
+
+
+class ProfiledFunction(typing.TypedDict):
+    """A function the profiled program spent time in. Times are in seconds."""
+
+    name: str
+    calls: int | None
+    """The number of calls, if the profiler counts them."""
+    self_time: float
+    """The time spent in the function itself."""
+    total_time: float | None
+    """The time spent in the function and the ones it called, if the profiler measures
+    it."""
+
+
+class ProfileCounter(typing.TypedDict):
+    """An event counted by the processor or the kernel while the program ran."""
+
+    name: str
+    value: float | None
+    """None if the event could not be counted."""
+    unit: str
+    """The unit of the value, empty for plain counts."""
+
+
+class ProfileReport(typing.TypedDict):
+    """The profile of a program."""
+
+    tool: str
+    """The profiler, such as ``cProfile``, ``gprof`` or ``perf stat``."""
+    total_time: float
+    """The time measured by the profiler, over every function."""
+    functions: list[ProfiledFunction]
+    """The functions the program spent the most time in, the slowest first."""
+    counters: list[ProfileCounter]
+
+
+class FileSignature(typing.TypedDict):
+    """The signature of the blocks of a file held by the server, that a new version of
+    it can be uploaded against. See :py:mod:`sae302.commons.delta`."""
+
+    base: str
+    """The hash of the file."""
+    block_size: int
+    """The size of the blocks, in characters. The last block may be shorter."""
+    blocks: list[tuple[int, str]]
+    """The weak checksum and the strong hash of each block."""
+
+
+def parse_test_cases(cases: typing.Any) -> list[TestCase]:
+    """Validate the cases of a test suite, as decoded from JSON.
+
+    Raises
+    ------
+    ValueError
+        The cases are not valid.
+    """
+    if not isinstance(cases, list) or not cases:
+        raise ValueError("A test suite must be a non-empty list of cases.")
+    if len(cases) > MAX_TEST_CASES:
+        raise ValueError(f"A test suite cannot have more than {MAX_TEST_CASES} cases.")
+
+    for index, case in enumerate(cases, start=1):
+        if not isinstance(case, dict):
+            raise ValueError(f"Case {index} must be an object.")
+        case.setdefault("name", str(index))
+        if not isinstance(case["name"], str):
+            raise ValueError(f"The name of case {index} must be a string.")
+        if not isinstance(case.get("expected"), str):
+            raise ValueError(f"Case {case['name']} must have an expected output.")
+        if not isinstance(case.get("stdin", ""), str):
+            raise ValueError(f"The input of case {case['name']} must be a string.")
+        args = case.get("args", [])
+        if not (isinstance(args, list) and all(isinstance(arg, str) for arg in args)):
+            raise ValueError(f"The arguments of case {case['name']} must be strings.")
+        code = case.get("code")
+        if code is not None and not isinstance(code, int):
+            raise ValueError(
+                f"The exit code of case {case['name']} must be an integer."
+            )
+        timeout = case.get("timeout")
+        if timeout is not None and not (
+            isinstance(timeout, (int, float)) and timeout > 0
+        ):
+            raise ValueError(
+                f"The timeout of case {case['name']} must be a positive number."
+            )
+    return typing.cast(list[TestCase], cases)
+
+
+def parse_benchmark(settings: typing.Any) -> BenchmarkSettings:
+    """Validate the settings of a benchmark, as decoded from JSON. Missing numbers of
+    runs are set to their default.
+
+    Raises
+    ------
+    ValueError
+        The settings are not valid.
+    """
+    if not isinstance(settings, dict):
+        raise ValueError("The settings of a benchmark must be an object.")
+    settings.setdefault("runs", DEFAULT_BENCHMARK_RUNS)
+    settings.setdefault("warmups", DEFAULT_WARMUP_RUNS)
+    runs, warmups = settings["runs"], settings["warmups"]
+    if not (isinstance(runs, int) and 1 <= runs <= MAX_BENCHMARK_RUNS):
+        raise ValueError(
+            f"The number of runs must be between 1 and {MAX_BENCHMARK_RUNS}."
+        )
+    if not (isinstance(warmups, int) and 0 <= warmups <= MAX_BENCHMARK_RUNS):
+        raise ValueError(
+            f"The number of warmup runs must be between 0 and {MAX_BENCHMARK_RUNS}."
+        )
+    if not isinstance(settings.get("stdin", ""), str):
+        raise ValueError("The input of the benchmark must be a string.")
+    args = settings.get("args", [])
+    if not (isinstance(args, list) and all(isinstance(arg, str) for arg in args)):
+        raise ValueError("The arguments of the benchmark must be strings.")
+    timeout = settings.get("timeout")
+    if timeout is not None and not (isinstance(timeout, (int, float)) and timeout > 0):
+        raise ValueError("The timeout of the benchmark must be a positive number.")
+    baseline = settings.get("baseline")
+    if baseline is not None and not (
+        isinstance(baseline, dict)
+        and isinstance(baseline.get("file_name"), str)
+        and isinstance(baseline.get("source"), str)
+    ):
+        raise ValueError("The baseline must have a file name and a source.")
+    return typing.cast(BenchmarkSettings, settings)
+
+
+def _source_of(file: pathlib.Path, by_hash: bool) -> dict[str, str]:
+    """Give a file in the payload of a message, either by its source or by its hash."""
+    if by_hash:
+        return {"source_blob": blob_hash(file)}
+    return {"source": file.read_text()}
+
+
+def _read_source(
+    holder: dict[str, typing.Any], resolve: typing.Callable[[str], str] | None
+) -> str:
+    """Read a file given in the payload of a message, either by its source or by its
+    hash.
+
+    Raises
+    ------
+    ValueError
+        The file is missing, or is given by an unknown hash.
+    """
+    if isinstance(holder.get("source"), str):
+        return holder["source"]
+    blob = holder.get("source_blob")
+    if resolve and isinstance(blob, str):
+        return resolve(blob)
+    raise ValueError("The source of the file is missing.")
+
+
+class PackedMessage:
+    """A message that is ready to be sent in a socket.
+
+    The header is always kept in memory. The payload is either kept in memory, or read
+    from a file on the disk, in which case it is directly transmitted by the kernel
+    using :py:meth:`socket.socket.sendfile`, without ever going through Python buffers.
+
+    Parameters
+    ----------
+    header : bytes
+        The packed header of the message.
+    payload : bytes | pathlib.Path
+        The payload of the message, or the path of the file holding it.
+    delete_after_send : bool, default to :py:obj:`False`
+        If True and the payload is a file, it will be deleted once the message has been
+        sent.
+    """
+
+    def __init__(
+        self,
+        header: bytes,
+        payload: bytes | pathlib.Path = b"",
+        *,
+        delete_after_send: bool = False,
+    ):
+        self.header = header
+        self.payload = payload
+        self.delete_after_send = delete_after_send
+        self.payload_length = (
+            payload.stat().st_size
+            if isinstance(payload, pathlib.Path)
+            else len(payload)
+        )
+        self._references = 1
+        self._references_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.header) + self.payload_length
+
+    def send(self, sock: socket.socket) -> None:
+        """Write the whole message into the given socket, then discard it.
+        Unlike :py:meth:`socket.socket.send`, partial writes are handled.
+
+        Parameters
+        ----------
+        sock : socket.socket
+            The socket to write the message into. Must be a blocking socket.
+        """
+        try:
+            self.write_to(sock)
+        finally:
+            self.discard()
+
+    def write_to(self, sock: socket.socket) -> None:
+        """Write the whole message into the given socket, without discarding it, so that
+        it can be sent to multiple sockets. :py:meth:`discard` must be called once
+        done."""
+        sock.sendall(self.header)
+        if isinstance(self.payload, pathlib.Path):
+            with self.payload.open("rb") as file:
+                sent = sock.sendfile(file, 0, self.payload_length)
+            if sent < self.payload_length:
+                raise OSError(f"{self.payload} is shorter than announced.")
+        elif self.payload:
+            sock.sendall(self.payload)
+
+    def retain(self, count: int = 1) -> None:
+        """Keep the payload file until :py:meth:`discard` has been called once more for
+        each new holder, such as when the message is queued for several connections."""
+        with self._references_lock:
+            self._references += count
+
+    def discard(self) -> None:
+        """Delete the payload file if it was meant to be deleted once sent, and nobody
+        else holds the message anymore."""
+        with self._references_lock:
+            self._references -= 1
+            if self._references > 0:
+                return
+        if self.delete_after_send and isinstance(self.payload, pathlib.Path):
+            self.payload.unlink(missing_ok=True)
+
+
+def pack_message(
+    metadata: BaseMetadata,
+    payload: bytes | pathlib.Path = b"",
+    *,
+    delete_after_send: bool = False,
+) -> PackedMessage:
+    """Prepares the message to be sent. The ``DATA`` metadata is never part of the
+    header, the payload is sent after it instead.
 
     Parameters
     ----------
     metadata : dict[str, str]
         The metadata that will be inserted in the message.
+    payload : bytes | pathlib.Path
+        The payload of the message, or the path to the file containing it.
+    delete_after_send : bool, default to :py:obj:`False`
+        Whether the payload file must be deleted once sent.
 
     Returns
     -------
-    str
-        The message as a form of string in the socket.
+    PackedMessage
+        The message, ready to be sent in the socket.
+
+    Raises
+    ------
+    ValueError
+        A metadata contains a line break, which would break the header.
     """
-    msg = "".join(f"{key}: {value}\n" for key, value in metadata.items())
-    if not msg.endswith("DATA_END: True\n"):
-        msg += "DATA_END: True"
-    _log.debug("Packed message: %s", msg)
-    return msg
+    lines: list[str] = []
+    for key, value in metadata.items():
+        if key == KnownMetadata.DATA.value:
+            continue
+        if "\n" in f"{key}{value}":
+            raise ValueError(f"Metadata {key} cannot contain a line break.")
+        lines.append(f"{key}: {value}\n")
+    header = "".join(lines) + HEADER_END.decode()
+    _log.debug("Packed message: %s", header)
+    return PackedMessage(header.encode(), payload, delete_after_send=delete_after_send)
 
 
 def unpack_message(message: str) -> dict[str, str]:
-    """Read the message that has been received, and returns all of its metadata,
-    including the message.
+    """Read the header that has been received, and returns all of its metadata.
 
     Parameters
     ----------
     message : str
-        The received message.
+        The received header.
 
     Returns
     -------
@@ -116,29 +682,236 @@ def unpack_message(message: str) -> dict[str, str]:
     return metadata
 
 
-def calculate_checksum(message: str) -> str:
-    return hashlib.md5(message.encode()).hexdigest()
+def calculate_checksum(message: str | bytes | pathlib.Path) -> str:
+    if isinstance(message, pathlib.Path):
+        with message.open("rb") as file:
+            return hashlib.file_digest(file, "md5").hexdigest()
+    if isinstance(message, str):
+        message = message.encode()
+    return hashlib.md5(message).hexdigest()
+
+
+def blob_hash(content: str | bytes | pathlib.Path) -> str:
+    """Compute the hash a file is known by once uploaded with a :py:class:`BlobMessage`.
+
+    Received payloads are decoded as UTF-8, replacing invalid bytes, so the hash is
+    computed on the content as the server sees it.
+
+    Returns
+    -------
+    str
+        A SHA-256 hex digest.
+    """
+    if isinstance(content, pathlib.Path):
+        content = content.read_bytes()
+    if isinstance(content, bytes):
+        content = content.decode(errors="replace")
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def parse_blob_hashes(hashes: typing.Any) -> list[str]:
+    """Validate the hashes of files offered by a client.
+
+    Raises
+    ------
+    ValueError
+        The hashes are not a list of SHA-256 hex digests.
+    """
+    if not isinstance(hashes, list):
+        raise ValueError("The offered files must be a list of hashes.")
+    if len(hashes) > MAX_OFFERED_BLOBS:
+        raise ValueError(f"At most {MAX_OFFERED_BLOBS} files may be offered at once.")
+    for value in hashes:
+        if not (isinstance(value, str) and _BLOB_HASH.fullmatch(value)):
+            raise ValueError(f"Invalid file hash: {value!r}.")
+    return hashes
+
+
+def snapshot(file: pathlib.Path) -> pathlib.Path:
+    """Copy a file the user may still edit into a private temporary file, so that the
+    payload sent matches the length and the checksum announced in the header. The copy
+    must be sent with ``delete_after_send``.
+
+    Raises
+    ------
+    OSError
+        The file cannot be read.
+    """
+    fd, name = tempfile.mkstemp(prefix="sae302-", suffix=file.suffix)
+    os.close(fd)
+    try:
+        shutil.copyfile(file, name)
+    except OSError:
+        os.unlink(name)
+        raise
+    return pathlib.Path(name)
+
+
+def payload_metadata(payload: bytes | pathlib.Path) -> tuple[str, str]:
+    """Compute the checksum and the length metadata of a payload.
+
+    Returns
+    -------
+    tuple[str, str]
+        The ``DATA_CHECKSUM`` and ``DATA_LENGTH`` values.
+    """
+    if isinstance(payload, pathlib.Path):
+        return calculate_checksum(payload), str(payload.stat().st_size)
+    return calculate_checksum(payload), str(len(payload))
+
+
+class MessageWriter:
+    """The MessageWriter class is used to send messages through a non-blocking socket.
+
+    Messages are queued, then written as far as the socket accepts without blocking
+    every time :py:meth:`flush` is called, which should happen whenever the socket
+    becomes writable. File payloads are sent with :py:func:`os.sendfile` when available.
+    """
+
+    def __init__(self):
+        self._queue: collections.deque[PackedMessage] = collections.deque()
+        self._offset = 0
+        """Amount of bytes of the first message of the queue that have already been
+        sent."""
+        self._file: typing.BinaryIO | None = None
+        self.pending_bytes = 0
+        """Amount of bytes waiting to be sent."""
+
+    def __bool__(self) -> bool:
+        return bool(self._queue)
+
+    def push(self, message: PackedMessage) -> None:
+        """Queue a message to be sent."""
+        self._queue.append(message)
+        self.pending_bytes += len(message)
+
+    def flush(self, sock: socket.socket) -> int:
+        """Write as much queued data as possible into the socket, without blocking.
+
+        Returns
+        -------
+        int
+            The amount of bytes that have been written.
+
+        Raises
+        ------
+        OSError
+            The connection is broken.
+        """
+        written = 0
+        while self._queue:
+            message = self._queue[0]
+            try:
+                sent = self._send_some(sock, message)
+            except (BlockingIOError, InterruptedError):
+                break
+            written += sent
+            self.pending_bytes -= sent
+            self._offset += sent
+
+            if self._offset >= len(message):
+                self._next_message()
+            elif not sent:
+                break
+        return written
+
+    def clear(self) -> None:
+        """Drop every queued message."""
+        while self._queue:
+            self._next_message()
+        self.pending_bytes = 0
+
+    def _send_some(self, sock: socket.socket, message: PackedMessage) -> int:
+        if self._offset < len(message.header):
+            return sock.send(message.header[self._offset :])
+
+        position = self._offset - len(message.header)
+        if not isinstance(message.payload, pathlib.Path):
+            return sock.send(message.payload[position : position + RECV_SIZE])
+
+        if not self._file:
+            self._file = message.payload.open("rb")
+        remaining = message.payload_length - position
+        if hasattr(os, "sendfile"):
+            sent = os.sendfile(sock.fileno(), self._file.fileno(), position, remaining)
+        else:
+            self._file.seek(position)
+            sent = sock.send(self._file.read(min(remaining, RECV_SIZE)))
+        if not sent:
+            # The end of the file has been reached: the header announced more bytes than
+            # there are, and the message can never be completed.
+            raise OSError(f"{message.payload} is shorter than announced.")
+        return sent
+
+    def _next_message(self) -> None:
+        message = self._queue.popleft()
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._offset = 0
+        message.discard()
 
 
 class MessageBuffer:
     """The MessageBuffer class is used to receive message parts, while allowing the
     ability to instantly read metadata contained into the message.
 
-    It also allow to store message parts into a buffer, so that it can be transformed
-    later on as a Message.
+    The header is parsed as soon as it is complete, and the payload is then stored in a
+    buffer, that is spooled to the disk when it grows too large, so that it can be
+    transformed later on as a Message.
     """
 
     def __init__(self):
-        self.buffer = BytesIO()
+        self.header = bytearray()
+        self.metadata: dict[str, str] | None = None
+        self.payload = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        self.remaining = 0
+
+    def push(self, data: bytes) -> bytes:
+        """Append data to the end of the buffer.
 
-    def push(self, data: bytes) -> None:
-        """Append data to the end of the buffer."""
-        self.buffer.write(data)
+        Returns
+        -------
+        bytes
+            The data that was not consumed, because it belongs to the next message.
 
-    def read(self) -> str:
-        """Read the whole buffer and return it as a string."""
-        self.buffer.seek(os.SEEK_SET)
-        return self.buffer.read().decode()
+        Raises
+        ------
+        ValueError
+            The header is too large or invalid, or the payload is larger than
+            :py:data:`MAX_PAYLOAD_SIZE`.
+        """
+        if self.metadata is None:
+            start = max(0, len(self.header) - len(HEADER_END) + 1)
+            self.header += data
+            end = self.header.find(HEADER_END, start)
+            if end == -1:
+                if len(self.header) > MAX_HEADER_SIZE:
+                    raise ValueError("Message header is too large.")
+                return b""
+
+            end += len(HEADER_END)
+            data = bytes(self.header[end:])
+            del self.header[end:]
+            self.metadata = unpack_message(self.header.decode())
+            try:
+                self.remaining = int(self.metadata[KnownMetadata.LENGTH.value])
+            except (KeyError, ValueError):
+                raise ValueError("Invalid message length.") from None
+            if self.remaining < 0:
+                raise ValueError("Invalid message length.")
+            if self.remaining > MAX_PAYLOAD_SIZE:
+                raise ValueError("Message payload is too large.")
+
+        consumed = data[: self.remaining]
+        self.payload.write(consumed)
+        self.remaining -= len(consumed)
+        return data[len(consumed) :]
+
+    def read(self) -> bytes:
+        """Read the whole payload."""
+        self.payload.seek(os.SEEK_SET)
+        return self.payload.read()
 
     @property
     def is_complete(self) -> bool:
@@ -147,11 +920,9 @@ class MessageBuffer:
         Returns
         -------
         bool
-            True if the length matches the length of the data, otherwise False.
+            True if the whole payload has been received, otherwise False.
         """
-        current_data = self.read()
-        metadata = unpack_message(current_data)
-        return metadata[KnownMetadata.LENGTH.value] == str(len(metadata["DATA"]))
+        return self.metadata is not None and self.remaining == 0
 
     def get_raw(self, socket: socket.socket) -> "RawMessage":
         """Transform the current buffer into a Message object.
@@ -161,7 +932,11 @@ class MessageBuffer:
         Message
             Transformed content into a Message object.
         """
-        return RawMessage(socket, unpack_message(self.read()))
+        assert self.metadata is not None
+        metadata = dict(self.metadata)
+        metadata[KnownMetadata.DATA.value] = self.read().decode(errors="replace")
+        self.payload.close()
+        return RawMessage(socket, metadata)
 
     def get_message(self, socket: socket.socket):
         return self.get_raw(socket).get_class_type()
@@ -208,6 +983,68 @@ class RawMessage:
                 return ErrorMessage(
                     self.socket, typing.cast(ErrorMetadata, self.metadata)
                 )
+            case "JOB":
+                return JobMessage(self.socket, typing.cast(JobMetadata, self.metadata))
+            case "RESULT":
+                return ResultMessage(
+                    self.socket, typing.cast(ResultMetadata, self.metadata)
+                )
+            case "STATUS":
+                return StatusMessage(
+                    self.socket, typing.cast(StatusMetadata, self.metadata)
+                )
+            case "CANCEL":
+                return CancelMessage(
+                    self.socket, typing.cast(CancelMetadata, self.metadata)
+                )
+            case "TEST_SUITE":
+                return TestSuiteMessage(
+                    self.socket, typing.cast(TestSuiteMetadata, self.metadata)
+                )
+            case "TEST_REPORT":
+                return TestReportMessage(
+                    self.socket, typing.cast(TestReportMetadata, self.metadata)
+                )
+            case "BENCHMARK":
+                return BenchmarkMessage(
+                    self.socket, typing.cast(BenchmarkMetadata, self.metadata)
+                )
+            case "BENCHMARK_REPORT":
+                return BenchmarkReportMessage(
+                    self.socket, typing.cast(BenchmarkReportMetadata, self.metadata)
+                )
+            case "INPUT":
+                return InputMessage(
+                    self.socket, typing.cast(InputMetadata, self.metadata)
+                )
+            case "OUTPUT":
+                return OutputMessage(
+                    self.socket, typing.cast(OutputMetadata, self.metadata)
+                )
+            case "CREDIT":
+                return CreditMessage(
+                    self.socket, typing.cast(CreditMetadata, self.metadata)
+                )
+            case "PROFILE":
+                return ProfileMessage(
+                    self.socket, typing.cast(ProfileMetadata, self.metadata)
+                )
+            case "OFFER":
+                return OfferMessage(
+                    self.socket, typing.cast(OfferMetadata, self.metadata)
+                )
+            case "MISSING":
+                return MissingMessage(
+                    self.socket, typing.cast(MissingMetadata, self.metadata)
+                )
+            case "BLOB":
+                return BlobMessage(
+                    self.socket, typing.cast(BlobMetadata, self.metadata)
+                )
+            case "DELTA":
+                return DeltaMessage(
+                    self.socket, typing.cast(DeltaMetadata, self.metadata)
+                )
             case _:
                 raise KeyError("Unknown message type.")
 
@@ -253,7 +1090,7 @@ class BaseMessage[TypeMetadata: BaseMetadata](abc.ABC):
 
     @staticmethod
     @abc.abstractmethod
-    def create_message(*args: typing.Any, **kwargs: typing.Any) -> str:
+    def create_message(*args: typing.Any, **kwargs: typing.Any) -> PackedMessage:
         """This method will create a message ready to be sent in the socket.
 
         Parameters
@@ -272,8 +1109,8 @@ class BaseMessage[TypeMetadata: BaseMetadata](abc.ABC):
         """
         raise NotImplementedError("Not implemented")
 
-    def reply(self, message: str) -> None:
-        self.__socket.send(message.encode())
+    def reply(self, message: PackedMessage) -> None:
+        message.send(self.__socket)
 
 
 class Message(BaseMessage[MessageMetadata]):
@@ -284,15 +1121,16 @@ class Message(BaseMessage[MessageMetadata]):
         self.message = metadata["DATA"]
 
     @staticmethod
-    def create_message(message: str):
+    def create_message(message: str) -> PackedMessage:
+        payload = message.encode()
+        checksum, length = payload_metadata(payload)
         metadata = MessageMetadata(
-            DATA_CHECKSUM=calculate_checksum(message),
-            DATA_LENGTH=str(len(message)),
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
             DATA_TYPE="MSG",
-            DATA=message,
         )
 
-        return pack_message(metadata)
+        return pack_message(metadata, payload)
 
     def emit(self, events: "events.Events"):
         _log.debug("Emitting message: %s", self.message)
@@ -303,27 +1141,68 @@ class FileMessage(BaseMessage[FileMetadata]):
     file_name: str
     file_content: str
     chosen_executor: str | typing.Literal["auto"]
+    build_profile: str | None
+    priority: str | None
+    detached: bool
+    interactive: bool
+    profiled: bool
+    blob: str | None
+    """The hash of the file, if its content was uploaded beforehand. See
+    :py:class:`BlobMessage`.
+    """
 
     def __init__(self, socket: socket.socket, metadata: FileMetadata):
         super().__init__(socket, metadata)
         self.file_name = metadata["DATA_FILENAME"]
-        self.file_content = json.loads(metadata["DATA"])["data"]
+        self.file_content = metadata["DATA"]
         self.chosen_executor = metadata.get("CHOSEN_EXECUTOR") or "auto"
+        self.build_profile = metadata.get("BUILD_PROFILE")
+        self.priority = metadata.get("PRIORITY")
+        self.detached = metadata.get("DETACHED") == "True"
+        self.interactive = metadata.get("INTERACTIVE") == "True"
+        self.profiled = metadata.get("PROFILED") == "True"
+        self.blob = metadata.get("BLOB")
 
     @staticmethod
     def create_message(
-        file: pathlib.Path, executor: str | typing.Literal["auto"]
-    ) -> str:
-        content = json.dumps({"data": file.read_text()})
+        file: pathlib.Path,
+        executor: str | typing.Literal["auto"],
+        *,
+        build_profile: str | None = None,
+        priority: str | None = None,
+        detached: bool = False,
+        interactive: bool = False,
+        profiled: bool = False,
+        by_hash: bool = False,
+    ) -> PackedMessage:
+        """The file is copied, then its content is sent straight from the disk, so that
+        editing it meanwhile does not change what is sent.
+
+        If ``by_hash`` is True, only the hash of the file is sent: it must have been
+        uploaded beforehand (See :py:class:`OfferMessage`).
+        """
+        payload: bytes | pathlib.Path = b"" if by_hash else snapshot(file)
+        checksum, length = payload_metadata(payload)
         metadata = FileMetadata(
-            DATA_CHECKSUM=calculate_checksum(content),
-            DATA_LENGTH=str(len(content)),
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
             DATA_TYPE="FILE",
             DATA_FILENAME=file.name,
             CHOSEN_EXECUTOR=executor,
-            DATA=content,
         )
-        return pack_message(metadata)
+        if build_profile:
+            metadata["BUILD_PROFILE"] = build_profile
+        if priority:
+            metadata["PRIORITY"] = priority
+        if detached:
+            metadata["DETACHED"] = "True"
+        if interactive:
+            metadata["INTERACTIVE"] = "True"
+        if profiled:
+            metadata["PROFILED"] = "True"
+        if by_hash:
+            metadata["BLOB"] = blob_hash(file)
+        return pack_message(metadata, payload, delete_after_send=not by_hash)
 
     def emit(self, events: "events.Events"):
         events.on_file.emit(self)
@@ -332,23 +1211,40 @@ class FileMessage(BaseMessage[FileMetadata]):
 class LogsMessage(BaseMessage[LogsMetadata]):
     logs: str
     status: int
+    job_id: str | None
+    stats: ExecutionStats | None
 
     def __init__(self, socket: socket.socket, metadata: LogsMetadata):
         super().__init__(socket, metadata)
-        self.logs = json.loads(metadata["DATA"])["data"]
+        self.logs = metadata["DATA"]
         self.status = int(metadata["STATUS"])
+        self.job_id = metadata.get("JOB_ID")
+        self.stats = json.loads(metadata["STATS"]) if "STATS" in metadata else None
 
     @staticmethod
-    def create_message(status: str, logs: str) -> str:
-        data = json.dumps({"data": logs})
+    def create_message(
+        status: str,
+        logs: str | pathlib.Path,
+        *,
+        job_id: str | None = None,
+        delete_after_send: bool = False,
+        stats: ExecutionStats | None = None,
+    ) -> PackedMessage:
+        """Logs can either be given as a string, or as the path of the file they have
+        been spooled into. ``delete_after_send`` only applies to the latter."""
+        payload = logs if isinstance(logs, pathlib.Path) else logs.encode()
+        checksum, length = payload_metadata(payload)
         metadata = LogsMetadata(
-            DATA_CHECKSUM=calculate_checksum(data),
-            DATA_LENGTH=str(len(data)),
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
             DATA_TYPE="LOGS",
-            DATA=data,
             STATUS=status,
         )
-        return pack_message(metadata)
+        if job_id:
+            metadata["JOB_ID"] = job_id
+        if stats:
+            metadata["STATS"] = json.dumps(stats)
+        return pack_message(metadata, payload, delete_after_send=delete_after_send)
 
     def emit(self, events: "events.Events"):
         events.on_logs.emit(self)
@@ -362,20 +1258,22 @@ class CapabilitiesMessage(BaseMessage[CapabilitiesMetadata]):
         self.capabilities = json.loads(metadata["DATA"])
 
     @staticmethod
-    def create_message(available_executors: dict["BaseExecutor", bool]) -> str:
-        data = json.dumps(
+    def create_message(
+        available_executors: dict["BaseExecutor", bool],
+    ) -> PackedMessage:
+        payload = json.dumps(
             {
                 executor[0].friendly_name: executor[1]
                 for executor in available_executors.items()
             }
-        )
+        ).encode()
+        checksum, length = payload_metadata(payload)
         metadata = CapabilitiesMetadata(
-            DATA_CHECKSUM=calculate_checksum(data),
-            DATA_LENGTH=str(len(data)),
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
             DATA_TYPE="CAPABILITIES",
-            DATA=data,
         )
-        return pack_message(metadata)
+        return pack_message(metadata, payload)
 
     def emit(self, events: "events.Events"):
         events.on_capabilities.emit(self)
@@ -384,25 +1282,730 @@ class CapabilitiesMessage(BaseMessage[CapabilitiesMetadata]):
 class ErrorMessage(BaseMessage[ErrorMetadata]):
     gravity: ERROR_GRAVITY
     message: str
+    job_id: str | None
 
     def __init__(self, socket: socket.socket, metadata: ErrorMetadata):
         super().__init__(socket, metadata)
         self.message = metadata["DATA"]
         self.gravity = metadata["GRAVITY"]
+        self.job_id = metadata.get("JOB_ID")
 
     @staticmethod
-    def create_message(gravity: ERROR_GRAVITY, message: str) -> str:
+    def create_message(
+        gravity: ERROR_GRAVITY, message: str, *, job_id: str | None = None
+    ) -> PackedMessage:
+        payload = message.encode()
+        checksum, length = payload_metadata(payload)
         metadata = ErrorMetadata(
-            DATA_CHECKSUM=calculate_checksum(message),
-            DATA_LENGTH=str(len(message)),
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
             DATA_TYPE="ERROR",
             GRAVITY=gravity,
-            DATA=message,
         )
-        return pack_message(metadata)
+        if job_id:
+            metadata["JOB_ID"] = job_id
+        return pack_message(metadata, payload)
 
     def emit(self, events: "events.Events"):
         events.on_error.emit(self)
 
 
-type ALL_MESSAGES = Message | FileMessage | LogsMessage | CapabilitiesMessage | ErrorMessage
+class JobMessage(BaseMessage[JobMetadata]):
+    """Sent by the server to indicate the state of a job. It is sent as soon as a file
+    has been received, so that the client knows the identifier of its job."""
+
+    job_id: str
+    state: str
+    queue_position: int | None
+
+    def __init__(self, socket: socket.socket, metadata: JobMetadata):
+        super().__init__(socket, metadata)
+        self.job_id = metadata["JOB_ID"]
+        self.state = metadata["STATE"]
+        position = metadata.get("QUEUE_POSITION")
+        self.queue_position = int(position) if position else None
+
+    @staticmethod
+    def create_message(
+        job_id: str, state: str, *, queue_position: int | None = None
+    ) -> PackedMessage:
+        checksum, length = payload_metadata(b"")
+        metadata = JobMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="JOB",
+            JOB_ID=job_id,
+            STATE=state,
+        )
+        if queue_position is not None:
+            metadata["QUEUE_POSITION"] = str(queue_position)
+        return pack_message(metadata)
+
+    def emit(self, events: "events.Events"):
+        events.on_job.emit(self)
+
+
+class ResultMessage(BaseMessage[ResultMetadata]):
+    """Sent by the client to fetch the result of a job, possibly submitted from a
+    previous connection. The server answers with the logs if the job is over, with its
+    current state otherwise."""
+
+    job_id: str
+
+    def __init__(self, socket: socket.socket, metadata: ResultMetadata):
+        super().__init__(socket, metadata)
+        self.job_id = metadata["JOB_ID"]
+
+    @staticmethod
+    def create_message(job_id: str) -> PackedMessage:
+        checksum, length = payload_metadata(b"")
+        metadata = ResultMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="RESULT",
+            JOB_ID=job_id,
+        )
+        return pack_message(metadata)
+
+    def emit(self, events: "events.Events"):
+        events.on_result.emit(self)
+
+
+class StatusMessage(BaseMessage[StatusMetadata]):
+    """Sent by the client to know the state of a job, from any connection. The server
+    answers with a :py:class:`JobMessage`. When subscribing, the result of the job is
+    also sent to this connection once the job is over."""
+
+    job_id: str
+    subscribe: bool
+
+    def __init__(self, socket: socket.socket, metadata: StatusMetadata):
+        super().__init__(socket, metadata)
+        self.job_id = metadata["JOB_ID"]
+        self.subscribe = metadata.get("SUBSCRIBE") == "True"
+
+    @staticmethod
+    def create_message(job_id: str, *, subscribe: bool = False) -> PackedMessage:
+        checksum, length = payload_metadata(b"")
+        metadata = StatusMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="STATUS",
+            JOB_ID=job_id,
+        )
+        if subscribe:
+            metadata["SUBSCRIBE"] = "True"
+        return pack_message(metadata)
+
+    def emit(self, events: "events.Events"):
+        events.on_status.emit(self)
+
+
+class CancelMessage(BaseMessage[CancelMetadata]):
+    """Sent by the client to cancel a job. A waiting job is removed from the queue,
+    while a running job has its process killed. The server answers with a
+    :py:class:`JobMessage`.
+    """
+
+    job_id: str
+
+    def __init__(self, socket: socket.socket, metadata: CancelMetadata):
+        super().__init__(socket, metadata)
+        self.job_id = metadata["JOB_ID"]
+
+    @staticmethod
+    def create_message(job_id: str) -> PackedMessage:
+        checksum, length = payload_metadata(b"")
+        metadata = CancelMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="CANCEL",
+            JOB_ID=job_id,
+        )
+        return pack_message(metadata)
+
+    def emit(self, events: "events.Events"):
+        events.on_cancel.emit(self)
+
+
+class TestSuiteMessage(BaseMessage[TestSuiteMetadata]):
+    """Sent by the client to check a file against test cases. The file is built once,
+    then ran for every case. The server answers like for a :py:class:`FileMessage`, but
+    with a :py:class:`TestReportMessage` instead of the logs.
+
+    The payload is a JSON object, holding the ``source`` of the file and its ``cases``
+    (See :py:class:`TestCase`). The hash of a file uploaded beforehand may be given as
+    its ``source_blob`` instead of its source.
+    """
+
+    file_name: str
+    chosen_executor: str | typing.Literal["auto"]
+    build_profile: str | None
+    priority: str | None
+
+    def __init__(self, socket: socket.socket, metadata: TestSuiteMetadata):
+        super().__init__(socket, metadata)
+        self.file_name = metadata["DATA_FILENAME"]
+        self.chosen_executor = metadata.get("CHOSEN_EXECUTOR") or "auto"
+        self.build_profile = metadata.get("BUILD_PROFILE")
+        self.priority = metadata.get("PRIORITY")
+        self._payload = metadata["DATA"]
+
+    def read_suite(
+        self, resolve: typing.Callable[[str], str] | None = None
+    ) -> tuple[str, list[TestCase]]:
+        """Decode the payload.
+
+        Parameters
+        ----------
+        resolve : typing.Callable[[str], str] | None
+            Gives the content of an uploaded file from its hash, raising
+            :py:exc:`ValueError` when it is unknown. Files cannot be given by hash
+            without it.
+
+        Returns
+        -------
+        tuple[str, list[TestCase]]
+            The content of the file, and its cases.
+
+        Raises
+        ------
+        ValueError
+            The payload is not a valid test suite.
+        """
+        try:
+            suite = json.loads(self._payload)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid test suite: {e}") from e
+        if not isinstance(suite, dict):
+            raise ValueError("Invalid test suite: the source of the file is missing.")
+        return _read_source(suite, resolve), parse_test_cases(suite.get("cases"))
+
+    @staticmethod
+    def create_message(
+        file: pathlib.Path,
+        cases: list[TestCase],
+        executor: str | typing.Literal["auto"] = "auto",
+        *,
+        build_profile: str | None = None,
+        priority: str | None = None,
+        by_hash: bool = False,
+    ) -> PackedMessage:
+        """If ``by_hash`` is True, only the hash of the file is sent: it must have been
+        uploaded beforehand (See :py:class:`OfferMessage`)."""
+        suite: dict[str, typing.Any] = _source_of(file, by_hash)
+        suite["cases"] = cases
+        payload = json.dumps(suite).encode()
+        checksum, length = payload_metadata(payload)
+        metadata = TestSuiteMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="TEST_SUITE",
+            DATA_FILENAME=file.name,
+            CHOSEN_EXECUTOR=executor,
+        )
+        if build_profile:
+            metadata["BUILD_PROFILE"] = build_profile
+        if priority:
+            metadata["PRIORITY"] = priority
+        return pack_message(metadata, payload)
+
+    def emit(self, events: "events.Events"):
+        events.on_test_suite.emit(self)
+
+
+class TestReportMessage(BaseMessage[TestReportMetadata]):
+    """Sent by the server once every case of a test suite has been ran. Differences with
+    the expected outputs are only given for the cases that failed."""
+
+    job_id: str
+    passed: int
+    total: int
+    results: list[TestCaseResult]
+
+    def __init__(self, socket: socket.socket, metadata: TestReportMetadata):
+        super().__init__(socket, metadata)
+        self.job_id = metadata["JOB_ID"]
+        self.passed = int(metadata["PASSED"])
+        self.total = int(metadata["TOTAL"])
+        self.results = json.loads(metadata["DATA"])
+
+    @staticmethod
+    def create_message(job_id: str, results: list[TestCaseResult]) -> PackedMessage:
+        payload = json.dumps(results).encode()
+        checksum, length = payload_metadata(payload)
+        metadata = TestReportMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="TEST_REPORT",
+            JOB_ID=job_id,
+            PASSED=str(sum(result["status"] == "PASSED" for result in results)),
+            TOTAL=str(len(results)),
+        )
+        return pack_message(metadata, payload)
+
+    def emit(self, events: "events.Events"):
+        events.on_test_report.emit(self)
+
+
+class BenchmarkMessage(BaseMessage[BenchmarkMetadata]):
+    """Sent by the client to measure how fast a file runs. The file is built once, then
+    ran several times, one run at a time. The server answers like for a
+    :py:class:`FileMessage`, but with a :py:class:`BenchmarkReportMessage` instead of
+    the logs, unless a run fails.
+
+    The payload is a JSON object, holding the ``source`` of the file and its settings
+    (See :py:class:`BenchmarkSettings`). The hash of a file uploaded beforehand may be
+    given as its ``source_blob`` instead of its source, for the file and for its
+    baseline.
+    """
+
+    file_name: str
+    chosen_executor: str | typing.Literal["auto"]
+    build_profile: str | None
+    priority: str | None
+
+    def __init__(self, socket: socket.socket, metadata: BenchmarkMetadata):
+        super().__init__(socket, metadata)
+        self.file_name = metadata["DATA_FILENAME"]
+        self.chosen_executor = metadata.get("CHOSEN_EXECUTOR") or "auto"
+        self.build_profile = metadata.get("BUILD_PROFILE")
+        self.priority = metadata.get("PRIORITY")
+        self._payload = metadata["DATA"]
+
+    def read_benchmark(
+        self, resolve: typing.Callable[[str], str] | None = None
+    ) -> tuple[str, BenchmarkSettings]:
+        """Decode the payload.
+
+        Parameters
+        ----------
+        resolve : typing.Callable[[str], str] | None
+            Gives the content of an uploaded file from its hash, raising
+            :py:exc:`ValueError` when it is unknown. Files cannot be given by hash
+            without it.
+
+        Returns
+        -------
+        tuple[str, BenchmarkSettings]
+            The content of the file, and the settings of the benchmark.
+
+        Raises
+        ------
+        ValueError
+            The payload is not a valid benchmark.
+        """
+        try:
+            settings = json.loads(self._payload)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid benchmark: {e}") from e
+        if not isinstance(settings, dict):
+            raise ValueError("Invalid benchmark: the source of the file is missing.")
+        source = _read_source(settings, resolve)
+        settings.pop("source", None)
+        settings.pop("source_blob", None)
+        baseline = settings.get("baseline")
+        if isinstance(baseline, dict) and "source_blob" in baseline:
+            baseline["source"] = _read_source(baseline, resolve)
+            del baseline["source_blob"]
+        return source, parse_benchmark(settings)
+
+    @staticmethod
+    def create_message(
+        file: pathlib.Path,
+        executor: str | typing.Literal["auto"] = "auto",
+        *,
+        runs: int = DEFAULT_BENCHMARK_RUNS,
+        warmups: int = DEFAULT_WARMUP_RUNS,
+        stdin: str = "",
+        args: list[str] | None = None,
+        baseline: pathlib.Path | None = None,
+        build_profile: str | None = None,
+        priority: str | None = None,
+        by_hash: bool = False,
+    ) -> PackedMessage:
+        """If ``by_hash`` is True, only the hashes of the file and of its baseline are
+        sent: they must have been uploaded beforehand (See :py:class:`OfferMessage`)."""
+        settings: dict[str, typing.Any] = _source_of(file, by_hash)
+        settings.update(runs=runs, warmups=warmups, stdin=stdin, args=args or [])
+        if baseline:
+            settings["baseline"] = {
+                "file_name": baseline.name,
+                **_source_of(baseline, by_hash),
+            }
+        payload = json.dumps(settings).encode()
+        checksum, length = payload_metadata(payload)
+        metadata = BenchmarkMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="BENCHMARK",
+            DATA_FILENAME=file.name,
+            CHOSEN_EXECUTOR=executor,
+        )
+        if build_profile:
+            metadata["BUILD_PROFILE"] = build_profile
+        if priority:
+            metadata["PRIORITY"] = priority
+        return pack_message(metadata, payload)
+
+    def emit(self, events: "events.Events"):
+        events.on_benchmark.emit(self)
+
+
+class BenchmarkReportMessage(BaseMessage[BenchmarkReportMetadata]):
+    """Sent by the server once every run of a benchmark is over. The payload is a JSON
+    object (See :py:class:`BenchmarkReport`)."""
+
+    job_id: str
+    report: BenchmarkReport
+
+    def __init__(self, socket: socket.socket, metadata: BenchmarkReportMetadata):
+        super().__init__(socket, metadata)
+        self.job_id = metadata["JOB_ID"]
+        self.report = json.loads(metadata["DATA"])
+
+    @staticmethod
+    def create_message(job_id: str, report: BenchmarkReport) -> PackedMessage:
+        payload = json.dumps(report).encode()
+        checksum, length = payload_metadata(payload)
+        metadata = BenchmarkReportMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="BENCHMARK_REPORT",
+            JOB_ID=job_id,
+        )
+        return pack_message(metadata, payload)
+
+    def emit(self, events: "events.Events"):
+        events.on_benchmark_report.emit(self)
+
+
+class InputMessage(BaseMessage[InputMetadata]):
+    """Sent by the client to write to the standard input of its interactive job. The
+    client may send :py:data:`STREAM_WINDOW` bytes of input at first, then as many as
+    the server grants with :py:class:`CreditMessage`."""
+
+    job_id: str
+    data: str
+    eof: bool
+
+    def __init__(self, socket: socket.socket, metadata: InputMetadata):
+        super().__init__(socket, metadata)
+        self.job_id = metadata["JOB_ID"]
+        self.data = metadata["DATA"]
+        self.eof = metadata.get("EOF") == "True"
+
+    @staticmethod
+    def create_message(job_id: str, data: str, *, eof: bool = False) -> PackedMessage:
+        payload = data.encode()
+        checksum, length = payload_metadata(payload)
+        metadata = InputMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="INPUT",
+            JOB_ID=job_id,
+        )
+        if eof:
+            metadata["EOF"] = "True"
+        return pack_message(metadata, payload)
+
+    def emit(self, events: "events.Events"):
+        events.on_input.emit(self)
+
+
+class OutputMessage(BaseMessage[OutputMetadata]):
+    """Sent by the server with what an interactive job has just printed. The server
+    sends :py:data:`STREAM_WINDOW` bytes of output at first, then as many as the client
+    grants with :py:class:`CreditMessage`. The program is paused while the client does
+    not grant more.
+    """
+
+    job_id: str
+    data: str
+
+    def __init__(self, socket: socket.socket, metadata: OutputMetadata):
+        super().__init__(socket, metadata)
+        self.job_id = metadata["JOB_ID"]
+        self.data = metadata["DATA"]
+
+    @staticmethod
+    def create_message(job_id: str, data: str) -> PackedMessage:
+        payload = data.encode()
+        checksum, length = payload_metadata(payload)
+        metadata = OutputMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="OUTPUT",
+            JOB_ID=job_id,
+        )
+        return pack_message(metadata, payload)
+
+    def emit(self, events: "events.Events"):
+        events.on_output.emit(self)
+
+
+class CreditMessage(BaseMessage[CreditMetadata]):
+    """Sent by either side of an interactive job, once it has consumed data of a stream,
+    to let the other side send more of it."""
+
+    job_id: str
+    stream: typing.Literal["INPUT", "OUTPUT"]
+    bytes: int
+
+    def __init__(self, socket: socket.socket, metadata: CreditMetadata):
+        super().__init__(socket, metadata)
+        self.job_id = metadata["JOB_ID"]
+        self.stream = metadata["STREAM"]
+        self.bytes = int(metadata["BYTES"])
+
+    @staticmethod
+    def create_message(
+        job_id: str, stream: typing.Literal["INPUT", "OUTPUT"], amount: int
+    ) -> PackedMessage:
+        checksum, length = payload_metadata(b"")
+        metadata = CreditMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="CREDIT",
+            JOB_ID=job_id,
+            STREAM=stream,
+            BYTES=str(amount),
+        )
+        return pack_message(metadata)
+
+    def emit(self, events: "events.Events"):
+        events.on_credit.emit(self)
+
+
+class ProfileMessage(BaseMessage[ProfileMetadata]):
+    """Sent by the server once a profiled job is over, right before its logs. The
+    payload is a JSON object (See :py:class:`ProfileReport`)."""
+
+    job_id: str
+    report: ProfileReport
+
+    def __init__(self, socket: socket.socket, metadata: ProfileMetadata):
+        super().__init__(socket, metadata)
+        self.job_id = metadata["JOB_ID"]
+        self.report = json.loads(metadata["DATA"])
+
+    @staticmethod
+    def create_message(job_id: str, report: ProfileReport) -> PackedMessage:
+        payload = json.dumps(report).encode()
+        checksum, length = payload_metadata(payload)
+        metadata = ProfileMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="PROFILE",
+            JOB_ID=job_id,
+        )
+        return pack_message(metadata, payload)
+
+    def emit(self, events: "events.Events"):
+        events.on_profile.emit(self)
+
+
+class OfferMessage(BaseMessage[OfferMetadata]):
+    """Sent by the client before sending files by hash, such as with
+    :py:meth:`FileMessage.create_message`. The server answers with a
+    :py:class:`MissingMessage`, listing the files the client must upload with a
+    :py:class:`BlobMessage`, so that files the server already has are not sent twice.
+
+    The payload is a JSON list of the hashes of the files (See :py:func:`blob_hash`), or
+    an object holding this list as its ``hashes``, and the hash of an older version of
+    some of these files as their ``bases``. Files with a base the server has may then be
+    uploaded as a :py:class:`DeltaMessage`.
+    """
+
+    def __init__(self, socket: socket.socket, metadata: OfferMetadata):
+        super().__init__(socket, metadata)
+        self._payload = metadata["DATA"]
+
+    def read_offer(self) -> tuple[list[str], dict[str, str]]:
+        """Decode the payload.
+
+        Returns
+        -------
+        tuple[list[str], dict[str, str]]
+            The hashes of the files, and the hash of the base of some of them.
+
+        Raises
+        ------
+        ValueError
+            The payload is not a valid offer.
+        """
+        try:
+            offer = json.loads(self._payload)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid offer: {e}") from e
+        if not isinstance(offer, dict):
+            return parse_blob_hashes(offer), {}
+        hashes = parse_blob_hashes(offer.get("hashes"))
+        bases = offer.get("bases") or {}
+        if not isinstance(bases, dict):
+            raise ValueError("The bases of the offered files must be an object.")
+        parse_blob_hashes(list(bases.values()))
+        return hashes, {blob: bases[blob] for blob in hashes if blob in bases}
+
+    @staticmethod
+    def create_message(
+        hashes: list[str], bases: dict[str, str] | None = None
+    ) -> PackedMessage:
+        offer = {"hashes": hashes, "bases": bases} if bases else hashes
+        payload = json.dumps(offer).encode()
+        checksum, length = payload_metadata(payload)
+        metadata = OfferMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="OFFER",
+        )
+        return pack_message(metadata, payload)
+
+    def emit(self, events: "events.Events"):
+        events.on_offer.emit(self)
+
+
+class MissingMessage(BaseMessage[MissingMetadata]):
+    """Sent by the server in answer to an :py:class:`OfferMessage`. The payload is a
+    JSON list of the offered hashes of the files it does not have, in the order they
+    were offered, or an object holding this list as its ``hashes``, and the signature of
+    the base of some of these files as their ``signatures``."""
+
+    hashes: list[str]
+    signatures: dict[str, FileSignature]
+    """The signature of the base of the missing files that may be uploaded as a
+    :py:class:`DeltaMessage`, by hash."""
+
+    def __init__(self, socket: socket.socket, metadata: MissingMetadata):
+        super().__init__(socket, metadata)
+        missing = json.loads(metadata["DATA"])
+        if isinstance(missing, dict):
+            self.hashes = missing["hashes"]
+            self.signatures = missing["signatures"]
+        else:
+            self.hashes = missing
+            self.signatures = {}
+
+    @staticmethod
+    def create_message(
+        hashes: list[str], signatures: dict[str, FileSignature] | None = None
+    ) -> PackedMessage:
+        missing = {"hashes": hashes, "signatures": signatures} if signatures else hashes
+        payload = json.dumps(missing).encode()
+        checksum, length = payload_metadata(payload)
+        metadata = MissingMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="MISSING",
+        )
+        return pack_message(metadata, payload)
+
+    def emit(self, events: "events.Events"):
+        events.on_missing.emit(self)
+
+
+class BlobMessage(BaseMessage[BlobMetadata]):
+    """Sent by the client to upload a file listed in a :py:class:`MissingMessage`. The
+    payload is the content of the file, that the server keeps by its hash."""
+
+    content: str
+
+    def __init__(self, socket: socket.socket, metadata: BlobMetadata):
+        super().__init__(socket, metadata)
+        self.content = metadata["DATA"]
+
+    @staticmethod
+    def create_message(file: pathlib.Path) -> PackedMessage:
+        """The file is copied, then its content is sent straight from the disk, so that
+        editing it meanwhile does not change what is sent."""
+        payload = snapshot(file)
+        checksum, length = payload_metadata(payload)
+        metadata = BlobMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="BLOB",
+        )
+        return pack_message(metadata, payload, delete_after_send=True)
+
+    def emit(self, events: "events.Events"):
+        events.on_blob.emit(self)
+
+
+class DeltaMessage(BaseMessage[DeltaMetadata]):
+    """Sent by the client to upload a file listed in a :py:class:`MissingMessage` with
+    the signature of an older version, as its differences with that version. The payload
+    is a JSON list of instructions rebuilding the file (See
+    :py:func:`sae302.commons.delta.diff`).
+    """
+
+    blob: str
+    base: str
+    block_size: int
+
+    def __init__(self, socket: socket.socket, metadata: DeltaMetadata):
+        super().__init__(socket, metadata)
+        self.blob = metadata["BLOB"]
+        self.base = metadata["BASE"]
+        self.block_size = int(metadata["BLOCK_SIZE"])
+        self._payload = metadata["DATA"]
+
+    def read_instructions(self) -> list[delta.Instruction]:
+        """Decode the payload.
+
+        Raises
+        ------
+        ValueError
+            The payload is not a list.
+        """
+        try:
+            instructions = json.loads(self._payload)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid delta: {e}") from e
+        if not isinstance(instructions, list):
+            raise ValueError("Invalid delta: the instructions must be a list.")
+        return instructions
+
+    @staticmethod
+    def create_message(file: pathlib.Path, base: FileSignature) -> PackedMessage:
+        content = file.read_bytes()
+        payload = json.dumps(
+            delta.diff(content.decode(errors="replace"), base)
+        ).encode()
+        checksum, length = payload_metadata(payload)
+        metadata = DeltaMetadata(
+            DATA_CHECKSUM=checksum,
+            DATA_LENGTH=length,
+            DATA_TYPE="DELTA",
+            BLOB=blob_hash(content),
+            BASE=base["base"],
+            BLOCK_SIZE=str(base["block_size"]),
+        )
+        return pack_message(metadata, payload)
+
+    def emit(self, events: "events.Events"):
+        events.on_delta.emit(self)
+
+
+type ALL_MESSAGES = (
+    Message
+    | FileMessage
+    | LogsMessage
+    | CapabilitiesMessage
+    | ErrorMessage
+    | JobMessage
+    | ResultMessage
+    | StatusMessage
+    | CancelMessage
+    | TestSuiteMessage
+    | TestReportMessage
+    | InputMessage
+    | OutputMessage
+    | CreditMessage
+    | BenchmarkMessage
+    | BenchmarkReportMessage
+    | ProfileMessage
+    | OfferMessage
+    | MissingMessage
+    | BlobMessage
+    | DeltaMessage
+)
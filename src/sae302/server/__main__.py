@@ -1,160 +1,1115 @@
 from __future__ import annotations
 
 import argparse
+import concurrent.futures
 import contextlib
+import functools
+import json
 import logging
+import os
+import pathlib
 import queue
+import signal
 import socket
+import sqlite3
 import sys
+import tempfile
 import threading
+import time
+import typing
 
 from sae302.commons import messages
-from sae302.server.executor import BaseExecutor, ExecutorFactory
+from sae302.server import benchmark, grading
+from sae302.server.backends import BACKENDS, ExecutionBackend, create_backend
+from sae302.server.benchmark import CpuPool
+from sae302.server.blobs import BlobStore
+from sae302.server.connection import DEFAULT_BUFFER_BUDGET, Connection
+from sae302.server.executor import BaseExecutor, Program, RunReturn
+from sae302.server.journal import JobJournal, JobState
+from sae302.server.registry import ExecutorRegistry
+from sae302.server.scheduler import FairScheduler, Handoff, Job, PreparedJob
+from sae302.server.supervisor import Supervisor, WorkerStats
 
 _log = logging.getLogger(__name__)
-clients: list[socket.socket] = []
+clients: list[Connection] = []
 clients_lock = threading.Lock()
-messages_queue: queue.Queue[messages.ALL_MESSAGES] = queue.Queue()
+messages_queue = FairScheduler()
+prepared_jobs = Handoff()
+"""Jobs whose file has been built, waiting for an execution slot."""
+active_jobs: dict[str, Job] = {}
+"""Jobs that are either waiting or running, by their identifier."""
+active_jobs_lock = threading.Lock()
+running_jobs: set[str] = set()
+"""Jobs being ran, by their identifier. They share the execution slots."""
+running_jobs_lock = threading.Lock()
+queue_positions_lock = threading.Lock()
+stats = WorkerStats()
 
+LOGS_SPOOL_THRESHOLD = 64 * 1024
+"""Size, in bytes, after which logs are spooled to a file before being sent."""
+JOURNAL_POLL_INTERVAL = 0.5
+"""Time, in seconds, between two reads of the journal, for the jobs of the other workers
+of a supervisor (See :py:mod:`sae302.server.supervisor`)."""
 
-def get_socket_port(sock: socket.socket) -> int:
-    return sock.getpeername()[1]
 
+def _disconnect_client(client: Connection) -> list[Job]:
+    """Close the connection of a client, and unsubscribe it from every job.
 
-def _disconnect_client(client: socket.socket):
+    Returns
+    -------
+    list[Job]
+        The jobs submitted by this client that nobody is waiting for anymore.
+    """
     with clients_lock:
         if client in clients:
-            _log.debug("Disconnecting port %s", get_socket_port(client))
-            with contextlib.suppress(OSError):
-                client.shutdown(socket.SHUT_RDWR)
+            _log.debug("Disconnecting port %s", client.port)
             client.close()
             clients.remove(client)
+    abandoned: list[Job] = []
+    with active_jobs_lock:
+        for job in active_jobs.values():
+            job.unsubscribe(client)
+            if job.connection is client and job.is_abandoned:
+                abandoned.append(job)
+    return abandoned
+
+
+def _track_job(job: Job) -> None:
+    with active_jobs_lock:
+        active_jobs[job.id] = job
+
 
+def _forget_job(job: Job) -> None:
+    with active_jobs_lock:
+        active_jobs.pop(job.id, None)
 
-class MessageHandler(threading.Thread):
-    """The MessageHandler class is used to handle messages that have been put into the queue, and
-    require to be processed.
+
+def _release_job(job: Job) -> None:
+    """Let the client of a job taken out of the queue run another one, once the job is
+    over."""
+    messages_queue.task_done(job)
+    _forget_job(job)
+
+
+def _notify_queue_positions() -> None:
+    """Send their new position in the queue to the clients of the waiting jobs."""
+    with queue_positions_lock:
+        for position, job in enumerate(messages_queue.waiting_order(), start=1):
+            if job.queue_position == position:
+                continue
+            job.queue_position = position
+            job.reply(
+                messages.JobMessage.create_message(
+                    job.id, JobState.QUEUED, queue_position=position
+                )
+            )
+
+
+def _kill_job(job: Job) -> None:
+    """Kill the process groups currently executing a job, if any.
+    The whole groups are killed, so that children of the processes do not survive them.
     """
+    for pid in list(job.pids):
+        _log.debug("Killing process group %s of job %s", pid, job.id)
+        with contextlib.suppress(ProcessLookupError, PermissionError):
+            os.killpg(pid, signal.SIGKILL)
+
+
+def cancel_job(journal: JobJournal, job: Job) -> None:
+    """Cancel a job. A job waiting to be built or to be ran is removed right away, while
+    a job being built or ran has its processes killed: its handler reports the
+    cancellation once the execution returns."""
+    job.is_cancelled = True
+    if messages_queue.remove(job):
+        journal.record_result(
+            job.id, JobState.CANCELLED, None, "The job has been cancelled."
+        )
+        job.finish(messages.JobMessage.create_message(job.id, JobState.CANCELLED))
+        _forget_job(job)
+        _notify_queue_positions()
+    elif prepared := prepared_jobs.remove(job):
+        prepared.release()
+        journal.record_result(
+            job.id, JobState.CANCELLED, None, "The job has been cancelled."
+        )
+        job.finish(messages.JobMessage.create_message(job.id, JobState.CANCELLED))
+        _release_job(job)
+    else:
+        _kill_job(job)
+
+
+def handle_job_event(
+    journal: JobJournal, job_id: str, event: str, value: typing.Any
+) -> None:
+    """Handle an event reported by the executor of a job. See
+    :py:meth:`sae302.server.executor.BaseExecutor.report`."""
+    with active_jobs_lock:
+        job = active_jobs.get(job_id)
+    if not job or job.is_over:
+        return
+
+    match event:
+        case "phase":
+            state = JobState(value)
+            journal.record_state(job.id, state)
+            job.reply(messages.JobMessage.create_message(job.id, state))
+        case "pid":
+            job.pids.add(value)
+            # The job may have been cancelled before its process was known.
+            if job.is_cancelled:
+                _kill_job(job)
+        case "exited":
+            job.pids.discard(value)
+        case _:
+            _log.debug("Ignoring event %s of job %s", event, job.id)
+
+
+def execution_stats(job: Job, run: RunReturn) -> messages.ExecutionStats:
+    """Gather the measurements of a job, once executed."""
+    stats = run.stats()
+    if (queue_time := job.queue_time) is not None:
+        stats["queue_time"] = queue_time
+    return stats
+
+
+def logs_message(
+    code: int,
+    output: str,
+    job_id: str,
+    spill: pathlib.Path | None = None,
+    stats: messages.ExecutionStats | None = None,
+) -> messages.PackedMessage:
+    """Create the message holding the logs of an execution. Large logs are spooled to a
+    temporary file, so that they are sent with ``sendfile`` instead of going through
+    Python buffers. If the executor spilled the whole output to a file (See
+    :py:attr:`sae302.server.executor.RunReturn.spill`), this file is sent instead.
+    """
+    if spill:
+        return messages.LogsMessage.create_message(
+            str(code), spill, job_id=job_id, delete_after_send=True, stats=stats
+        )
+    data = output.encode()
+    if len(data) <= LOGS_SPOOL_THRESHOLD:
+        return messages.LogsMessage.create_message(
+            str(code), output, job_id=job_id, stats=stats
+        )
+
+    with tempfile.NamedTemporaryFile(
+        prefix="sae302-logs-", suffix=".log", delete=False
+    ) as file:
+        file.write(data)
+    _log.debug("Spooled %s bytes of logs to %s", len(data), file.name)
+    return messages.LogsMessage.create_message(
+        str(code),
+        pathlib.Path(file.name),
+        job_id=job_id,
+        delete_after_send=True,
+        stats=stats,
+    )
+
+
+class JobHandler(threading.Thread):
+    """Base class of the threads handling the jobs at one stage of their execution:
+    either building their file (See :py:class:`BuildHandler`) or running it (See
+    :py:class:`RunHandler`). Each stage has its own execution backend, sized to its
+    number of slots.
 
-    def __init__(self) -> None:
+    This is not to be used directly.
+    """
+
+    def __init__(self, journal: JobJournal, backend: ExecutionBackend) -> None:
         super().__init__(daemon=True)
 
+        self.journal = journal
+        self.backend = backend
+
+    def _fail(self, job: Job, reason: str) -> None:
+        self.journal.record_result(job.id, JobState.FAILED, None, reason)
+        job.finish(messages.ErrorMessage.create_message("ERROR", reason, job_id=job.id))
+
+    def _cancel(self, job: Job) -> None:
+        self.journal.record_result(
+            job.id, JobState.CANCELLED, None, "The job has been cancelled."
+        )
+        job.finish(messages.JobMessage.create_message(job.id, JobState.CANCELLED))
+
+    def _crash(self, job: Job, error: Exception) -> None:
+        """Make a job fail after an unexpected error, so that its client does not wait
+        for it forever, and it is not replayed when the server restarts."""
+        _log.exception(error)
+        if job.is_over:
+            return
+        try:
+            self._fail(job, f"Unexpected server error: {error}")
+        except Exception as e:
+            _log.exception(e)
+
+
+class BuildHandler(JobHandler):
+    """The BuildHandler class takes the jobs out of the queue, and builds their file,
+    such as compiling it. Built jobs are handed over to the :py:class:`RunHandler`
+    threads through :py:data:`prepared_jobs`.
+    """
+
+    def __init__(
+        self, journal: JobJournal, backend: ExecutionBackend, registry: ExecutorRegistry
+    ) -> None:
+        super().__init__(journal, backend)
+
         self.queue = messages_queue
-        self.currently_running_file = False
-        self.factory = ExecutorFactory()
-        self.current_executor: BaseExecutor | None = None
+        self.registry = registry
 
-    def handle_file(self, message: messages.FileMessage) -> None:
-        executor = self.factory.find_executor(
+    def build(self, job: Job) -> PreparedJob | None:
+        """Find the executor of a job, and build its files.
+
+        Returns
+        -------
+        PreparedJob | None
+            The built job, or None if the job is already over.
+        """
+        if job.is_cancelled:
+            return self._cancel(job)
+
+        entry = self.registry.find_executor(
             friendly_name=(
-                message.chosen_executor if message.chosen_executor != "auto" else None
+                job.chosen_executor if job.chosen_executor != "auto" else None
             ),
-            supported_suffixes=[message.file_name.split(".")[-1]],
+            supported_suffixes=[job.file_name.split(".")[-1]],
         )
-        if not executor:
-            message.reply(
-                messages.ErrorMessage.create_message(
-                    "ERROR",
-                    "No executor found for this file type.",
+        if not entry:
+            return self._fail(job, "No executor found for this file type.")
+
+        try:
+            profile = self.registry.find_profile(job.build_profile)
+        except ValueError as e:
+            return self._fail(job, str(e))
+
+        try:
+            current_executor = entry.create()
+        except ImportError as e:
+            return self._fail(job, str(e))
+        executor = type(current_executor)
+
+        if not current_executor.is_available:
+            return self._fail(
+                job, "Executor not available. Missing required tool(s) on server."
+            )
+        is_plain = job.test_cases is None and job.benchmark is None and not job.session
+        if is_plain and not job.profiled and executor.prepare is BaseExecutor.prepare:
+            # The executor only knows how to build and run the file at once, in the run
+            # stage.
+            return PreparedJob(job, executor, entry.config, profile, [])
+        if job.profiled:
+            if not current_executor.profiler:
+                return self._fail(
+                    job,
+                    f"The {executor.friendly_name} executor cannot profile programs.",
                 )
+            profile = current_executor.profiled_build(profile)
+
+        files = [(job.file_name, job.file_content)]
+        if job.benchmark is not None and (baseline := job.benchmark.get("baseline")):
+            files.append((baseline["file_name"], baseline["source"]))
+        prepared = PreparedJob(job, executor, entry.config, profile, [])
+        for file_name, file_content in files:
+            program = self._prepare(prepared, file_name, file_content)
+            if not program:
+                prepared.release()
+                return None
+            prepared.programs.append((file_name, program))
+        return prepared
+
+    def _prepare(
+        self, prepared: PreparedJob, file_name: str, file_content: str
+    ) -> Program | None:
+        """Prepare a file of a job to be ran. If it cannot be, the job is finished.
+
+        Returns
+        -------
+        Program | None
+            The program, or None if the job is over.
+        """
+        job = prepared.job
+        try:
+            program = self.backend.prepare(
+                prepared.executor,
+                prepared.config,
+                prepared.profile,
+                job.id,
+                file_name,
+                file_content,
+            ).result()
+        except NotImplementedError as e:
+            self._fail(job, str(e))
+            return None
+        except Exception as e:
+            self._fail(job, f"Could not build the file: {e}")
+            return None
+        if isinstance(program, RunReturn):
+            # The file could not be compiled: its logs are the output of the compiler.
+            if job.is_cancelled:
+                self._cancel(job)
+                return None
+            stats = execution_stats(job, program)
+            self.journal.record_result(
+                job.id, JobState.DONE, program.code, program.output, stats
             )
-            return
+            job.finish(
+                logs_message(program.code, program.output, job.id, program.spill, stats)
+            )
+            return None
+        return program
 
-        self.current_executor = executor()
+    def run(self) -> None:
+        while True:
+            try:
+                job = self.queue.get()
+            except queue.ShutDown:
+                break
+            job.started_at = time.monotonic()
+            _notify_queue_positions()
 
-        if not self.current_executor.is_available:
-            message.reply(
-                messages.ErrorMessage.create_message(
-                    "ERROR",
-                    f"Executor not available. Missing required tool(s) on server.",
-                )
+            prepared = None
+            try:
+                prepared = self.build(job)
+            except Exception as e:
+                self._crash(job, e)
+            if prepared is None:
+                _release_job(job)
+                continue
+
+            job.built_at = time.monotonic()
+            handle_job_event(self.journal, job.id, "phase", JobState.BUILT)
+            try:
+                prepared_jobs.put(prepared)
+            except queue.ShutDown:
+                prepared.release()
+                _release_job(job)
+                break
+
+
+class RunHandler(JobHandler):
+    """The RunHandler class runs the jobs built by the :py:class:`BuildHandler`
+    threads."""
+
+    def __init__(
+        self,
+        journal: JobJournal,
+        backend: ExecutionBackend,
+        cpus: CpuPool,
+        slots: int = 1,
+    ) -> None:
+        super().__init__(journal, backend)
+
+        self.queue = prepared_jobs
+        self.cpus = cpus
+        self.slots = slots
+
+    def handle(self, prepared: PreparedJob) -> None:
+        job = prepared.job
+        if job.is_cancelled:
+            return self._cancel(job)
+        if not prepared.programs:
+            return self.execute(prepared)
+
+        handle_job_event(self.journal, job.id, "phase", JobState.RUNNING)
+        if job.test_cases is not None:
+            return self.run_test_suite(prepared, job.test_cases)
+        if job.benchmark is not None:
+            return self.run_benchmark(prepared, job.benchmark)
+        if job.session:
+            return self.run_interactive(prepared)
+        return self.run_once(prepared)
+
+    def execute(self, prepared: PreparedJob) -> None:
+        """Build and run the file of a job at once, for the executors that cannot
+        prepare programs."""
+        job = prepared.job
+        try:
+            future = self.backend.submit(
+                prepared.executor,
+                prepared.config,
+                prepared.profile,
+                job.id,
+                job.file_name,
+                job.file_content,
             )
-            return
+            logs = future.result()
+        except Exception as e:
+            return self._fail(job, f"Could not execute the file: {e}")
+        self._finish(job, logs)
 
+    def run_once(self, prepared: PreparedJob) -> None:
+        """Run the program of a job once, profiling it if requested (See
+        :py:mod:`sae302.server.profiling`). The profile is sent right before the logs,
+        unless the program did not exit normally."""
+        job = prepared.job
+        _, program = prepared.programs[0]
         try:
-            logs = self.current_executor.execute(message.file_name, message.file_content)
-            message.reply(messages.LogsMessage.create_message(str(logs.code), logs.output))
+            logs = self.backend.run(
+                prepared.executor,
+                prepared.config,
+                prepared.profile,
+                job.id,
+                program,
+                profiling=job.profiled,
+            ).result()
         except Exception as e:
-            message.reply(messages.ErrorMessage.create_message("ERROR", f"Could not execute the file: {e}"))
+            return self._fail(job, f"Could not execute the file: {e}")
+        logs.compile_time = program.compile_time
+        self._finish(job, logs)
+
+    def run_test_suite(
+        self, prepared: PreparedJob, test_cases: list[messages.TestCase]
+    ) -> None:
+        """Run the cases of a test suite in parallel. The suite has no more cases
+        running at once than its share of the execution slots, so that the other jobs
+        running meanwhile are not delayed behind its cases."""
+        job = prepared.job
+        _, program = prepared.programs[0]
+        results: list[messages.TestCaseResult | None] = [None] * len(test_cases)
+        cases = iter(enumerate(test_cases))
+        running: dict[concurrent.futures.Future[messages.TestCaseResult], int] = {}
+        # Each case waits for its execution in a thread, the thread backend running it
+        # in the calling thread.
+        with concurrent.futures.ThreadPoolExecutor(
+            self.slots, thread_name_prefix=f"{self.name}-TestCase"
+        ) as pool:
+            while not job.is_cancelled:
+                while len(running) < self.fair_share() and (item := next(cases, None)):
+                    index, case = item
+                    running[pool.submit(self._run_case, prepared, program, case)] = (
+                        index
+                    )
+                if not running:
+                    break
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    results[running.pop(future)] = future.result()
+
+        if job.is_cancelled:
+            return self._cancel(job)
+        report = [result for result in results if result is not None]
+        failed = sum(result["status"] != "PASSED" for result in report)
+        self.journal.record_result(job.id, JobState.DONE, failed, json.dumps(report))
+        job.finish(messages.TestReportMessage.create_message(job.id, report))
+
+    def _run_case(
+        self, prepared: PreparedJob, program: Program, case: messages.TestCase
+    ) -> messages.TestCaseResult:
+        """Run the program of a test suite on one of its cases, and grade its
+        output."""
+        job = prepared.job
+        try:
+            run = self.backend.run(
+                prepared.executor,
+                prepared.config,
+                prepared.profile,
+                job.id,
+                program,
+                stdin=case.get("stdin", "").encode(),
+                args=case.get("args"),
+                timeout=case.get("timeout"),
+                # A longer output than expected is wrong, whatever the rest of it.
+                output_limit=max(
+                    prepared.config.output_limit, len(case["expected"].encode()) + 1
+                ),
+            ).result()
+        except Exception as e:
+            return grading.error(case, f"Could not run: {e}")
+        if run.spill:
+            run.spill.unlink(missing_ok=True)
+        return grading.grade(case, run)
+
+    def fair_share(self) -> int:
+        """The number of execution slots a job may use at once: the slots are shared
+        evenly between the running jobs, each having at least one."""
+        with running_jobs_lock:
+            return max(1, self.slots // max(1, len(running_jobs)))
+
+    def run_interactive(self, prepared: PreparedJob) -> None:
+        """Run the program of an interactive job with its input and output streamed to
+        and from the client. See :py:mod:`sae302.server.session`."""
+        job = prepared.job
+        assert job.session
+        _, program = prepared.programs[0]
+        try:
+            # The remaining output is sent before the logs, once the session is closed.
+            with job.session as session:
+                logs = self.backend.run(
+                    prepared.executor,
+                    prepared.config,
+                    prepared.profile,
+                    job.id,
+                    program,
+                    session=session.start(prepared.config.output_limit),
+                ).result()
+        except Exception as e:
+            return self._fail(job, f"Could not execute the file: {e}")
+
+        if job.is_cancelled:
+            return self._cancel(job)
+        # The output of the program is in the session, the one of the executor, such as
+        # a timeout notice, in the logs.
+        output = session.capture.text() + logs.output
+        logs.compile_time = program.compile_time
+        stats = execution_stats(job, logs)
+        self.journal.record_result(job.id, JobState.DONE, logs.code, output, stats)
+        job.finish(logs_message(logs.code, output, job.id, stats=stats))
+
+    def run_benchmark(
+        self, prepared: PreparedJob, settings: messages.BenchmarkSettings
+    ) -> None:
+        """Run the program of a benchmark, and of its baseline if any, one at a time on
+        a processor of the benchmarks (See :py:mod:`sae302.server.benchmark`). Runs of
+        the file and of the baseline alternate, so that a change of the load of the
+        server affects both alike."""
+        job = prepared.job
+        with self.cpus.acquire() as cpu:
+            samples = self._measure(prepared, settings, cpu)
+        if samples is None:
+            return
+
+        results = [
+            benchmark.result(file_name, wall, cpu_time)
+            for (file_name, _), (wall, cpu_time) in zip(prepared.programs, samples)
+        ]
+        report: messages.BenchmarkReport = {
+            "program": results[0],
+            "cpu": cpu,
+            "isolated": self.cpus.isolated,
+        }
+        if "baseline" in settings:
+            report["baseline"] = results[1]
+            if median := results[0]["wall"]["median"]:
+                report["speedup"] = results[1]["wall"]["median"] / median
+        self.journal.record_result(job.id, JobState.DONE, 0, json.dumps(report))
+        job.finish(messages.BenchmarkReportMessage.create_message(job.id, report))
+
+    def _measure(
+        self,
+        prepared: PreparedJob,
+        settings: messages.BenchmarkSettings,
+        cpu: int | None,
+    ) -> list[tuple[list[float], list[float]]] | None:
+        """Run the programs of a benchmark, alternating between them.
+
+        Returns
+        -------
+        list[tuple[list[float], list[float]]] | None
+            The wall-clock and the processor times of the measured runs of each program,
+            or None if a run failed or the job was cancelled, in which case the job is
+            over.
+        """
+        job = prepared.job
+        samples: list[tuple[list[float], list[float]]] = [
+            ([], []) for _ in prepared.programs
+        ]
+        for iteration in range(settings["warmups"] + settings["runs"]):
+            for (file_name, program), (wall, cpu_time) in zip(
+                prepared.programs, samples
+            ):
+                if job.is_cancelled:
+                    self._cancel(job)
+                    return None
+                try:
+                    run = self.backend.run(
+                        prepared.executor,
+                        prepared.config,
+                        prepared.profile,
+                        job.id,
+                        program,
+                        stdin=settings.get("stdin", "").encode(),
+                        args=settings.get("args"),
+                        timeout=settings.get("timeout"),
+                        cpu=cpu,
+                    ).result()
+                except Exception as e:
+                    self._fail(job, f"Could not execute {file_name}: {e}")
+                    return None
+
+                if job.is_cancelled:
+                    if run.spill:
+                        run.spill.unlink(missing_ok=True)
+                    self._cancel(job)
+                    return None
+                if run.code != 0 or run.timed_out:
+                    # The logs of the failed run tell why.
+                    self.journal.record_result(
+                        job.id, JobState.DONE, run.code, run.output
+                    )
+                    job.finish(logs_message(run.code, run.output, job.id, run.spill))
+                    return None
+                if run.spill:
+                    run.spill.unlink(missing_ok=True)
+
+                if iteration >= settings["warmups"] and run.duration is not None:
+                    wall.append(run.duration)
+                    usage = run.usage
+                    cpu_time.append(usage.ru_utime + usage.ru_stime if usage else 0.0)
+        return samples
+
+    def _finish(self, job: Job, logs: RunReturn) -> None:
+        """Send the logs of a job ran once, with its profile if any."""
+        if job.is_cancelled:
+            if logs.spill:
+                logs.spill.unlink(missing_ok=True)
+            return self._cancel(job)
+        stats = execution_stats(job, logs)
+        self.journal.record_result(job.id, JobState.DONE, logs.code, logs.output, stats)
+        if logs.profile_report:
+            job.reply(
+                messages.ProfileMessage.create_message(job.id, logs.profile_report)
+            )
+        job.finish(logs_message(logs.code, logs.output, job.id, logs.spill, stats))
 
     def run(self) -> None:
         while True:
             try:
-                message = self.queue.get()
-                if isinstance(message, messages.FileMessage):
-                    if self.currently_running_file:
-                        message.reply(
-                            messages.ErrorMessage.create_message(
-                                "ERROR",
-                                "File cannot be processed at this time. Use another server.",
-                            )
-                        )
-                        return
-                    try:
-                        self.currently_running_file = True
-                        self.handle_file(message)
-                    finally:
-                        self.currently_running_file = True
+                prepared = self.queue.get()
             except queue.ShutDown:
                 break
-            except queue.Empty:
-                # Weird?
-                pass
+            prepared.job.running_at = time.monotonic()
+
+            with running_jobs_lock:
+                running_jobs.add(prepared.job.id)
+            try:
+                self.handle(prepared)
+            except Exception as e:
+                self._crash(prepared.job, e)
+            finally:
+                with running_jobs_lock:
+                    running_jobs.discard(prepared.job.id)
+                prepared.release()
+                _release_job(prepared.job)
 
 
 class ClientHandler(threading.Thread):
-    def __init__(self, socket: socket.socket) -> None:
+    def __init__(
+        self,
+        connection: Connection,
+        journal: JobJournal,
+        registry: ExecutorRegistry,
+        blobs: BlobStore,
+        worker: int = 0,
+    ) -> None:
         super().__init__(daemon=True)
-        self.socket = socket
+        self.connection = connection
         self.queue = messages_queue
+        self.journal = journal
+        self.registry = registry
+        self.blobs = blobs
+        self.worker = worker
 
     def run(self) -> None:
-        message_buffer = messages.MessageBuffer()
+        self.message_buffer = messages.MessageBuffer()
+        try:
+            self.connection.serve(self.receive)
+        except OSError as e:
+            _log.debug("Lost connection with port %s: %s", self.connection.port, e)
+        except Exception as e:
+            _log.exception(e)
+        finally:
+            self.disconnect()
 
-        while True:
-            try:
-                message = self.socket.recv(1024)
-                if not message:
-                    _disconnect_client(self.socket)
-                    break
+    def receive(self, data: bytes) -> bytes:
+        """Handle the messages received from the client.
+
+        Returns
+        -------
+        bytes
+            The data left aside, because the replies already waiting for the client are
+            too large to handle more messages for now.
+        """
+        # A single read may hold the end of a message and the start of the next one.
+        while data:
+            data = self.message_buffer.push(data)
 
-                message_buffer.push(message)
+            if self.message_buffer.is_complete:
+                self.handle_message(
+                    self.message_buffer.get_message(self.connection.socket)
+                )
+                # New buffer
+                self.message_buffer = messages.MessageBuffer()
+                if self.connection.is_congested:
+                    return data
+        return b""
 
-                if message_buffer.is_complete:
-                    message = message_buffer.get_message(self.socket)
-                    messages_queue.put(message)
-                    # New buffer
-                    message_buffer = messages.MessageBuffer()
+    def disconnect(self) -> None:
+        """Close the connection, and cancel the jobs nobody is waiting for anymore, so
+        that they do not keep a slot busy."""
+        for job in _disconnect_client(self.connection):
+            _log.debug("Cancelling abandoned job %s", job.id)
+            cancel_job(self.journal, job)
 
-            except Exception as e:
-                _log.exception(e)
-                _disconnect_client(self.socket)
-                break
+    def handle_message(self, message: messages.ALL_MESSAGES) -> None:
+        match message:
+            case (
+                messages.FileMessage()
+                | messages.TestSuiteMessage()
+                | messages.BenchmarkMessage()
+            ):
+                self.submit(message)
+            case messages.ResultMessage():
+                self.send_result(message)
+            case messages.StatusMessage():
+                self.send_status(message)
+            case messages.CancelMessage():
+                self.cancel(message)
+            case messages.InputMessage() | messages.CreditMessage():
+                self.stream(message)
+            case messages.OfferMessage():
+                self.answer_offer(message)
+            case messages.BlobMessage() | messages.DeltaMessage():
+                self.store_blob(message)
+            case _:
+                _log.debug("Ignoring message: %s", message)
+
+    def submit(
+        self,
+        message: (
+            messages.FileMessage | messages.TestSuiteMessage | messages.BenchmarkMessage
+        ),
+    ) -> None:
+        try:
+            job = Job.from_message(message, self.connection, self.blobs.read)
+            self.registry.find_profile(job.build_profile)
+        except ValueError as e:
+            self.connection.send(messages.ErrorMessage.create_message("ERROR", str(e)))
+            return
+
+        self.journal.record_submission(
+            job.id,
+            job.file_name,
+            job.chosen_executor,
+            job.priority,
+            job.file_content,
+            job.build_profile,
+            job.test_cases,
+            job.benchmark,
+            job.detached,
+            job.session is not None,
+            job.profiled,
+            self.worker,
+        )
+        self.connection.send(
+            messages.JobMessage.create_message(job.id, JobState.QUEUED)
+        )
+        _track_job(job)
+        stats.add("submitted_jobs")
+        self.queue.put(job)
+        _notify_queue_positions()
+
+    def answer_offer(self, message: messages.OfferMessage) -> None:
+        """Tell the client which of the files it offers must be uploaded, with the
+        signature of their base when the store has it."""
+        try:
+            hashes, bases = message.read_offer()
+        except ValueError as e:
+            self.connection.send(messages.ErrorMessage.create_message("ERROR", str(e)))
+            return
+        missing = self.blobs.missing(hashes)
+        signatures: dict[str, messages.FileSignature] = {}
+        for blob in missing:
+            if blob in bases and (signature := self.blobs.signature(bases[blob])):
+                signatures[blob] = signature
+        self.connection.send(
+            messages.MissingMessage.create_message(missing, signatures)
+        )
+
+    def store_blob(self, message: messages.BlobMessage | messages.DeltaMessage) -> None:
+        try:
+            if isinstance(message, messages.DeltaMessage):
+                self.blobs.add_delta(message)
+            else:
+                self.blobs.add(message.content)
+        except ValueError as e:
+            self.connection.send(messages.ErrorMessage.create_message("ERROR", str(e)))
+        except OSError as e:
+            _log.error("Could not store an uploaded file: %s", e)
+            self.connection.send(
+                messages.ErrorMessage.create_message(
+                    "ERROR", "The file could not be stored."
+                )
+            )
+
+    def cancel(self, message: messages.CancelMessage) -> None:
+        with active_jobs_lock:
+            job = active_jobs.get(message.job_id)
+        if job:
+            # The client cancelling the job wants to know when it is done.
+            job.subscribe(self.connection)
+            cancel_job(self.journal, job)
+            return
+
+        record = self.journal.get(message.job_id)
+        if not (record and self.journal.request_cancel(record.id)):
+            self.connection.send(
+                messages.ErrorMessage.create_message(
+                    "ERROR", "Unknown or finished job.", job_id=message.job_id
+                )
+            )
+            return
+        # Another worker has the job: it cancels it once it reads the request.
+        self.follow(record.id, record.state)
+
+    def stream(self, message: messages.InputMessage | messages.CreditMessage) -> None:
+        """Pass input, or credit for more output, to the session of an interactive job.
+        Only the client that submitted the job may do so."""
+        with active_jobs_lock:
+            job = active_jobs.get(message.job_id)
+        if not (job and job.session and job.connection is self.connection):
+            if isinstance(message, messages.CreditMessage):
+                # The client consumed the last output of a job that is now over.
+                return
+            self.connection.send(
+                messages.ErrorMessage.create_message(
+                    "ERROR",
+                    "Unknown or finished interactive job.",
+                    job_id=message.job_id,
+                )
+            )
+            return
+
+        try:
+            if isinstance(message, messages.InputMessage):
+                job.session.write(message.data.encode(), message.eof)
+            elif message.stream == "OUTPUT":
+                job.session.grant(message.bytes)
+        except ValueError as e:
+            self.connection.send(
+                messages.ErrorMessage.create_message("ERROR", str(e), job_id=job.id)
+            )
+
+    def send_result(self, message: messages.ResultMessage) -> None:
+        self.connection.send(self._result_of(message.job_id))
+
+    def send_status(self, message: messages.StatusMessage) -> None:
+        record = self.journal.get(message.job_id)
+        if not record:
+            self.connection.send(
+                messages.ErrorMessage.create_message(
+                    "ERROR", "Unknown job.", job_id=message.job_id
+                )
+            )
+            return
+
+        self.connection.send(
+            messages.JobMessage.create_message(record.id, record.state)
+        )
+        if not message.subscribe:
+            return
+
+        with active_jobs_lock:
+            job = active_jobs.get(record.id)
+        if job and job.subscribe(self.connection):
+            return
+        if record.state.is_final:
+            self.connection.send(self._result_of(record.id))
+        else:
+            # Another worker has the job.
+            self.follow(record.id, record.state)
+
+    def follow(self, job_id: str, state: JobState) -> None:
+        """Send the states of a job of another worker to the client, as the journal
+        records them, then its result. The journal is read in the background until the
+        job is over, or the client disconnects.
+
+        Parameters
+        ----------
+        job_id : str
+            The identifier of the job.
+        state : JobState
+            The last state of the job the client knows about.
+        """
+        threading.Thread(
+            target=self._follow, args=(job_id, state), name="Follow", daemon=True
+        ).start()
+
+    def _follow(self, job_id: str, state: JobState) -> None:
+        while True:
+            time.sleep(JOURNAL_POLL_INTERVAL)
+            with clients_lock:
+                if self.connection not in clients:
+                    return
+            try:
+                record = self.journal.get(job_id)
+            except sqlite3.Error:
+                # The server is stopping.
+                return
+            if not record:
+                return
+            if record.state != state:
+                state = record.state
+                self.connection.send(messages.JobMessage.create_message(job_id, state))
+            if state.is_final:
+                self.connection.send(self._result_of(job_id))
+                return
+
+    def _result_of(self, job_id: str) -> messages.PackedMessage:
+        """Create the message answering a request for the result of a job."""
+        record = self.journal.get(job_id)
+        if not record:
+            return messages.ErrorMessage.create_message(
+                "ERROR", "Unknown job.", job_id=job_id
+            )
+        if record.state == JobState.DONE and record.test_cases is not None:
+            with contextlib.suppress(ValueError):
+                return messages.TestReportMessage.create_message(
+                    record.id, json.loads(record.output or "")
+                )
+        if record.state == JobState.DONE and record.benchmark is not None:
+            with contextlib.suppress(ValueError):
+                return messages.BenchmarkReportMessage.create_message(
+                    record.id, json.loads(record.output or "")
+                )
+        if record.state == JobState.DONE:
+            return logs_message(
+                record.code or 0, record.output or "", record.id, stats=record.stats
+            )
+        if record.state == JobState.FAILED:
+            return messages.ErrorMessage.create_message(
+                "ERROR", record.output or "Job failed.", job_id=record.id
+            )
+        if record.state == JobState.CANCELLED:
+            return messages.ErrorMessage.create_message(
+                "INFO", record.output or "Job cancelled.", job_id=record.id
+            )
+        return messages.JobMessage.create_message(record.id, record.state)
 
 
 class Server:
-    def __init__(self, port: int):
+    def __init__(
+        self,
+        port: int,
+        journal: JobJournal,
+        backend: ExecutionBackend,
+        registry: ExecutorRegistry,
+        blobs: BlobStore,
+        slots: int = 1,
+        cpus: CpuPool | None = None,
+        build_backend: ExecutionBackend | None = None,
+        build_slots: int = 1,
+        client_budget: int = DEFAULT_BUFFER_BUDGET,
+        reuse_port: bool = False,
+        worker: int = 0,
+        workers: int = 1,
+    ):
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Allow restarting the server right away, without waiting for old connections to
+        # expire.
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            # Let the other server processes listen on the same port, the kernel
+            # spreading the connections between them (See sae302.server.supervisor).
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.socket.bind(("127.0.0.1", port))
         self.socket.listen(10)
         _log.info("Server started at port %s, waiting for connections...", port)
 
-        self.handler = MessageHandler()
-        self.handler.start()
+        self.journal = journal
+        self.registry = registry
+        self.blobs = blobs
+        self.client_budget = client_budget
+        self.worker = worker
+        self.replay_pending_jobs(workers)
+
+        self.backend = backend
+        self.build_backend = build_backend or backend
+        cpus = cpus or CpuPool()
+        # One built job may wait for each execution slot.
+        prepared_jobs.capacity = slots
+        self.handlers: list[JobHandler] = [
+            BuildHandler(journal, self.build_backend, registry)
+            for _ in range(build_slots)
+        ]
+        self.handlers += [
+            RunHandler(journal, backend, cpus, slots) for _ in range(slots)
+        ]
+        for handler in self.handlers:
+            handler.start()
+        if reuse_port:
+            threading.Thread(
+                target=self.watch_cancel_requests, name="CancelRequests", daemon=True
+            ).start()
+
+    def watch_cancel_requests(self) -> None:
+        """Cancel the jobs of this worker that a client asked to cancel from another
+        one, as the journal records it."""
+        while True:
+            time.sleep(JOURNAL_POLL_INTERVAL)
+            try:
+                requests = self.journal.cancel_requests()
+            except sqlite3.ProgrammingError:
+                # The journal is closed, the server is stopping.
+                return
+            except sqlite3.Error as e:
+                _log.error("Could not read the cancel requests: %s", e)
+                continue
+            for job_id in requests:
+                with active_jobs_lock:
+                    job = active_jobs.get(job_id)
+                if job and not job.is_cancelled:
+                    _log.debug("Cancelling job %s, as requested", job_id)
+                    cancel_job(self.journal, job)
+
+    def replay_pending_jobs(self, workers: int = 1) -> None:
+        """Queue back the detached jobs of this worker that were not over when it last
+        stopped. The other ones are cancelled, as their client is gone, such as when the
+        worker crashed. The first worker also takes the jobs of the workers that do not
+        exist anymore (See :py:mod:`sae302.server.supervisor`).
+
+        Parameters
+        ----------
+        workers : int
+            The number of workers of the server.
+        """
+        pending = []
+        for record in self.journal.pending():
+            if record.worker != self.worker and not (
+                self.worker == 0 and record.worker >= workers
+            ):
+                continue
+            if record.detached:
+                pending.append(record)
+                continue
+            _log.debug("Cancelling abandoned job %s", record.id)
+            self.journal.record_result(
+                record.id,
+                JobState.CANCELLED,
+                None,
+                "The job was interrupted by a server restart.",
+            )
+        if pending:
+            _log.info("Replaying %s pending job(s) from the journal.", len(pending))
+        for record in pending:
+            if record.state != JobState.QUEUED:
+                self.journal.record_state(record.id, JobState.QUEUED)
+            job = Job.from_record(record)
+            _track_job(job)
+            messages_queue.put(job)
 
     def accept_connections(self):
         while True:
             try:
                 client_socket, _ = self.socket.accept()
-                _log.debug("Connection from port %s", get_socket_port(client_socket))
-                clients.append(client_socket)
-                client_thread = ClientHandler(client_socket)
+                connection = Connection(client_socket, self.client_budget)
+                _log.debug("Connection from port %s", connection.port)
+                with clients_lock:
+                    clients.append(connection)
+                stats.add("connections")
+                client_thread = ClientHandler(
+                    connection, self.journal, self.registry, self.blobs, self.worker
+                )
                 client_thread.start()
             except KeyboardInterrupt:
                 _log.debug("Received KeyboardInterrupted!")
                 if clients:
                     _log.info("There are still a few clients connected.")
-                self.handler.queue.shutdown()
+                messages_queue.shutdown()
+                prepared_jobs.shutdown()
                 break
 
 
@@ -173,23 +1128,191 @@ def launch():
         type=int,
         help="Le port sur lequel le serveur va démarrer.",
     )
+    parser.add_argument(
+        "--slots",
+        default=2,
+        type=int,
+        help="Le nombre de fichiers pouvant être exécutés en même temps.",
+    )
+    parser.add_argument(
+        "--build-slots",
+        default=1,
+        type=int,
+        help="Le nombre de fichiers pouvant être compilés en même temps, pendant que"
+        " d'autres s'exécutent.",
+    )
+    parser.add_argument(
+        "--per-client",
+        default=1,
+        type=int,
+        help="Le nombre de fichiers qu'un même client peut exécuter en même temps.",
+    )
+    parser.add_argument(
+        "--journal",
+        default=pathlib.Path.home() / ".sae302" / "journal.sqlite3",
+        type=pathlib.Path,
+        help="Le fichier dans lequel les tâches sont conservées entre deux démarrages.",
+    )
+    parser.add_argument(
+        "--backend",
+        default="process",
+        choices=BACKENDS,
+        help="Où les fichiers sont exécutés : dans des processus séparés, ou dans le"
+        " serveur.",
+    )
+    parser.add_argument(
+        "--executors",
+        default=pathlib.Path.home() / ".sae302" / "executors.toml",
+        type=pathlib.Path,
+        help="Le fichier de configuration des exécuteurs, s'il existe.",
+    )
+    parser.add_argument(
+        "--artifact-cache",
+        default=pathlib.Path.home() / ".sae302" / "artifacts",
+        type=pathlib.Path,
+        help="Le dossier dans lequel les programmes compilés sont conservés.",
+    )
+    parser.add_argument(
+        "--blob-store",
+        default=pathlib.Path.home() / ".sae302" / "blobs",
+        type=pathlib.Path,
+        help="Le dossier dans lequel les fichiers envoyés sont conservés, pour ne pas"
+        " les recevoir deux fois.",
+    )
+    parser.add_argument(
+        "--benchmark-cpus",
+        nargs="+",
+        type=int,
+        help="Les processeurs réservés aux mesures de performances, que les autres"
+        " tâches n'utilisent pas.",
+    )
+    parser.add_argument(
+        "--client-buffer",
+        default=DEFAULT_BUFFER_BUDGET,
+        type=int,
+        help="La quantité de données, en octets, pouvant être en attente d'envoi à un"
+        " client avant qu'il ne soit déconnecté, car il ne les lit pas assez vite.",
+    )
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="Le nombre de processus serveur se partageant le port, chacun avec ses"
+        " propres exécuteurs. Ils sont redémarrés s'ils s'arrêtent.",
+    )
     args = parser.parse_args()
+    messages_queue.per_client_limit = args.per_client
+    if args.workers < 1:
+        _log.critical("Il faut au moins un processus serveur.")
+        sys.exit(1)
+    if args.workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        _log.critical(
+            "Plusieurs processus serveur ne peuvent pas partager un port ici."
+        )
+        sys.exit(1)
+
+    try:
+        # Before any thread or process is started, so that they do not use reserved
+        # processors.
+        cpus = CpuPool(args.benchmark_cpus)
+    except ValueError as e:
+        _log.critical("Processeurs de mesure invalides : %s", e)
+        sys.exit(1)
+
+    try:
+        registry = ExecutorRegistry(args.executors, args.artifact_cache)
+    except ValueError as e:
+        _log.critical("Configuration des exécuteurs invalide : %s", e)
+        sys.exit(1)
+
+    blobs = BlobStore(args.blob_store)
+    if args.workers == 1:
+        serve(args, cpus, registry, blobs)
+
+    def run_worker(index: int, stats_fd: int) -> None:
+        cpus.share(index, args.workers)
+        stats.report_to(stats_fd, _gauges)
+        try:
+            serve(
+                args,
+                cpus,
+                registry,
+                blobs,
+                reuse_port=True,
+                worker=index,
+                workers=args.workers,
+            )
+        finally:
+            stats.send(stats_fd, _gauges)
+
+    sys.exit(Supervisor(args.workers, run_worker).run())
 
+
+def _gauges() -> dict[str, int]:
+    """Read the gauges of the server, sent to the supervisor along with its counters."""
+    with clients_lock:
+        connected = len(clients)
+    with active_jobs_lock:
+        jobs = len(active_jobs)
+    return {"clients": connected, "active_jobs": jobs}
+
+
+def serve(
+    args: argparse.Namespace,
+    cpus: CpuPool,
+    registry: ExecutorRegistry,
+    blobs: BlobStore,
+    reuse_port: bool = False,
+    worker: int = 0,
+    workers: int = 1,
+) -> typing.NoReturn:
+    """Start a server, either alone or as a worker of a supervisor, and run it until it
+    is stopped. Its journal and execution backends are created here, so that each worker
+    has its own."""
+    journal = JobJournal(args.journal)
+    backend = create_backend(
+        args.backend, args.slots, functools.partial(handle_job_event, journal)
+    )
+    build_backend = create_backend(
+        args.backend, args.build_slots, functools.partial(handle_job_event, journal)
+    )
     try:
-        server = Server(args.port)
+        server = Server(
+            args.port,
+            journal,
+            backend,
+            registry,
+            blobs,
+            args.slots,
+            cpus,
+            build_backend,
+            args.build_slots,
+            args.client_buffer,
+            reuse_port,
+            worker,
+            workers,
+        )
     except OSError:
         _log.critical("Impossible de démarrer le serveur sur ce port.")
+        backend.shutdown()
+        build_backend.shutdown()
+        journal.close()
         sys.exit(1)
 
     try:
         server.accept_connections()
     finally:
-        for client in clients:
-            _disconnect_client(client)
+        for client in list(clients):
+            # Nobody would receive the result of these jobs once replayed.
+            for job in _disconnect_client(client):
+                cancel_job(journal, job)
         with contextlib.suppress(Exception):
             server.socket.shutdown(socket.SHUT_RDWR)
         server.socket.close()
         _log.info("Server socket closed.")
+        backend.shutdown()
+        build_backend.shutdown()
+        journal.close()
     sys.exit(0)
 
 
@@ -0,0 +1,270 @@
+"""Module used to choose where the executors are ran.
+
+By default, executions are handed over to a pool of worker processes, so that compiling,
+running and decoding the output of a program never competes with the network threads of
+the server for the GIL.
+"""
+
+from __future__ import annotations
+
+import abc
+import concurrent.futures
+import functools
+import logging
+import multiprocessing
+import threading
+import typing
+
+if typing.TYPE_CHECKING:
+    import multiprocessing.queues
+
+    from sae302.server.executor import (
+        BaseExecutor,
+        BuildProfile,
+        ExecutorConfig,
+        Program,
+        RunReturn,
+    )
+
+_log = logging.getLogger(__name__)
+
+type EVENT_CALLBACK = typing.Callable[[str, str, typing.Any], None]
+"""A function called with the job ID, the kind and the value of an event reported by an
+executor. See :py:meth:`sae302.server.executor.BaseExecutor.report`."""
+
+_worker_events: "multiprocessing.queues.Queue[tuple[str, str, typing.Any]] | None" = (
+    None
+)
+"""The queue used by a worker process to send events back to the server."""
+
+
+def _init_worker(
+    events: "multiprocessing.queues.Queue[tuple[str, str, typing.Any]]",
+) -> None:
+    global _worker_events
+    _worker_events = events
+
+
+def _report_from_worker(job_id: str, event: str, value: typing.Any) -> None:
+    if _worker_events:
+        _worker_events.put((job_id, event, value))
+
+
+def run_executor(
+    executor: type["BaseExecutor"],
+    config: "ExecutorConfig",
+    profile: "BuildProfile | None",
+    job_id: str,
+    file_name: str,
+    file_content: str,
+    on_event: EVENT_CALLBACK = _report_from_worker,
+) -> "RunReturn":
+    """Execute a file. This is the function ran by the worker processes, it must stay at
+    the top level of the module to be picklable."""
+    return executor(functools.partial(on_event, job_id), config, profile).execute(
+        file_name, file_content
+    )
+
+
+def prepare_program(
+    executor: type["BaseExecutor"],
+    config: "ExecutorConfig",
+    profile: "BuildProfile | None",
+    job_id: str,
+    file_name: str,
+    file_content: str,
+    on_event: EVENT_CALLBACK = _report_from_worker,
+) -> "Program | RunReturn":
+    """Prepare a file to be ran several times. See
+    :py:meth:`BaseExecutor.timed_prepare`."""
+    return executor(functools.partial(on_event, job_id), config, profile).timed_prepare(
+        file_name, file_content
+    )
+
+
+def run_program(
+    executor: type["BaseExecutor"],
+    config: "ExecutorConfig",
+    profile: "BuildProfile | None",
+    job_id: str,
+    program: "Program",
+    run_options: dict[str, typing.Any],
+    on_event: EVENT_CALLBACK = _report_from_worker,
+) -> "RunReturn":
+    """Run a prepared program. See :py:meth:`BaseExecutor.run` for the options."""
+    return executor(functools.partial(on_event, job_id), config, profile).run(
+        program, **run_options
+    )
+
+
+class ExecutionBackend(metaclass=abc.ABCMeta):
+    """This base class is used to declare where executions take place.
+
+    This is not to be used directly.
+
+    Parameters
+    ----------
+    workers : int
+        The number of executions that may happen at the same time. Should match the
+        number of execution slots of the server.
+    on_event : EVENT_CALLBACK
+        Called, from any thread, for each event reported by the executors.
+    """
+
+    name: typing.ClassVar[str]
+
+    def __init__(self, workers: int, on_event: EVENT_CALLBACK):
+        self.workers = workers
+        self.on_event = on_event
+
+    @abc.abstractmethod
+    def call(
+        self, function: typing.Callable[..., typing.Any], *args: typing.Any
+    ) -> concurrent.futures.Future[typing.Any]:
+        """Call one of the functions of this module that run an executor, where
+        executions take place. The last argument of the function, ``on_event``, is given
+        by the backend.
+
+        Returns
+        -------
+        concurrent.futures.Future[typing.Any]
+            The future result of the function. Exceptions raised by the executor are set
+            on it.
+        """
+        raise NotImplementedError("Not implemented")
+
+    def submit(
+        self,
+        executor: type["BaseExecutor"],
+        config: "ExecutorConfig",
+        profile: "BuildProfile | None",
+        job_id: str,
+        file_name: str,
+        file_content: str,
+    ) -> concurrent.futures.Future["RunReturn"]:
+        """Start the execution of a file.
+
+        Returns
+        -------
+        concurrent.futures.Future[RunReturn]
+            The future result of the execution. Exceptions raised by the executor are
+            set on it.
+        """
+        return self.call(
+            run_executor, executor, config, profile, job_id, file_name, file_content
+        )
+
+    def prepare(
+        self,
+        executor: type["BaseExecutor"],
+        config: "ExecutorConfig",
+        profile: "BuildProfile | None",
+        job_id: str,
+        file_name: str,
+        file_content: str,
+    ) -> concurrent.futures.Future["Program | RunReturn"]:
+        """Start preparing a file to be ran several times, such as compiling it."""
+        return self.call(
+            prepare_program, executor, config, profile, job_id, file_name, file_content
+        )
+
+    def run(
+        self,
+        executor: type["BaseExecutor"],
+        config: "ExecutorConfig",
+        profile: "BuildProfile | None",
+        job_id: str,
+        program: "Program",
+        **run_options: typing.Any,
+    ) -> concurrent.futures.Future["RunReturn"]:
+        """Start running a prepared program. See :py:meth:`BaseExecutor.run` for the
+        options."""
+        return self.call(
+            run_program, executor, config, profile, job_id, program, run_options
+        )
+
+    def shutdown(self) -> None:
+        """Release the resources used by the backend."""
+
+
+class ThreadBackend(ExecutionBackend):
+    """Runs the executor in the calling thread. Nothing is isolated from the server."""
+
+    name = "thread"
+
+    def call(
+        self, function: typing.Callable[..., typing.Any], *args: typing.Any
+    ) -> concurrent.futures.Future[typing.Any]:
+        future: concurrent.futures.Future[typing.Any] = concurrent.futures.Future()
+        try:
+            future.set_result(function(*args, self.on_event))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class ProcessPoolBackend(ExecutionBackend):
+    """Runs the executors in a pool of worker processes.
+
+    Workers are started from a fork server, as forking the multi-threaded server itself
+    is not safe. Events reported by the executors are sent back through a queue, read by
+    a thread of the server.
+    """
+
+    name = "process"
+
+    def __init__(self, workers: int, on_event: EVENT_CALLBACK):
+        super().__init__(workers, on_event)
+        context = multiprocessing.get_context("forkserver")
+        self.events: (
+            "multiprocessing.queues.Queue[tuple[str, str, typing.Any] | None]"
+        ) = context.Queue()
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.events,),
+        )
+        self._events_thread = threading.Thread(
+            target=self._dispatch_events, name="BackendEvents", daemon=True
+        )
+        self._events_thread.start()
+        _log.debug("Started a pool of %s worker processes.", workers)
+
+    def call(
+        self, function: typing.Callable[..., typing.Any], *args: typing.Any
+    ) -> concurrent.futures.Future[typing.Any]:
+        # Workers report events through their queue, the default of ``on_event``.
+        return self.pool.submit(function, *args)
+
+    def shutdown(self) -> None:
+        # Waiting for the running executions lets the queues be closed before the
+        # process exits, and their semaphores be released.
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.events.put(None)
+        self._events_thread.join()
+        self.events.close()
+        self.events.join_thread()
+
+    def _dispatch_events(self) -> None:
+        while (event := self.events.get()) is not None:
+            try:
+                self.on_event(*event)
+            except Exception:
+                _log.exception("Could not handle the event %s", event)
+
+
+BACKENDS: dict[str, type[ExecutionBackend]] = {
+    backend.name: backend for backend in (ThreadBackend, ProcessPoolBackend)
+}
+
+
+def create_backend(name: str, slots: int, on_event: EVENT_CALLBACK) -> ExecutionBackend:
+    """Create the execution backend with the given name.
+
+    Raises
+    ------
+    KeyError
+        No backend has this name.
+    """
+    return BACKENDS[name](slots, on_event)
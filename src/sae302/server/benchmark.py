@@ -0,0 +1,127 @@
+"""Module used to measure how fast programs run, for benchmark jobs.
+
+A single run tells little about the speed of a program, so a benchmark runs it a few
+times to warm the caches up, then measures several runs, one at a time. Runs are pinned
+to a processor, so that they do not move from one processor to another while measured.
+Processors can be reserved for benchmarks, in which case the other jobs do not run on
+them.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import queue
+import statistics
+import typing
+
+if typing.TYPE_CHECKING:
+    from sae302.commons.messages import BenchmarkResult, TimingSummary
+
+_log = logging.getLogger(__name__)
+
+
+def summarize(samples: list[float]) -> "TimingSummary":
+    """Compute the statistics of the measured runs of a program.
+
+    Outliers are counted with Tukey's fences: runs further than 1.5 interquartile ranges
+    from the first or the third quartile.
+    """
+    if len(samples) > 1:
+        first, _, third = statistics.quantiles(samples, n=4)
+        spread = 1.5 * (third - first)
+        outliers = sum(
+            not first - spread <= sample <= third + spread for sample in samples
+        )
+    else:
+        outliers = 0
+    return {
+        "samples": samples,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "outliers": outliers,
+    }
+
+
+def result(file_name: str, wall: list[float], cpu: list[float]) -> "BenchmarkResult":
+    """Gather the measurements of a program."""
+    return {"file_name": file_name, "wall": summarize(wall), "cpu": summarize(cpu)}
+
+
+class CpuPool:
+    """The processors benchmarks are pinned to, each used by one benchmark at a time.
+
+    Parameters
+    ----------
+    cpus : list[int] | None
+        The processors reserved for benchmarks. They are removed from the processors of
+        the server, and so of the processes it starts afterwards: this must be done
+        before any thread or process is started. If not given, benchmarks share the last
+        processor of the server with the other jobs.
+
+    Raises
+    ------
+    ValueError
+        The processors are not available to the server, or no processor would be left
+        for the other jobs.
+    """
+
+    def __init__(self, cpus: list[int] | None = None):
+        available = (
+            os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else set()
+        )
+        self.isolated = bool(cpus)
+        if cpus:
+            if not set(cpus) <= available:
+                raise ValueError(
+                    f"Processors {sorted(set(cpus) - available)} are not available."
+                )
+            if not available - set(cpus):
+                raise ValueError("No processor would be left for the other jobs.")
+            os.sched_setaffinity(0, available - set(cpus))
+            _log.info("Processors %s are reserved for benchmarks.", cpus)
+        else:
+            cpus = sorted(available)[-1:]
+
+        self._free: queue.Queue[int | None] = queue.Queue()
+        for cpu in cpus or [None]:
+            self._free.put(cpu)
+
+    def share(self, index: int, workers: int) -> None:
+        """Keep only the processors of one of several server processes, so that they do
+        not pin benchmarks to the same processors. If there are fewer processors than
+        processes, some processes share a processor.
+
+        Parameters
+        ----------
+        index : int
+            The index of the server process.
+        workers : int
+            The number of server processes.
+        """
+        cpus: list[int | None] = []
+        while not self._free.empty():
+            cpus.append(self._free.get_nowait())
+        kept = (
+            cpus[index::workers] if len(cpus) >= workers else [cpus[index % len(cpus)]]
+        )
+        for cpu in kept:
+            self._free.put(cpu)
+
+    @contextlib.contextmanager
+    def acquire(self) -> typing.Iterator[int | None]:
+        """Wait for a processor no other benchmark is using.
+
+        Yields
+        ------
+        int | None
+            The processor, or None if processors are not known on this system.
+        """
+        cpu = self._free.get()
+        try:
+            yield cpu
+        finally:
+            self._free.put(cpu)
@@ -0,0 +1,117 @@
+"""Module used to keep the files uploaded by the clients, so that the same file is never
+sent twice.
+
+Before sending a file, a client offers its hash (See
+:py:class:`sae302.commons.messages.OfferMessage`). Only the files the
+:py:class:`BlobStore` does not have are uploaded, then jobs give their file by hash, so
+that submitting the same file again, or the same file to several jobs, costs almost
+nothing. A new version of a file the store has may also be uploaded as its differences
+with it (See :py:mod:`sae302.commons.delta`).
+"""
+
+from __future__ import annotations
+
+import logging
+import pathlib
+
+from sae302.commons import delta, messages
+from sae302.server.cache import ArtifactCache
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_MAX_BLOBS = 1024
+"""Number of files kept by default. The least recently used ones are removed first."""
+
+
+class BlobStore:
+    """A directory of uploaded files, by hash (See
+    :py:func:`sae302.commons.messages.blob_hash`).
+
+    Parameters
+    ----------
+    directory : pathlib.Path
+        The directory holding the files. It is created if needed.
+    max_entries : int
+        The number of files to keep.
+    """
+
+    def __init__(self, directory: pathlib.Path, max_entries: int = DEFAULT_MAX_BLOBS):
+        self._cache = ArtifactCache(directory, max_entries)
+
+    def missing(self, hashes: list[str]) -> list[str]:
+        """Find which of the offered files must be uploaded. The other ones are marked
+        as recently used, so that they are kept until the client uses them."""
+        return [blob for blob in hashes if self._cache.get(blob) is None]
+
+    def add(self, content: str) -> str:
+        """Keep an uploaded file.
+
+        Returns
+        -------
+        str
+            The hash of the file.
+        """
+        blob = messages.blob_hash(content)
+        if self._cache.get(blob) is None:
+            path = self._cache.reserve(blob)
+            try:
+                path.write_bytes(content.encode())
+            except OSError:
+                self._cache.discard(path)
+                raise
+            self._cache.commit(blob, path)
+            _log.debug("Stored file %s", blob)
+        return blob
+
+    def signature(self, blob: str) -> messages.FileSignature | None:
+        """Compute the signature of a file, for a new version of it to be uploaded as a
+        delta.
+
+        Returns
+        -------
+        messages.FileSignature | None
+            The signature, or None if the file is unknown.
+        """
+        try:
+            return delta.signature(self.read(blob), blob)
+        except ValueError:
+            return None
+
+    def add_delta(self, message: messages.DeltaMessage) -> str:
+        """Keep a file uploaded as its differences with an older version.
+
+        Returns
+        -------
+        str
+            The hash of the file.
+
+        Raises
+        ------
+        ValueError
+            The older version is unknown, or the delta does not rebuild the file it is
+            meant to.
+        """
+        content = delta.apply(
+            self.read(message.base), message.block_size, message.read_instructions()
+        )
+        if messages.blob_hash(content) != message.blob:
+            raise ValueError(f"The delta does not rebuild the file {message.blob}.")
+        return self.add(content)
+
+    def read(self, blob: str) -> str:
+        """Read an uploaded file.
+
+        Raises
+        ------
+        ValueError
+            The file is unknown, such as when it has been removed since it was offered.
+            It must be uploaded again.
+        """
+        messages.parse_blob_hashes([blob])
+        path = self._cache.get(blob)
+        try:
+            if path:
+                return path.read_bytes().decode()
+        except FileNotFoundError:
+            pass
+        raise ValueError(f"Unknown file {blob}, it must be uploaded again.")
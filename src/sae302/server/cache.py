@@ -0,0 +1,126 @@
+"""Module used to keep what the executors compile, so that the same work is not done
+twice.
+
+A cache is a directory shared by every worker process. Entries, either files or
+directories, are written under a temporary name, then renamed, so that they are never
+seen half-written.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import logging
+import os
+import pathlib
+import shutil
+import threading
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 256
+"""Number of entries kept by default. The least recently used ones are removed first."""
+
+
+def artifact_key(*parts: str | bytes) -> str:
+    """Compute the key of an artifact from everything its content depends on, such as
+    the compiler, the flags and the source.
+
+    Returns
+    -------
+    str
+        A SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode() if isinstance(part, str) else part
+        # Prefix each part with its length, so that ("ab", "c") and ("a", "bc") differ.
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """A directory of compiled artifacts, such as programs or object files, by key.
+
+    Parameters
+    ----------
+    directory : pathlib.Path
+        The directory holding the artifacts. It is created if needed.
+    max_entries : int
+        The number of artifacts to keep.
+    """
+
+    def __init__(self, directory: pathlib.Path, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> pathlib.Path | None:
+        """Find an artifact in the cache.
+
+        Returns
+        -------
+        pathlib.Path | None
+            The path of the artifact, or None if it is not in the cache.
+        """
+        path = self.directory / key
+        try:
+            # Mark the entry as recently used.
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        _log.debug("Found %s in the artifact cache.", key)
+        return path
+
+    def reserve(self, key: str) -> pathlib.Path:
+        """Obtain a temporary path in the cache directory, to write an artifact into
+        before calling :py:meth:`commit`."""
+        return self.directory / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def commit(self, key: str, path: pathlib.Path) -> pathlib.Path:
+        """Move an artifact, written at a path given by :py:meth:`reserve`, into the
+        cache.
+
+        Returns
+        -------
+        pathlib.Path
+            The final path of the artifact.
+        """
+        destination = self.directory / key
+        try:
+            os.replace(path, destination)
+        except OSError:
+            if not path.is_dir() or not destination.is_dir():
+                raise
+            # Another worker created the same directory first.
+            shutil.rmtree(path, ignore_errors=True)
+        self._evict()
+        return destination
+
+    def discard(self, path: pathlib.Path) -> None:
+        """Remove an artifact that has been reserved, but not committed."""
+        _remove(path)
+
+    def _evict(self) -> None:
+        entries: list[tuple[float, pathlib.Path]] = []
+        for path in self.directory.iterdir():
+            if path.name.startswith("."):
+                continue
+            with contextlib.suppress(FileNotFoundError):
+                entries.append((path.stat().st_mtime, path))
+        if len(entries) <= self.max_entries:
+            return
+
+        entries.sort()
+        for _, path in entries[: len(entries) - self.max_entries]:
+            _log.debug("Removing %s from the artifact cache.", path.name)
+            _remove(path)
+
+
+def _remove(path: pathlib.Path) -> None:
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        with contextlib.suppress(FileNotFoundError):
+            path.unlink()
@@ -0,0 +1,117 @@
+"""Module used to capture the output of the processes started by the executors.
+
+A program printing in a loop must not fill the memory of the server, so only the start
+and the end of its output are kept, the middle being elided. The whole output can
+optionally be spilled to a file, which the server sends to the client without reading it
+back.
+"""
+
+from __future__ import annotations
+
+import logging
+import pathlib
+import tempfile
+import typing
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT_LIMIT = 64 * 1024
+"""Number of bytes kept by default at the start, and again at the end, of an output."""
+
+
+class OutputCapture:
+    """Keeps the first and the last ``limit`` bytes of an output fed in chunks, in
+    constant memory. The end is kept in a ring buffer.
+
+    Parameters
+    ----------
+    limit : int | None
+        The number of bytes kept at the start, and at the end. If None, everything is
+        kept.
+    spill : bool
+        If True, the whole output is also written to a temporary file once part of it is
+        elided. See :py:attr:`spill_path`.
+    """
+
+    def __init__(self, limit: int | None = DEFAULT_OUTPUT_LIMIT, spill: bool = False):
+        self.limit = limit
+        self.spill = spill
+        self.total = 0
+        """Number of bytes fed so far."""
+        self.spill_path: pathlib.Path | None = None
+        """The file holding the whole output, if it has been spilled."""
+
+        self._head = bytearray()
+        self._tail = bytearray(limit or 0)
+        self._tail_length = 0
+        self._tail_end = 0
+        """Where the next byte of the ring buffer is written."""
+        self._spill_file: typing.BinaryIO | None = None
+
+    @property
+    def elided(self) -> int:
+        """Number of bytes of the output that are not kept in memory."""
+        return self.total - len(self._head) - self._tail_length
+
+    def feed(self, data: bytes) -> None:
+        """Account for a new chunk of output."""
+        self.total += len(data)
+        if self.limit is None:
+            self._head += data
+            return
+
+        if self._spill_file:
+            self._spill_file.write(data)
+        room = self.limit - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+            if not data:
+                return
+        if (
+            self.spill
+            and not self._spill_file
+            and self._tail_length + len(data) > self.limit
+        ):
+            self._start_spill(data)
+        self._push_tail(data)
+
+    def _start_spill(self, data: bytes) -> None:
+        file = tempfile.NamedTemporaryFile(
+            prefix="sae302-output-", suffix=".log", delete=False
+        )
+        _log.debug("Spilling output to %s", file.name)
+        file.write(self._head)
+        file.write(self._tail_bytes())
+        file.write(data)
+        self._spill_file = typing.cast(typing.BinaryIO, file)
+        self.spill_path = pathlib.Path(file.name)
+
+    def _push_tail(self, data: bytes) -> None:
+        size = len(self._tail)
+        data = memoryview(data)[-size:]
+        first = min(len(data), size - self._tail_end)
+        self._tail[self._tail_end : self._tail_end + first] = data[:first]
+        self._tail[: len(data) - first] = data[first:]
+        self._tail_end = (self._tail_end + len(data)) % size
+        self._tail_length = min(size, self._tail_length + len(data))
+
+    def _tail_bytes(self) -> bytes:
+        if self._tail_length < len(self._tail):
+            return bytes(self._tail[: self._tail_length])
+        return bytes(self._tail[self._tail_end :] + self._tail[: self._tail_end])
+
+    def close(self) -> None:
+        """Flush the spill file, once the output is over."""
+        if self._spill_file:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def text(self) -> str:
+        """The output kept in memory, decoded, with a notice in place of the elided
+        bytes."""
+        if not self.elided:
+            return (self._head + self._tail_bytes()).decode(errors="replace")
+        head = self._head.decode(errors="replace")
+        tail = self._tail_bytes().decode(errors="replace")
+        return f"{head}\n[... {self.elided} bytes elided ...]\n{tail}"
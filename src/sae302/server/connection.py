@@ -0,0 +1,220 @@
+"""Module used to exchange messages with the clients.
+
+Each client has a :py:class:`Connection`, owning the messages waiting to be sent to it.
+Handlers and execution workers only queue their messages, which never blocks them, while
+the thread of the client reads its requests and writes the queued messages as fast as
+the client accepts them.
+
+A client that does not read its messages is slowed down, then dropped:
+
+- Once more than :py:data:`HIGH_WATERMARK` bytes are waiting to be sent to it, its
+  requests are not read anymore, so that it cannot make the server produce more replies,
+  until less than :py:data:`LOW_WATERMARK` bytes are left.
+- Once more than its buffer budget would be waiting, for instance because its jobs keep
+  sending output, it is disconnected.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import selectors
+import socket
+import threading
+import typing
+
+from sae302.commons import messages
+
+_log = logging.getLogger(__name__)
+
+HIGH_WATERMARK = 1024 * 1024
+"""Amount of bytes waiting to be sent after which the requests of a client are not
+read."""
+LOW_WATERMARK = 256 * 1024
+"""Amount of bytes waiting to be sent under which the requests of a client are read
+again."""
+DEFAULT_BUFFER_BUDGET = 16 * 1024 * 1024
+"""Amount of bytes that may be waiting to be sent to a client before it is
+disconnected."""
+
+
+class Connection:
+    """The connection of a client, with the messages waiting to be sent to it.
+
+    Parameters
+    ----------
+    sock : socket.socket
+        The socket of the client. It is made non-blocking.
+    budget : int
+        Amount of bytes that may be waiting to be sent before the client is
+        disconnected. A single message is always accepted when nothing else is waiting,
+        whatever its size.
+    """
+
+    def __init__(self, sock: socket.socket, budget: int = DEFAULT_BUFFER_BUDGET):
+        self.socket = sock
+        self.socket.setblocking(False)
+        self.budget = budget
+
+        self._lock = threading.Lock()
+        self._writer = messages.MessageWriter()
+        self._is_closed = False
+        self._is_overflowing = False
+        self._unprocessed = b""
+        """Data received from the client, left aside while it was congested."""
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(False)
+        self._wakeup_writer.setblocking(False)
+
+    @property
+    def port(self) -> int | None:
+        """The port of the client, used to tell clients apart in the logs."""
+        # The peer is unknown once the connection has been reset.
+        with contextlib.suppress(OSError):
+            return self.socket.getpeername()[1]
+        return None
+
+    @property
+    def pending_bytes(self) -> int:
+        """Amount of bytes waiting to be sent."""
+        with self._lock:
+            return self._writer.pending_bytes
+
+    @property
+    def is_congested(self) -> bool:
+        """Whether more than :py:data:`HIGH_WATERMARK` bytes are waiting to be sent, in
+        which case no more requests should be handled."""
+        return self.pending_bytes > HIGH_WATERMARK
+
+    def send(self, message: messages.PackedMessage) -> bool:
+        """Queue a message to be sent to the client. It never blocks: the message is
+        written by :py:meth:`serve`, and discarded once written.
+
+        Returns
+        -------
+        bool
+            False if the message was dropped, because the connection is closed, or
+            because it would exceed the buffer budget, in which case the client is
+            disconnected.
+        """
+        with self._lock:
+            accepted = not (self._is_closed or self._is_overflowing)
+            if accepted and self._writer:
+                if self._writer.pending_bytes + len(message) > self.budget:
+                    self._is_overflowing = True
+                    accepted = False
+            if accepted:
+                self._writer.push(message)
+        if not accepted:
+            message.discard()
+        self._wake()
+        return accepted
+
+    def serve(self, on_data: typing.Callable[[bytes], bytes]) -> None:
+        """Read from and write to the client, until it disconnects, it exceeds its
+        buffer budget or the connection is closed.
+
+        Parameters
+        ----------
+        on_data : typing.Callable[[bytes], bytes]
+            Called with the data received from the client. It returns the data it did
+            not handle because the connection became congested, which is given back to
+            it once the client has read enough.
+
+        Raises
+        ------
+        OSError
+            The connection is broken.
+        """
+        is_reading = True
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(self._wakeup_reader, selectors.EVENT_READ)
+                registered = 0
+                while True:
+                    with self._lock:
+                        if self._is_closed:
+                            return
+                        if self._is_overflowing:
+                            _log.warning(
+                                "Port %s does not read its messages, %s bytes are"
+                                " waiting",
+                                self.port,
+                                self._writer.pending_bytes,
+                            )
+                            return
+                        pending = self._writer.pending_bytes
+                        has_pending = bool(self._writer)
+
+                    if is_reading and pending > HIGH_WATERMARK:
+                        _log.debug("Pausing the requests of port %s", self.port)
+                        is_reading = False
+                    elif not is_reading and pending < LOW_WATERMARK:
+                        _log.debug("Resuming the requests of port %s", self.port)
+                        is_reading = True
+                    if is_reading and self._unprocessed:
+                        self._unprocessed = on_data(self._unprocessed)
+                        continue
+
+                    events = 0
+                    if is_reading:
+                        events |= selectors.EVENT_READ
+                    if has_pending:
+                        events |= selectors.EVENT_WRITE
+                    if events != registered:
+                        if not registered:
+                            selector.register(self.socket, events)
+                        elif not events:
+                            selector.unregister(self.socket)
+                        else:
+                            selector.modify(self.socket, events)
+                        registered = events
+
+                    for key, mask in selector.select():
+                        if key.fileobj is self._wakeup_reader:
+                            with contextlib.suppress(BlockingIOError):
+                                self._wakeup_reader.recv(1024)
+                            continue
+                        if mask & selectors.EVENT_WRITE:
+                            with self._lock:
+                                self._writer.flush(self.socket)
+                        if mask & selectors.EVENT_READ and not self._read(on_data):
+                            return
+        finally:
+            self.socket.close()
+            self._wakeup_reader.close()
+            self._wakeup_writer.close()
+
+    def close(self) -> None:
+        """Close the connection, dropping the messages that are still waiting to be
+        sent."""
+        with self._lock:
+            self._is_closed = True
+            self._writer.clear()
+        with contextlib.suppress(OSError):
+            self.socket.shutdown(socket.SHUT_RDWR)
+        self._wake()
+
+    def _read(self, on_data: typing.Callable[[bytes], bytes]) -> bool:
+        """Read the data received from the client. A single read is done at once, so
+        that the watermarks are checked again before reading more requests.
+
+        Returns
+        -------
+        bool
+            False once the client has disconnected.
+        """
+        try:
+            data = self.socket.recv(messages.RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return True
+        if data:
+            self._unprocessed = on_data(data)
+        return bool(data)
+
+    def _wake(self) -> None:
+        with contextlib.suppress(OSError):
+            self._wakeup_writer.send(b"\0")
+
+    def __repr__(self) -> str:
+        return f"<Connection port={self.port}>"
@@ -3,30 +3,539 @@ from __future__ import annotations
 import abc
 import contextlib
 import functools
+import json
 import logging
 import os
+import pathlib
+import re
+import resource
+import select
+import selectors
 import shutil
+import signal
+import socket
 import subprocess
+import sys
 import tempfile
+import threading
+import time
 import typing
 
+from sae302.server import profiling
+from sae302.server.cache import ArtifactCache, artifact_key
+from sae302.server.capture import DEFAULT_OUTPUT_LIMIT, OutputCapture
+
+if typing.TYPE_CHECKING:
+    from sae302.commons.messages import ExecutionStats, ProfileReport
+
 _log = logging.getLogger(__name__)
 
 
+PRECOMPILED_HEADER = "sae302-headers.h"
+"""The name of the header including every precompiled header."""
+
+CPP_STANDARD_HEADERS = frozenset(
+    {
+        "algorithm",
+        "array",
+        "bitset",
+        "cassert",
+        "cctype",
+        "chrono",
+        "climits",
+        "cmath",
+        "cstdint",
+        "cstdio",
+        "cstdlib",
+        "cstring",
+        "deque",
+        "fstream",
+        "functional",
+        "iomanip",
+        "iostream",
+        "iterator",
+        "limits",
+        "list",
+        "map",
+        "memory",
+        "numeric",
+        "optional",
+        "queue",
+        "random",
+        "set",
+        "sstream",
+        "stack",
+        "string",
+        "string_view",
+        "tuple",
+        "unordered_map",
+        "unordered_set",
+        "utility",
+        "vector",
+    }
+)
+"""The C++ standard headers that are precompiled when a file includes them."""
+
+READ_SIZE = 64 * 1024
+"""Number of bytes read at once from the output of a process."""
+PIPE_BUF = getattr(select, "PIPE_BUF", 512)
+"""Number of bytes written at once to the input of a process."""
+
+_INCLUDE_PATTERN = re.compile(r"\s*#\s*include\s*<([\w./]+)>\s*(//.*)?$")
+_JAVA_CLASS_PATTERN = re.compile(
+    r"^((?:(?:public|abstract|final|strictfp|sealed|non-sealed)\s+)*)"
+    r"(?:class|interface|enum|record)\s+(\w+)",
+    re.MULTILINE,
+)
+
+
+PRELOADED_MODULES = (
+    "bisect",
+    "collections",
+    "dataclasses",
+    "functools",
+    "heapq",
+    "itertools",
+    "json",
+    "math",
+    "random",
+    "re",
+    "string",
+    "typing",
+)
+"""The modules imported by the Python interpreters while they wait for a job, unless the
+``preload`` option of the executor lists others."""
+
+PYTHON_RUNNER = """\
+import os
+import resource
+import sys
+
+for name in sys.argv[1:]:
+    try:
+        __import__(name)
+    except Exception:
+        pass
+
+# Tell the pool the interpreter is ready. The script must not inherit the pipe.
+ready = int(os.environ.pop("SAE302_READY_FD"))
+os.write(ready, b"\\n")
+os.close(ready)
+
+line = b""
+while not line.endswith(b"\\n"):
+    # Read byte by byte, so that the rest of the input is left to the script.
+    data = os.read(0, 1)
+    if not data:
+        sys.exit(0)
+    line += data
+
+import json
+import marshal
+import types
+
+request = json.loads(line)
+path = request["path"]
+# The resources used so far, counted like the ones the server obtains once it exits.
+usage = [
+    max(values) if index == 2 else sum(values)
+    for index, values in enumerate(
+        zip(
+            resource.getrusage(resource.RUSAGE_SELF),
+            resource.getrusage(resource.RUSAGE_CHILDREN),
+        )
+    )
+]
+with open(request["usage"], "w") as file:
+    json.dump(usage, file)
+
+
+def write_peak(path=request["usage"]):
+    # Add the peak memory of the script, in bytes, to the resources used before it.
+    try:
+        with open("/proc/self/status") as status:
+            for entry in status:
+                if entry.startswith("VmHWM:"):
+                    with open(path, "a") as file:
+                        file.write("\\n%d" % (int(entry.split()[1]) * 1024))
+    except OSError:
+        pass
+
+
+# Linux can reset the peak memory of the interpreter, so that the one of the script
+# alone is measured.
+try:
+    with open("/proc/self/clear_refs", "w") as file:
+        file.write("5")
+except OSError:
+    pass
+else:
+    import atexit
+
+    atexit.register(write_peak)
+
+# The script must import itself, not a preloaded module of the same name.
+sys.modules.pop(os.path.basename(path)[:-3], None)
+main = types.ModuleType("__main__")
+main.__file__ = path
+main.__builtins__ = __builtins__
+sys.modules["__main__"] = main
+sys.argv = [path, *request["args"]]
+sys.path[0] = os.path.dirname(path)
+
+cached = "%s.%s.opt-%d.code" % (path, sys.implementation.cache_tag, sys.flags.optimize)
+code = None
+try:
+    with open(cached, "rb") as file:
+        code = marshal.load(file)
+except (OSError, EOFError, ValueError, TypeError):
+    pass
+
+try:
+    if code is None:
+        with open(path, "rb") as file:
+            code = compile(file.read(), path, "exec", dont_inherit=True)
+        temporary = "%s.%d.tmp" % (cached, os.getpid())
+        try:
+            with open(temporary, "wb") as file:
+                marshal.dump(code, file)
+            os.replace(temporary, cached)
+        except OSError:
+            pass
+    exec(code, vars(main))
+except SystemExit:
+    raise
+except BaseException as e:
+    # Hide the frame of the runner from the traceback.
+    traceback = e.__traceback__.tb_next
+    sys.excepthook(type(e), e.with_traceback(traceback), traceback)
+    sys.exit(1)
+"""
+"""The program ran by the pooled Python interpreters (See :py:class:`InterpreterPool`).
+
+It imports the modules given as arguments, writes a line into the pipe whose descriptor
+is in the ``SAE302_READY_FD`` environment variable, then waits for a line on its
+standard input: a JSON object with the ``path`` of a script, its ``args``, and the file
+it writes the resources it and its children, such as a launcher, have used so far into,
+under ``usage``. The rest of the input is left to the script. The code of the script is
+compiled once, and kept next to it.
+"""
+
+
+@functools.cache
+def _which(command: str) -> str | None:
+    """Resolve a command to the absolute path of its executable, once per process."""
+    return shutil.which(command)
+
+
+class InterpreterPool:
+    """Interpreters started ahead of time, so that a job does not wait for the
+    interpreter to start and import common modules.
+
+    One spare interpreter is kept for each command line. It is handed over to a job, and
+    replaced once the job is done, so that starting the next one does not compete with
+    the job for the processor. An interpreter is only handed over once it has imported
+    its modules, so that a job ran right after another one, such as the runs of a
+    benchmark, does not wait for it while measured. Spare interpreters exit once the
+    process that started them exits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spares: dict[tuple[str, ...], tuple[subprocess.Popen[bytes], int]] = {}
+
+    def take(self, args: list[str]) -> subprocess.Popen[bytes]:
+        """Obtain an interpreter waiting on its standard input, starting one if there is
+        no spare. Waits for the interpreter to be ready."""
+        with self._lock:
+            spare = self._spares.pop(tuple(args), None)
+        if spare is None or spare[0].poll() is not None:
+            if spare:
+                os.close(spare[1])
+            spare = self._start(args)
+        proc, ready = spare
+        try:
+            # A line once the modules are imported, nothing if the interpreter exited.
+            os.read(ready, 1)
+        finally:
+            os.close(ready)
+        return proc
+
+    def replenish(self, args: list[str]) -> None:
+        """Start a spare interpreter for the given command line, if there is none."""
+        with self._lock:
+            if tuple(args) in self._spares:
+                return
+            self._spares[tuple(args)] = self._start(args)
+
+    @staticmethod
+    def _start(args: list[str]) -> tuple[subprocess.Popen[bytes], int]:
+        """Start an interpreter, with the pipe it tells it is ready into (See
+        :py:data:`PYTHON_RUNNER`).
+
+        Returns
+        -------
+        tuple[subprocess.Popen[bytes], int]
+            The interpreter, and the end of the pipe to read.
+        """
+        read_fd, write_fd = os.pipe()
+        try:
+            proc = subprocess.Popen(
+                args,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                close_fds=True,
+                pass_fds=(write_fd,),
+                env={**os.environ, "SAE302_READY_FD": str(write_fd)},
+                process_group=0,
+            )
+        except BaseException:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        return proc, read_fd
+
+
+_interpreters = InterpreterPool()
+"""The spare interpreters of this process."""
+
+
 class RunReturn:
     code: int
     output: str
     additional_message: str | None
-
-    def __init__(self, code: int, output: str, additional_message: str | None = None):
+    spill: pathlib.Path | None
+    """The file holding the whole output, when only part of it is in ``output``. The
+    server sends it as the logs, then removes it."""
+    duration: float | None
+    """The time, in seconds, the process ran for."""
+    timed_out: bool
+    usage: resource.struct_rusage | None
+    """The resources used by the process, and the children it waited for."""
+    max_rss: int | None
+    """The peak resident memory of the process, in bytes, if known. Linux carries the
+    peak memory of a process over to the programs it executes, so the peak of the
+    process is only known once it exceeds the one of the process that started it.
+    Otherwise, it is an upper bound (See :py:attr:`max_rss_upper_bound`)."""
+    max_rss_upper_bound: bool
+    """Whether :py:attr:`max_rss` is only an upper bound of the peak memory, being the
+    one carried over from the process that started it."""
+    compile_time: float | None
+    """The time, in seconds, taken to prepare the file. See
+    :py:meth:`BaseExecutor.execute`."""
+    profile_report: ProfileReport | None
+    """The profile of the program, if it was profiled and exited normally. See
+    :py:mod:`sae302.server.profiling`."""
+
+    def __init__(
+        self,
+        code: int,
+        output: str,
+        additional_message: str | None = None,
+        spill: pathlib.Path | None = None,
+        duration: float | None = None,
+        timed_out: bool = False,
+        usage: resource.struct_rusage | None = None,
+        max_rss: int | None = None,
+        max_rss_upper_bound: bool = False,
+        compile_time: float | None = None,
+        profile_report: ProfileReport | None = None,
+    ):
         self.code = code
         self.output = output
         self.additional_message = additional_message
+        self.spill = spill
+        self.duration = duration
+        self.timed_out = timed_out
+        self.usage = usage
+        self.max_rss = max_rss
+        self.max_rss_upper_bound = max_rss_upper_bound
+        self.compile_time = compile_time
+        self.profile_report = profile_report
+
+    def stats(self) -> ExecutionStats:
+        """The measurements of the execution, as sent to the client."""
+        stats: ExecutionStats = {}
+        if self.compile_time is not None:
+            stats["compile_time"] = self.compile_time
+        if self.duration is not None:
+            stats["run_time"] = self.duration
+        if self.usage:
+            stats["user_time"] = self.usage.ru_utime
+            stats["system_time"] = self.usage.ru_stime
+            stats["voluntary_switches"] = self.usage.ru_nvcsw
+            stats["involuntary_switches"] = self.usage.ru_nivcsw
+        if self.max_rss is not None:
+            stats["max_rss"] = self.max_rss
+            if self.max_rss_upper_bound:
+                stats["max_rss_upper_bound"] = True
+        return stats
+
+
+class Program:
+    """A file an executor has prepared to be ran, possibly several times, such as a
+    compiled program. It may be ran from another worker process than the one that
+    prepared it.
+
+    Parameters
+    ----------
+    args : list[str]
+        The command running the program.
+    temporary : list[pathlib.Path] | None
+        Files to remove once the program is not needed anymore.
+    script : pathlib.Path | None
+        For the Python executor, the script handed over to a pooled interpreter, in
+        which case ``args`` is the command line of the interpreter.
+    """
+
+    def __init__(
+        self,
+        args: list[str],
+        temporary: list[pathlib.Path] | None = None,
+        script: pathlib.Path | None = None,
+    ):
+        self.args = args
+        self.temporary = temporary or []
+        self.script = script
+        self.compile_time: float | None = None
+        """The time, in seconds, taken to prepare the program."""
+
+    def release(self) -> None:
+        """Remove the temporary files and directories of the program."""
+        for path in self.temporary:
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+
+
+class ExecutorConfig:
+    """The settings of an executor, as given in the configuration file of the server
+    (See :py:mod:`sae302.server.registry`). Each executor is free to use them or not.
+
+    Parameters
+    ----------
+    flags : list[str] | None
+        Flags given to the compiler or the interpreter. If None, the executor uses its
+        defaults.
+    image : str | None
+        The container image used by executors running programs in containers.
+    timeout : float | None
+        The maximum time, in seconds, a single process may run.
+    memory_limit : int | None
+        The maximum size, in bytes, of the address space of a process.
+    output_limit : int
+        The number of bytes kept at the start, and again at the end, of the output of a
+        program. The middle is elided. See
+        :py:class:`sae302.server.capture.OutputCapture`.
+    spill_output : bool
+        If True, the whole output of a program that exceeds ``output_limit`` is written
+        to a file, sent to the client instead of the elided output.
+    options : typing.Any
+        Any other setting, specific to an executor.
+    """
+
+    artifact_cache: pathlib.Path | None = None
+    """The directory compiled programs are kept in, if any. It is set by the server for
+    every executor, see :py:mod:`sae302.server.cache`."""
+
+    def __init__(
+        self,
+        flags: list[str] | None = None,
+        image: str | None = None,
+        timeout: float | None = None,
+        memory_limit: int | None = None,
+        output_limit: int = DEFAULT_OUTPUT_LIMIT,
+        spill_output: bool = False,
+        **options: typing.Any,
+    ):
+        self.flags = flags
+        self.image = image
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.output_limit = output_limit
+        self.spill_output = spill_output
+        self.options = options
+
+    @classmethod
+    def from_table(cls, table: dict[str, typing.Any]) -> ExecutorConfig:
+        """Read the settings of an executor from its table of the configuration file.
+
+        Raises
+        ------
+        ValueError
+            A setting does not have the expected type.
+        """
+        flags = table.get("flags")
+        if flags is not None and not (
+            isinstance(flags, list) and all(isinstance(flag, str) for flag in flags)
+        ):
+            raise ValueError("flags must be a list of strings.")
+        image = table.get("image")
+        if image is not None and not isinstance(image, str):
+            raise ValueError("image must be a string.")
+        timeout = table.get("timeout")
+        if timeout is not None and not (
+            isinstance(timeout, (int, float)) and timeout > 0
+        ):
+            raise ValueError("timeout must be a positive number of seconds.")
+        memory_limit = table.get("memory_limit")
+        if memory_limit is not None and not (
+            isinstance(memory_limit, int) and memory_limit > 0
+        ):
+            raise ValueError("memory_limit must be a positive number of bytes.")
+        output_limit = table.get("output_limit", DEFAULT_OUTPUT_LIMIT)
+        if not (isinstance(output_limit, int) and output_limit > 0):
+            raise ValueError("output_limit must be a positive number of bytes.")
+        spill_output = table.get("spill_output", False)
+        if not isinstance(spill_output, bool):
+            raise ValueError("spill_output must be a boolean.")
+
+        options = {
+            key: value
+            for key, value in table.items()
+            if key
+            not in (
+                "flags",
+                "image",
+                "timeout",
+                "memory_limit",
+                "output_limit",
+                "spill_output",
+            )
+        }
+        return cls(
+            flags, image, timeout, memory_limit, output_limit, spill_output, **options
+        )
+
+
+class BuildProfile:
+    """A set of compiler flags a client can choose for its submission, such as ``debug``
+    or ``native``. Only the profiles allowed by the server can be used.
+
+    Parameters
+    ----------
+    name : str
+        The name the clients use to select the profile.
+    flags : list[str]
+        The flags given to the compiler, after the flags of the executor.
+    """
+
+    def __init__(self, name: str, flags: list[str]):
+        self.name = name
+        self.flags = flags
+
+    def __repr__(self) -> str:
+        return f"<BuildProfile name={self.name} flags={self.flags}>"
 
 
 class BaseExecutor(metaclass=abc.ABCMeta):
-    """This base class is used to declare supported job types and how they should execute.
-    All child classes must implement the `execute` method, which is used to execute a given script.
+    """This base class is used to declare supported job types and how they should
+    execute. All child classes must implement the `prepare` method, which is used to
+    prepare a given script to be ran, or the `execute` method, which is used to execute
+    it once.
 
     This is not to be used directly.
 
@@ -50,6 +559,42 @@ class BaseExecutor(metaclass=abc.ABCMeta):
 
     friendly_name: typing.ClassVar[str]
     supported_suffixes: typing.ClassVar[list[str]]
+    default_flags: typing.ClassVar[list[str]] = []
+    """Flags given to the compiler or the interpreter, unless the configuration
+    overrides them."""
+
+    def __init__(
+        self,
+        on_event: typing.Callable[[str, typing.Any], None] | None = None,
+        config: ExecutorConfig | None = None,
+        profile: BuildProfile | None = None,
+    ):
+        self.on_event = on_event
+        self.config = config or ExecutorConfig()
+        self.profile = profile
+
+    @property
+    def flags(self) -> list[str]:
+        if self.config.flags is not None:
+            return self.config.flags
+        return self.default_flags
+
+    def report(self, event: str, value: typing.Any) -> None:
+        """Report the progress of the execution to the server.
+
+        Parameters
+        ----------
+        event : str
+            The kind of event. ``phase`` is used when the execution enters a new phase
+            (Either ``COMPILING`` or ``RUNNING``), ``pid`` when a new process has been
+            started and ``exited`` once it is over. Processes are started in their own
+            process group, whose identifier is the one of the process, so that it can be
+            killed as a whole when the job is cancelled.
+        value : typing.Any
+            The value of the event.
+        """
+        if self.on_event:
+            self.on_event(event, value)
 
     @staticmethod
     def find_executable(commands: str | list[str]) -> str | None:
@@ -71,10 +616,266 @@ class BaseExecutor(metaclass=abc.ABCMeta):
         commands = [commands] if isinstance(commands, str) else commands
 
         for try_exe in commands:
-            if executable_path := shutil.which(try_exe):
+            if executable_path := _which(try_exe):
                 return executable_path
         return None
 
+    def run_command(
+        self,
+        args: list[str],
+        *,
+        input: bytes = b"",
+        timeout: float | None = None,
+        full_output: bool = False,
+        output_limit: int | None = None,
+        spill: bool = False,
+        session: socket.socket | None = None,
+        cpu: int | None = None,
+        env: dict[str, str] | None = None,
+    ) -> RunReturn:
+        """Run a command until it exits, and capture its output.
+
+        The command is executed directly, without going through a shell, so arguments
+        never need to be quoted. The first argument should be an absolute path, as
+        returned by :py:meth:`find_executable`, so that the ``PATH`` is not searched
+        again on each launch.
+
+        The process is started in its own process group (See :py:meth:`report`), does
+        not inherit any file descriptor of the server and reads from ``/dev/null``
+        unless an input is given. The timeout and memory limit of the configuration are
+        applied to it.
+
+        Parameters
+        ----------
+        args : list[str]
+            The executable and its arguments.
+        input : bytes
+            The standard input of the process.
+        timeout : float | None
+            A timeout shorter than the one of the configuration.
+        full_output : bool
+            If True, the whole output is kept, instead of its start and its end. Only
+            for the commands of the executor whose output it needs, such as a
+            preprocessor.
+        output_limit : int | None
+            The number of bytes kept at the start and at the end of the output, instead
+            of the one of the configuration.
+        spill : bool
+            If True, the whole output is spilled to a file when the configuration allows
+            it. Only for the programs of the clients, whose output is sent back.
+        session : socket.socket | None
+            A stream connected to the client, for interactive jobs (See
+            :py:mod:`sae302.server.session`). It becomes the standard input and output
+            of the process, in place of ``input``, and is closed once the process has
+            started. The output is then left to the other end of the stream.
+        cpu : int | None
+            The processor the process is pinned to, such as for benchmarks.
+        env : dict[str, str] | None
+            Variables added to the environment of the server for the process, such as to
+            configure a profiler.
+
+        Returns
+        -------
+        RunReturn
+            The exit code of the process, and its standard output and error, merged. The
+            output is empty for interactive jobs.
+        """
+        environment = {**os.environ, **env} if env else None
+        if session:
+            with session:
+                proc = subprocess.Popen(
+                    args,
+                    stdin=session.fileno(),
+                    stdout=session.fileno(),
+                    stderr=subprocess.STDOUT,
+                    close_fds=True,
+                    process_group=0,
+                    env=environment,
+                )
+            return self.wait_for(proc, timeout=timeout, cpu=cpu)
+
+        proc = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE if input else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            close_fds=True,
+            process_group=0,
+            env=environment,
+        )
+        return self.wait_for(
+            proc,
+            input=input,
+            timeout=timeout,
+            full_output=full_output,
+            output_limit=output_limit,
+            spill=spill,
+            cpu=cpu,
+        )
+
+    def wait_for(
+        self,
+        proc: subprocess.Popen[bytes],
+        *,
+        input: bytes = b"",
+        timeout: float | None = None,
+        full_output: bool = False,
+        output_limit: int | None = None,
+        spill: bool = False,
+        cpu: int | None = None,
+    ) -> RunReturn:
+        """Wait for a process started by the executor to exit, and capture its output.
+
+        The process is reported to the server, and the timeout and memory limit of the
+        configuration are applied to it from now on. It must have been started in its
+        own process group, with its standard output piped unless it is interactive, and
+        its standard input piped if an input is given. The input is written and the
+        output is read as the process goes, so that the memory used does not depend on
+        the size of the output (See :py:meth:`run_command` for the parameters).
+
+        Returns
+        -------
+        RunReturn
+            The exit code of the process, and its standard output and error, merged.
+        """
+        self.report("pid", proc.pid)
+        started_at = time.monotonic()
+        # The peak memory of this process, that the kernel carried over to the new one.
+        inherited_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if self.config.memory_limit and hasattr(resource, "prlimit"):
+            limit = (self.config.memory_limit, self.config.memory_limit)
+            with contextlib.suppress(ProcessLookupError):
+                resource.prlimit(proc.pid, resource.RLIMIT_AS, limit)
+        if cpu is not None and hasattr(os, "sched_setaffinity"):
+            with contextlib.suppress(ProcessLookupError):
+                os.sched_setaffinity(proc.pid, {cpu})
+
+        capture = OutputCapture(
+            None if full_output else output_limit or self.config.output_limit,
+            spill=spill and self.config.spill_output,
+        )
+        if self.config.timeout and (not timeout or timeout > self.config.timeout):
+            timeout = self.config.timeout
+        deadline = started_at + timeout if timeout else None
+        timed_out = False
+        pending = memoryview(input)
+        try:
+            with selectors.DefaultSelector() as selector:
+                # The output of an interactive process goes straight to its session.
+                reading = proc.stdout is not None
+                if proc.stdout:
+                    selector.register(proc.stdout, selectors.EVENT_READ)
+                if proc.stdin and pending:
+                    selector.register(proc.stdin, selectors.EVENT_WRITE)
+                elif proc.stdin:
+                    proc.stdin.close()
+
+                while reading:
+                    remaining = (
+                        None if deadline is None else deadline - time.monotonic()
+                    )
+                    if remaining is not None and remaining <= 0:
+                        timed_out = True
+                        deadline = None
+                        self._kill(proc)
+                        continue
+                    for key, _ in selector.select(remaining):
+                        if key.fileobj is proc.stdout:
+                            data = os.read(key.fd, READ_SIZE)
+                            if not data:
+                                reading = False
+                                break
+                            capture.feed(data)
+                            continue
+
+                        assert proc.stdin
+                        try:
+                            # Writes of up to PIPE_BUF bytes do not block once the pipe
+                            # is ready.
+                            pending = pending[
+                                os.write(proc.stdin.fileno(), pending[:PIPE_BUF]) :
+                            ]
+                        except BrokenPipeError:
+                            pending = pending[:0]
+                        if not pending:
+                            selector.unregister(proc.stdin)
+                            proc.stdin.close()
+        finally:
+            if proc.stdin:
+                proc.stdin.close()
+            if proc.stdout:
+                proc.stdout.close()
+            capture.close()
+
+        try:
+            usage = self._reap(
+                proc, None if deadline is None else deadline - time.monotonic()
+            )
+        except subprocess.TimeoutExpired:
+            # The process closed its output, but is still running.
+            timed_out = True
+            self._kill(proc)
+            usage = self._reap(proc, None)
+        duration = time.monotonic() - started_at
+        self.report("exited", proc.pid)
+        # Linux counts in kibibytes, macOS in bytes.
+        scale = 1 if sys.platform == "darwin" else 1024
+
+        output = capture.text()
+        if timed_out:
+            output += f"\nTime limit of {timeout} seconds exceeded.\n"
+        return RunReturn(
+            code=proc.returncode,
+            output=output,
+            spill=capture.spill_path,
+            duration=duration,
+            timed_out=timed_out,
+            usage=usage,
+            max_rss=usage.ru_maxrss * scale,
+            max_rss_upper_bound=usage.ru_maxrss <= inherited_rss,
+        )
+
+    @staticmethod
+    def _reap(
+        proc: subprocess.Popen[bytes], timeout: float | None
+    ) -> resource.struct_rusage:
+        """Wait for a process to exit, like :py:meth:`subprocess.Popen.wait`, and obtain
+        the resources it used.
+
+        Raises
+        ------
+        subprocess.TimeoutExpired
+            The process is still running after ``timeout`` seconds.
+        """
+        if timeout is not None:
+            if hasattr(os, "pidfd_open"):
+                pidfd = os.pidfd_open(proc.pid)
+                try:
+                    ready, _, _ = select.select([pidfd], [], [], max(timeout, 0))
+                finally:
+                    os.close(pidfd)
+                if not ready:
+                    raise subprocess.TimeoutExpired(proc.args, timeout)
+            else:
+                deadline = time.monotonic() + timeout
+                while True:
+                    pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+                    if pid:
+                        proc.returncode = os.waitstatus_to_exitcode(status)
+                        return usage
+                    if time.monotonic() >= deadline:
+                        raise subprocess.TimeoutExpired(proc.args, timeout)
+                    time.sleep(0.01)
+
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        return usage
+
+    @staticmethod
+    def _kill(proc: subprocess.Popen[bytes]) -> None:
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(proc.pid, signal.SIGKILL)
+
     @staticmethod
     @contextlib.contextmanager
     def content_to_temporary_file(content: str, suffix: str):
@@ -89,6 +890,14 @@ class BaseExecutor(metaclass=abc.ABCMeta):
         finally:
             os.unlink(file.name)
 
+    @staticmethod
+    def write_temporary_file(content: str, suffix: str) -> pathlib.Path:
+        """Write content into a new temporary file, that the caller must remove."""
+        with tempfile.NamedTemporaryFile(suffix=f".{suffix}", delete=False) as file:
+            file.write(content.encode())
+        _log.debug("Created temporary file at: %s", file.name)
+        return pathlib.Path(file.name)
+
     @property
     @abc.abstractmethod
     def is_available(self) -> bool:
@@ -104,250 +913,706 @@ class BaseExecutor(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError("Not implemented")
 
-    @abc.abstractmethod
     def execute(self, file_name: str, file_content: str) -> RunReturn:
-        """This method must be implemented by child classes.
-        It is used to execute a given script.
+        """Execute a given script once.
+
+        By default, the script is prepared with :py:meth:`prepare`, then ran with
+        :py:meth:`run`. Child classes may implement this method instead, in which case
+        they cannot be used for test suites.
 
         Parameters
         ----------
+        file_name : str
+            The name of the file, as sent by the client.
         file_content : str
-            The content of the script to launch. It is up for the child class to write into a
-            temporary file for execution/compilation.
-            Shall they do so, they should preferably delete the file after execution, or use the
-            temporary folder.
+            The content of the script to launch.
 
         Returns
         -------
         RunReturn
             Code and output of the execution result.
+        """
+        program = self.timed_prepare(file_name, file_content)
+        if isinstance(program, RunReturn):
+            return program
+        try:
+            self.report("phase", "RUNNING")
+            result = self.run(program)
+        finally:
+            program.release()
+        result.compile_time = program.compile_time
+        return result
+
+    def timed_prepare(self, file_name: str, file_content: str) -> Program | RunReturn:
+        """Prepare a script with :py:meth:`prepare`, and measure how long it takes.
+
+        Returns
+        -------
+        Program | RunReturn
+            The program, or the output of the compiler, with their ``compile_time`` set.
+        """
+        started_at = time.monotonic()
+        program = self.prepare(file_name, file_content)
+        compile_time = time.monotonic() - started_at
+        if isinstance(program, RunReturn):
+            # The measurements of the compiler are not the ones of the program.
+            return RunReturn(
+                program.code,
+                program.output,
+                spill=program.spill,
+                compile_time=compile_time,
+            )
+        program.compile_time = compile_time
+        return program
+
+    @property
+    def profiler(self) -> str | None:
+        """The tool profiling the programs of this executor, or None if they cannot be
+        profiled. See :py:mod:`sae302.server.profiling`."""
+        return None
+
+    def profiled_build(self, profile: BuildProfile | None) -> BuildProfile | None:
+        """The build profile a file is prepared with to be profiled, given the one
+        chosen by the client. Only the profilers that need the program to be
+        instrumented change it.
+        """
+        return profile
+
+    def prepare(self, file_name: str, file_content: str) -> Program | RunReturn:
+        """Prepare a script to be ran, compiling it if needed.
+
+        Returns
+        -------
+        Program | RunReturn
+            The program, or the output of the compiler if the script could not be
+            compiled.
 
         Raises
         ------
         NotImplementedError :
-            Raised when the child class did NOT implement this method.
-        Exception :
-            Any other exception raised by the child class.
+            Raised when the child class only implements :py:meth:`execute`.
         """
-        raise NotImplementedError("Not implemented")
+        raise NotImplementedError(
+            f"The {self.friendly_name} executor cannot prepare programs."
+        )
+
+    def run(
+        self,
+        program: Program,
+        *,
+        stdin: bytes = b"",
+        args: list[str] | None = None,
+        timeout: float | None = None,
+        output_limit: int | None = None,
+        session: socket.socket | None = None,
+        cpu: int | None = None,
+        profiling: bool = False,
+    ) -> RunReturn:
+        """Run a program prepared by :py:meth:`prepare`. See :py:meth:`run_command` for
+        the parameters.
+
+        If ``profiling`` is True, the program is ran under :py:attr:`profiler`, and its
+        profile is set on the result. It must then have been prepared with
+        :py:meth:`profiled_build`.
+
+        Raises
+        ------
+        NotImplementedError :
+            Raised when profiling a program of an executor without profiler.
+        """
+        if profiling:
+            raise NotImplementedError(
+                f"The {self.friendly_name} executor cannot profile programs."
+            )
+        return self.run_command(
+            [*program.args, *(args or [])],
+            input=stdin,
+            timeout=timeout,
+            output_limit=output_limit,
+            spill=True,
+            session=session,
+            cpu=cpu,
+        )
 
 
 class PythonExecutor(BaseExecutor):
-    """Executor for Python code"""
+    """Executor for Python code
+
+    When the server has an artifact cache, scripts are kept in it with their compiled
+    code, and ran by interpreters started ahead of time, which have already imported
+    common modules of the standard library (See :py:class:`InterpreterPool`). The
+    ``preload`` option lists the modules to import instead of
+    :py:data:`PRELOADED_MODULES`.
+    """
 
     friendly_name = "Python"
     supported_suffixes = ["py", "pyc", "pyo"]
+    default_flags = ["-O"]
 
     @property
     def is_available(self) -> bool:
         return bool(self.find_executable(["python", "python3", "py"]))
 
-    def execute(self, file_name: str, file_content: str) -> RunReturn:
+    @property
+    def profiler(self) -> str | None:
+        return "cProfile"
+
+    def prepare(self, file_name: str, file_content: str) -> Program | RunReturn:
         exec = self.find_executable(["python", "python3", "py"])
         assert exec
 
-        with self.content_to_temporary_file(file_content, "py") as file:
-            args = f"{exec} -O {file.name}"
-            proc = subprocess.Popen(
-                args, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-            )
+        root = self.config.artifact_cache
+        if not root:
+            script = self.write_temporary_file(file_content, "py")
+            return Program([exec, *self.flags, str(script)], temporary=[script])
 
-            output, _ = proc.communicate()
-            code = proc.returncode
+        script = self.cached_script(
+            ArtifactCache(root / "python"), file_name, file_content
+        )
+        preload = self.config.options.get("preload", PRELOADED_MODULES)
+        return Program(
+            [exec, *self.flags, "-c", PYTHON_RUNNER, *preload], script=script
+        )
 
-        return RunReturn(code=code, output=output.decode())
+    def run(
+        self,
+        program: Program,
+        *,
+        stdin: bytes = b"",
+        args: list[str] | None = None,
+        timeout: float | None = None,
+        output_limit: int | None = None,
+        session: socket.socket | None = None,
+        cpu: int | None = None,
+        profiling: bool = False,
+    ) -> RunReturn:
+        if profiling:
+            return self.run_profiled(
+                program,
+                stdin=stdin,
+                args=args,
+                timeout=timeout,
+                output_limit=output_limit,
+                cpu=cpu,
+            )
+        if session:
+            # The output of an interactive script must not wait in the buffers of the
+            # interpreter, and a pooled interpreter cannot be handed the session.
+            script = program.script or program.args[-1]
+            return self.run_command(
+                [program.args[0], *self.flags, "-u", str(script), *(args or [])],
+                timeout=timeout,
+                session=session,
+                cpu=cpu,
+            )
+        if not program.script:
+            return super().run(
+                program,
+                stdin=stdin,
+                args=args,
+                timeout=timeout,
+                output_limit=output_limit,
+                cpu=cpu,
+            )
 
+        startup = self.write_temporary_file("", "usage")
+        request = json.dumps(
+            {"path": str(program.script), "args": args or [], "usage": str(startup)}
+        )
+        try:
+            interpreter = _interpreters.take(program.args)
+            try:
+                result = self.wait_for(
+                    interpreter,
+                    input=f"{request}\n".encode() + stdin,
+                    timeout=timeout,
+                    output_limit=output_limit,
+                    spill=True,
+                    cpu=cpu,
+                )
+            finally:
+                _interpreters.replenish(program.args)
+            self.exclude_startup(result, startup)
+        finally:
+            startup.unlink(missing_ok=True)
+        return result
 
-class JavaExecutor(BaseExecutor):
-    """Executor for Java code"""
+    @staticmethod
+    def exclude_startup(result: RunReturn, startup: pathlib.Path) -> None:
+        """Remove the resources a pooled interpreter used to start and import its
+        modules, as written by :py:data:`PYTHON_RUNNER`, from the ones of the script.
+        If the interpreter did not write them, the resources of the script are not
+        known.
+
+        The peak memory is the one the interpreter measured once the script was over,
+        if it could. Otherwise, it is only an upper bound, unless the script raised the
+        peak of the interpreter.
+        """
+        try:
+            initial, _, peak = startup.read_text().partition("\n")
+            values = json.loads(initial)
+            measured = int(peak) if peak else None
+        except (OSError, ValueError):
+            values = None
+        if not result.usage or not values:
+            result.usage = None
+            result.max_rss = None
+            return
+        before = resource.struct_rusage(values)
+        if measured is not None:
+            result.max_rss = measured
+            result.max_rss_upper_bound = False
+        elif result.usage.ru_maxrss <= before.ru_maxrss:
+            result.max_rss_upper_bound = True
+        # The third field, the peak memory, is not a total like the others.
+        result.usage = resource.struct_rusage(
+            [
+                value if index == 2 else value - initial
+                for index, (value, initial) in enumerate(zip(result.usage, before))
+            ]
+        )
 
-    friendly_name = "Java"
-    supported_suffixes = ["java"]
+    def run_profiled(
+        self,
+        program: Program,
+        *,
+        stdin: bytes = b"",
+        args: list[str] | None = None,
+        timeout: float | None = None,
+        output_limit: int | None = None,
+        cpu: int | None = None,
+    ) -> RunReturn:
+        """Run a script under :py:data:`sae302.server.profiling.PYTHON_PROFILER`. Pooled
+        interpreters are not used, as the profiler must be running before the script
+        starts.
+        """
+        script = program.script or program.args[-1]
+        statistics = self.write_temporary_file("", "prof")
+        try:
+            result = self.run_command(
+                [
+                    program.args[0],
+                    *self.flags,
+                    "-c",
+                    profiling.PYTHON_PROFILER,
+                    str(statistics),
+                    str(script),
+                    *(args or []),
+                ],
+                input=stdin,
+                timeout=timeout,
+                output_limit=output_limit,
+                spill=True,
+                cpu=cpu,
+            )
+            try:
+                result.profile_report = profiling.read_pstats(str(statistics))
+            except OSError as e:
+                _log.debug("No profile for %s: %s", script, e)
+        finally:
+            statistics.unlink(missing_ok=True)
+        return result
 
-    @property
-    def is_available(self) -> bool:
-        return bool(self.find_executable("java"))
+    @staticmethod
+    def cached_script(
+        cache: ArtifactCache, file_name: str, file_content: str
+    ) -> pathlib.Path:
+        """Write a script in the cache, unless it is already there. Each script has its
+        own directory, where the interpreters keep its compiled code.
 
-    def execute(self, file_name: str, file_content: str) -> RunReturn:
-        exec = self.find_executable("java")
-        assert exec
+        Returns
+        -------
+        pathlib.Path
+            The path of the script.
+        """
+        name = pathlib.PurePath(file_name).name
+        if not name.endswith(".py") or name.startswith("."):
+            name = "main.py"
+        key = artifact_key(name, file_content)
+        if not (directory := cache.get(key)):
+            reserved = cache.reserve(key)
+            reserved.mkdir()
+            (reserved / name).write_bytes(file_content.encode())
+            directory = cache.commit(key, reserved)
+        return directory / name
 
-        with self.content_to_temporary_file(file_content, "java") as file:
-            args = f"{exec} {file.name}"
-            proc = subprocess.Popen(
-                args, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-            )
-            output, _ = proc.communicate()
-            code = proc.returncode
 
-        return RunReturn(code=code, output=output.decode())
+class JavaExecutor(BaseExecutor):
+    """Executor for Java code
 
+    The file is compiled once by ``javac``, then its classes are ran by ``java``. The
+    main class is the first top-level class of the file, as with the source launcher of
+    ``java``. When the server has an artifact cache, the classes are kept in it.
 
-class CppExecutor(BaseExecutor):
-    """Executor for C++ code"""
+    Servers with only a runtime, without ``javac``, hand the file to the source launcher
+    of ``java``, which compiles it again on every run.
+    """
 
-    friendly_name = "C++"
-    supported_suffixes = ["cpp", "hpp"]
+    friendly_name = "Java"
+    supported_suffixes = ["java"]
 
     @property
     def is_available(self) -> bool:
-        return bool(self.find_executable("g++"))
+        return bool(self.find_executable("java"))
 
-    def execute(self, file_name: str, file_content: str) -> RunReturn:
-        exec = self.find_executable("gcc")
+    def prepare(self, file_name: str, file_content: str) -> Program | RunReturn:
+        exec = self.find_executable("java")
         assert exec
+        compiler = self.find_executable("javac")
+        if not compiler:
+            _log.debug(
+                "javac not found, running %s with the source launcher", file_name
+            )
+            source = self.write_temporary_file(file_content, "java")
+            return Program([exec, *self.flags, str(source)], temporary=[source])
+        _log.debug("Compiling %s with %s", file_name, compiler)
+
+        classes = _JAVA_CLASS_PATTERN.findall(file_content)
+        main_class = classes[0][1] if classes else "Main"
+        # javac wants a public class in a file of the same name.
+        source_name = next(
+            (name for modifiers, name in classes if "public" in modifiers.split()),
+            main_class,
+        )
 
-        with self.content_to_temporary_file(file_content, "c") as file:
-            output_file = f"{file.name}.out"
-            compilation = subprocess.Popen(
-                f"g++ -o {output_file} {file.name}",
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
+        root = self.config.artifact_cache
+        cache = ArtifactCache(root / "java") if root else None
+        stat = os.stat(compiler)
+        key = artifact_key(compiler, f"{stat.st_size}:{stat.st_mtime_ns}", file_content)
+        if cache and (directory := cache.get(key)):
+            return Program([exec, *self.flags, "-cp", str(directory), main_class])
+
+        directory = (
+            cache.reserve(key)
+            if cache
+            else pathlib.Path(tempfile.mkdtemp(prefix="sae302-java-"))
+        )
+        try:
+            directory.mkdir(exist_ok=True)
+            source = directory / f"{source_name}.java"
+            source.write_bytes(file_content.encode())
+            self.report("phase", "COMPILING")
+            compilation = self.run_command(
+                [compiler, "-d", str(directory), str(source)]
             )
-            compilation.wait()
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        if compilation.code != 0:
+            shutil.rmtree(directory, ignore_errors=True)
+            return compilation
+        if cache:
+            directory = cache.commit(key, directory)
+            return Program([exec, *self.flags, "-cp", str(directory), main_class])
+        return Program(
+            [exec, *self.flags, "-cp", str(directory), main_class],
+            temporary=[directory],
+        )
 
-            if compilation.returncode != 0:
-                output, _ = compilation.communicate()
-                return RunReturn(code=compilation.returncode, output=output.decode())
 
-            proc = subprocess.Popen(
-                f"{output_file}",
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-            )
-            output, _ = proc.communicate()
-            code = proc.returncode
+class CompiledExecutor(BaseExecutor):
+    """Base class of the executors that compile the file into a program before running
+    it.
 
-        return RunReturn(code=code, output=output.decode())
+    The compiler receives the flags of the executor, then the flags of the build profile
+    chosen by the client. When the server has an artifact cache, three kinds of
+    artifacts are kept:
 
+    - Programs, by a key made of the compiler, the flags and the source, so that a file
+      sent again is only ran.
+    - Object files, by a key made of the compiler, the flags and the preprocessed
+      source, so that a file whose changes do not reach the compiler (Such as comments)
+      is only linked.
+    - Precompiled headers, for the set of standard headers a file starts with, if
+      :py:attr:`precompiled_headers` is enabled. They avoid parsing heavy headers on
+      every compilation.
 
-class CExecutor(BaseExecutor):
-    """Executor for C code"""
+    This is not to be used directly.
+    """
 
-    friendly_name = "C"
-    supported_suffixes = ["c", "h"]
+    compilers: typing.ClassVar[list[str]]
+    """Compiler commands to look for, the first one found being used."""
+    source_suffix: typing.ClassVar[str]
+    """The suffix given to the source file, which the compiler may rely on to detect the
+    language."""
+    precompiled_headers: typing.ClassVar[bool] = False
+    """Whether the standard headers included by the files are precompiled."""
+    header_language: typing.ClassVar[str] = ""
+    """The language given to the compiler (``-x``) to precompile headers."""
+    standard_headers: typing.ClassVar[frozenset[str]] = frozenset()
+    """The headers that can be precompiled."""
 
     @property
     def is_available(self) -> bool:
-        return bool(self.find_executable("gcc"))
-
-    def execute(self, file_name: str, file_content: str) -> RunReturn:
-        exec = self.find_executable("gcc")
-        assert exec
+        return bool(self.find_executable(self.compilers))
 
-        with self.content_to_temporary_file(file_content, "c") as file:
-            output_file = f"{file.name}.out"
-            compilation = subprocess.Popen(
-                f"gcc -o {output_file} {file.name}",
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-            )
-            compilation.wait()
+    @property
+    def profiler(self) -> str | None:
+        if self.find_executable("perf"):
+            return "perf stat"
+        if self.find_executable("gprof"):
+            return "gprof"
+        return None
 
-            if compilation.returncode != 0:
-                output, _ = compilation.communicate()
-                return RunReturn(code=compilation.returncode, output=output.decode())
+    def profiled_build(self, profile: BuildProfile | None) -> BuildProfile | None:
+        if self.profiler != "gprof":
+            return profile
+        # gprof reads the profile written by the instrumentation of -pg when the program
+        # exits.
+        return BuildProfile(
+            f"{profile.name}+gprof" if profile else "gprof",
+            [*(profile.flags if profile else []), "-pg"],
+        )
 
-            proc = subprocess.Popen(
-                f"{output_file}",
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
+    def run(
+        self,
+        program: Program,
+        *,
+        stdin: bytes = b"",
+        args: list[str] | None = None,
+        timeout: float | None = None,
+        output_limit: int | None = None,
+        session: socket.socket | None = None,
+        cpu: int | None = None,
+        profiling: bool = False,
+    ) -> RunReturn:
+        if not profiling or not self.profiler:
+            return super().run(
+                program,
+                stdin=stdin,
+                args=args,
+                timeout=timeout,
+                output_limit=output_limit,
+                session=session,
+                cpu=cpu,
+                profiling=profiling,
             )
-            output, _ = proc.communicate()
-            code = proc.returncode
+        return self.run_profiled(
+            program,
+            stdin=stdin,
+            args=args,
+            timeout=timeout,
+            output_limit=output_limit,
+            cpu=cpu,
+        )
 
-        return RunReturn(code=code, output=output.decode())
+    def run_profiled(
+        self,
+        program: Program,
+        *,
+        stdin: bytes = b"",
+        args: list[str] | None = None,
+        timeout: float | None = None,
+        output_limit: int | None = None,
+        cpu: int | None = None,
+    ) -> RunReturn:
+        """Run a program under ``perf stat``, or a program built with ``-pg`` then
+        ``gprof`` on the profile it writes."""
+        command = [*program.args, *(args or [])]
+        options: dict[str, typing.Any] = {
+            "input": stdin,
+            "timeout": timeout,
+            "output_limit": output_limit,
+            "spill": True,
+            "cpu": cpu,
+        }
+        if self.profiler == "perf stat":
+            perf = self.find_executable("perf")
+            assert perf
+            counters = self.write_temporary_file("", "perf")
+            try:
+                result = self.run_command(
+                    [perf, "stat", "-x", ",", "-o", str(counters), "--", *command],
+                    **options,
+                )
+                result.profile_report = profiling.read_perf_stat(counters.read_text())
+            finally:
+                counters.unlink(missing_ok=True)
+            return result
+
+        gprof = self.find_executable("gprof")
+        assert gprof
+        with tempfile.TemporaryDirectory(prefix="sae302-gmon-") as directory:
+            # The profile is written as gmon.out.<pid>, once the program exits normally.
+            result = self.run_command(
+                command, env={"GMON_OUT_PREFIX": f"{directory}/gmon.out"}, **options
+            )
+            if data := next(pathlib.Path(directory).glob("gmon.out.*"), None):
+                flat_profile = self.run_command(
+                    [gprof, "-b", "-p", program.args[0], str(data)], full_output=True
+                )
+                if flat_profile.code == 0:
+                    result.profile_report = profiling.read_gprof(flat_profile.output)
+                else:
+                    _log.debug("gprof failed: %s", flat_profile.output)
+        return result
 
+    @property
+    def build_flags(self) -> list[str]:
+        """Every flag given to the compiler."""
+        return [*self.flags, *(self.profile.flags if self.profile else [])]
+
+    def artifact_key(self, compiler: str, *parts: str) -> str:
+        stat = os.stat(compiler)
+        return artifact_key(
+            compiler,
+            # An updated compiler must not reuse artifacts from the previous one.
+            f"{stat.st_size}:{stat.st_mtime_ns}",
+            "\0".join(self.build_flags),
+            self.source_suffix,
+            *parts,
+        )
 
-class ExecutorFactory:
-    """This class takes care of picking the right executor to use.
-    It's also used to determine which executor are available and which aren't.
+    def prepare(self, file_name: str, file_content: str) -> Program | RunReturn:
+        compiler = self.find_executable(self.compilers)
+        assert compiler
 
-    As such, this class is the main interaction the user have with.
-    """
+        root = self.config.artifact_cache
+        programs = ArtifactCache(root / "programs") if root else None
+        key = self.artifact_key(compiler, file_content)
+        if programs and (program := programs.get(key)):
+            return Program([str(program)])
 
-    @functools.cached_property
-    def all_executors(self) -> typing.Generator[type[BaseExecutor], None, None]:
-        """Returns all executors that have been created and can be used.
-        This method does NOT check whether they can be used or not.
-        This simply return a list of all subclasses of :py:class:`BaseExecutor`.
+        with self.content_to_temporary_file(file_content, self.source_suffix) as file:
+            output = (
+                programs.reserve(key) if programs else pathlib.Path(f"{file.name}.out")
+            )
+            self.report("phase", "COMPILING")
+            try:
+                compilation = self.build(compiler, file.name, file_content, str(output))
+            except BaseException:
+                output.unlink(missing_ok=True)
+                raise
+            if compilation.code != 0:
+                output.unlink(missing_ok=True)
+                return compilation
+            if programs:
+                return Program([str(programs.commit(key, output))])
+            return Program([str(output)], temporary=[output])
+
+    def build(
+        self, compiler: str, source: str, file_content: str, output: str
+    ) -> RunReturn:
+        """Compile a source file into a program, going through the object cache if the
+        server has an artifact cache."""
+        root = self.config.artifact_cache
+        if not root:
+            return self.run_command([compiler, *self.build_flags, "-o", output, source])
+
+        preprocessed = self.run_command(
+            [compiler, *self.build_flags, "-E", "-P", source], full_output=True
+        )
+        if preprocessed.code != 0:
+            return preprocessed
 
-        Yields
-        ------
-        typing.Generator[type[BaseExecutor], None, None]
-            The list of executors
-        """
-        yield from BaseExecutor.__subclasses__()
+        objects = ArtifactCache(root / "objects")
+        key = self.artifact_key(
+            compiler, preprocessed.output.replace(source, "<source>")
+        )
+        if not (object_file := objects.get(key)):
+            reserved = objects.reserve(key)
+            header_flags = self.precompiled_header_flags(compiler, file_content, root)
+            compilation = self.run_command(
+                [
+                    compiler,
+                    *self.build_flags,
+                    *header_flags,
+                    "-c",
+                    "-o",
+                    str(reserved),
+                    source,
+                ]
+            )
+            if compilation.code != 0:
+                objects.discard(reserved)
+                return compilation
+            object_file = objects.commit(key, reserved)
 
-    @functools.cached_property
-    def available_executors(self) -> typing.Iterable[type[BaseExecutor]]:
-        """Return a list of available executors.
+        return self.run_command(
+            [compiler, *self.build_flags, "-o", output, str(object_file)]
+        )
 
-        Returns
-        -------
-        typing.Iterable[type[BaseExecutor]]
-            The list of available executors.
+    def precompiled_header_flags(
+        self, compiler: str, file_content: str, root: pathlib.Path
+    ) -> list[str]:
+        """Obtain the flags making the compiler use precompiled headers for this file,
+        building them if needed. No flag is returned if the headers of the file cannot
+        be precompiled.
         """
-        return [
-            executor[0]
-            for executor in self._determine_available_executors().items()
-            if executor[1]
-        ]
-
-    def all_executors_availability(self) -> dict[type[BaseExecutor], bool]:
-        """Return a list of all available executors.
-        The boolean indicates whether or not the executor is available.
+        if not self.precompiled_headers:
+            return []
+        headers = self.leading_standard_headers(file_content)
+        if not headers:
+            return []
+
+        cache = ArtifactCache(root / "headers")
+        key = self.artifact_key(compiler, *headers)
+        if not (directory := cache.get(key)):
+            reserved = cache.reserve(key)
+            reserved.mkdir()
+            header = reserved / PRECOMPILED_HEADER
+            header.write_text("".join(f"#include <{name}>\n" for name in headers))
+            precompilation = self.run_command(
+                [
+                    compiler,
+                    *self.build_flags,
+                    "-x",
+                    self.header_language,
+                    str(header),
+                    "-o",
+                    f"{header}.gch",
+                ]
+            )
+            if precompilation.code != 0:
+                _log.debug(
+                    "Could not precompile %s: %s", headers, precompilation.output
+                )
+                cache.discard(reserved)
+                return []
+            directory = cache.commit(key, reserved)
+        # The compiler picks the .gch file next to the header.
+        return ["-include", str(directory / PRECOMPILED_HEADER)]
+
+    def leading_standard_headers(self, file_content: str) -> list[str]:
+        """List the standard headers included at the very start of a file.
+
+        Headers are force-included before the file when they are precompiled, so this is
+        only done when every include comes first, before any other line that is not a
+        comment.
 
         Returns
         -------
-        dict[type[BaseExecutor], bool]
-            The list of executor, and their availability as a boolean.
+        list[str]
+            The sorted headers, or an empty list if they cannot be precompiled.
         """
-        return self._determine_available_executors()
-
-    def _determine_available_executors(self) -> dict[type[BaseExecutor], bool]:
-        availability: dict[type[BaseExecutor], bool] = {
-            executor: bool(executor.is_available) for executor in self.all_executors
-        }
-        return availability
+        headers: set[str] = set()
+        in_preamble = True
+        for line in file_content.splitlines():
+            if match := _INCLUDE_PATTERN.match(line):
+                if not in_preamble or match[1] not in self.standard_headers:
+                    return []
+                headers.add(match[1])
+            elif in_preamble and line.strip() and not line.strip().startswith("//"):
+                in_preamble = False
+        return sorted(headers)
+
+
+class CppExecutor(CompiledExecutor):
+    """Executor for C++ code"""
 
-    def find_executor(
-        self,
-        *,
-        friendly_name: str | None = None,
-        supported_suffixes: list[str] | None = None,
-    ) -> type[BaseExecutor] | None:
-        """Attempt to find an executor based on its friendly name and supported suffixes.
+    friendly_name = "C++"
+    supported_suffixes = ["cpp", "hpp"]
+    compilers = ["g++"]
+    source_suffix = "cpp"
+    precompiled_headers = True
+    header_language = "c++-header"
+    standard_headers = CPP_STANDARD_HEADERS
 
-        Parameters
-        ----------
-        friendly_name : str | None, optional
-            Friendly name to match with, if given, by default None
-        supported_suffixes : list[str] | None, optional
-            Suffixes to match with, if given, by default None
 
-        Returns
-        -------
-        type[BaseExecutor] | None
-            The found executor that must be used to execute the given script.
-            Returns none if no executor was found
+class CExecutor(CompiledExecutor):
+    """Executor for C code"""
 
-        Raises
-        ------
-        ValueError
-            Raised when either ``friendly_name`` or ``supported_suffixes`` arguments are not given.
-        """
-        if not friendly_name and (not supported_suffixes):
-            raise RuntimeError("No arguments are given, yet at least one is required.")
-
-        for executor in self.available_executors:
-            if executor.friendly_name == friendly_name:
-                return executor
-            if supported_suffixes and any(
-                suffix in executor.supported_suffixes for suffix in supported_suffixes
-            ):
-                return executor
+    friendly_name = "C"
+    supported_suffixes = ["c", "h"]
+    compilers = ["gcc"]
+    source_suffix = "c"
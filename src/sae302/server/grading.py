@@ -0,0 +1,74 @@
+"""Module used to check the outputs of a program against the cases of a test suite.
+
+Outputs are compared line by line, ignoring the spaces at the end of each line and the
+blank lines at the end of the output, which are rarely meaningful and hard to see.
+"""
+
+from __future__ import annotations
+
+import difflib
+import typing
+
+if typing.TYPE_CHECKING:
+    from sae302.commons.messages import TestCase, TestCaseResult
+    from sae302.server.executor import RunReturn
+
+MAX_DIFF_LINES = 40
+"""Number of lines of a diff kept in a report. The rest is elided."""
+
+
+def normalize(output: str) -> list[str]:
+    """Split an output into the lines that are compared."""
+    lines = [line.rstrip() for line in output.splitlines()]
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def diff(expected: str, actual: str) -> str:
+    """Describe what differs between two outputs, as a unified diff. The diff is empty
+    if they are considered equal."""
+    lines = list(
+        difflib.unified_diff(
+            normalize(expected), normalize(actual), "expected", "actual", lineterm=""
+        )
+    )
+    if len(lines) > MAX_DIFF_LINES:
+        lines = [
+            *lines[:MAX_DIFF_LINES],
+            f"... {len(lines) - MAX_DIFF_LINES} more lines",
+        ]
+    return "\n".join(lines)
+
+
+def grade(case: "TestCase", run: "RunReturn") -> "TestCaseResult":
+    """Check the run of a program against a case."""
+    result: "TestCaseResult" = {
+        "name": case["name"],
+        "status": "PASSED",
+        "code": run.code,
+        "duration": run.duration,
+    }
+    if run.timed_out:
+        result["status"] = "TIMEOUT"
+        return result
+
+    differences = diff(case["expected"], run.output)
+    expected_code = case.get("code")
+    if expected_code is not None and expected_code != run.code:
+        differences = f"Exit code {run.code}, expected {expected_code}.\n{differences}"
+    if differences:
+        result["status"] = "FAILED"
+        result["diff"] = differences.rstrip("\n")
+    return result
+
+
+def error(case: "TestCase", reason: str) -> "TestCaseResult":
+    """Report a case that could not be ran."""
+    return {
+        "name": case["name"],
+        "status": "ERROR",
+        "code": None,
+        "duration": None,
+        "diff": reason,
+    }
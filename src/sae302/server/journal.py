@@ -0,0 +1,313 @@
+"""Module used to keep track of the jobs on the disk, so that they survive a server
+restart.
+
+The journal is an SQLite database in WAL mode. Every submission and every state
+transition is appended to the ``transitions`` table, while the ``jobs`` table holds the
+latest known state and the result of each job.
+"""
+
+from __future__ import annotations
+
+import enum
+import json
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+import typing
+
+if typing.TYPE_CHECKING:
+    from sae302.commons.messages import BenchmarkSettings, ExecutionStats, TestCase
+
+_log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    executor TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    build_profile TEXT,
+    test_cases TEXT,
+    benchmark TEXT,
+    content BLOB NOT NULL,
+    state TEXT NOT NULL,
+    code INTEGER,
+    output TEXT,
+    stats TEXT,
+    detached INTEGER NOT NULL DEFAULT 0,
+    interactive INTEGER NOT NULL DEFAULT 0,
+    profiled INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker INTEGER NOT NULL DEFAULT 0,
+    submitted_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transitions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES jobs (id),
+    state TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+"""
+
+
+class JobState(enum.StrEnum):
+    """The states a job goes through."""
+
+    QUEUED = "QUEUED"
+    """The job is waiting for a free execution slot."""
+    COMPILING = "COMPILING"
+    """The file of the job is being compiled."""
+    BUILT = "BUILT"
+    """The file of the job has been built, and is waiting for a free execution slot."""
+    RUNNING = "RUNNING"
+    """The job is being executed."""
+    DONE = "DONE"
+    """The job has been executed, its logs are available."""
+    FAILED = "FAILED"
+    """The job could not be executed."""
+    CANCELLED = "CANCELLED"
+    """The job has been cancelled by a client."""
+
+    @property
+    def is_final(self) -> bool:
+        return self in (JobState.DONE, JobState.FAILED, JobState.CANCELLED)
+
+
+class JobRecord:
+    """A job, as it has been saved in the journal."""
+
+    id: str
+    file_name: str
+    executor: str
+    priority: str
+    build_profile: str | None
+    test_cases: list[TestCase] | None
+    """The cases of the job, if it is a test suite. Its output is then the JSON
+    report."""
+    benchmark: BenchmarkSettings | None
+    """The settings of the job, if it is a benchmark. Its output is then the JSON
+    report."""
+    content: str
+    state: JobState
+    code: int | None
+    output: str | None
+    stats: ExecutionStats | None
+    """The measurements of the execution, if it has been executed."""
+    detached: bool
+    interactive: bool
+    profiled: bool
+    worker: int
+    """The index of the server process the job was submitted to (See
+    :py:mod:`sae302.server.supervisor`)."""
+
+    def __init__(self, row: sqlite3.Row):
+        self.id = row["id"]
+        self.file_name = row["file_name"]
+        self.executor = row["executor"]
+        self.priority = row["priority"]
+        self.build_profile = row["build_profile"]
+        self.test_cases = json.loads(row["test_cases"]) if row["test_cases"] else None
+        self.benchmark = json.loads(row["benchmark"]) if row["benchmark"] else None
+        self.content = bytes(row["content"]).decode()
+        self.state = JobState(row["state"])
+        self.code = row["code"]
+        self.output = row["output"]
+        self.stats = json.loads(row["stats"]) if row["stats"] else None
+        self.detached = bool(row["detached"])
+        self.interactive = bool(row["interactive"])
+        self.profiled = bool(row["profiled"])
+        self.worker = row["worker"]
+
+
+class JobJournal:
+    """An append-only journal of jobs, stored in an SQLite database.
+    It is safe to use from multiple threads.
+
+    Parameters
+    ----------
+    path : pathlib.Path | str
+        The path of the database. ``:memory:`` can be used to not keep anything on the
+        disk.
+    """
+
+    def __init__(self, path: pathlib.Path | str):
+        if isinstance(path, pathlib.Path):
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._migrate()
+        _log.debug("Job journal opened at %s", path)
+
+    def record_submission(
+        self,
+        job_id: str,
+        file_name: str,
+        executor: str,
+        priority: str,
+        content: str,
+        build_profile: str | None = None,
+        test_cases: list[TestCase] | None = None,
+        benchmark: BenchmarkSettings | None = None,
+        detached: bool = False,
+        interactive: bool = False,
+        profiled: bool = False,
+        worker: int = 0,
+    ) -> None:
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO jobs (id, file_name, executor, priority, build_profile,"
+                " test_cases, benchmark, content, state, detached, interactive,"
+                " profiled, worker, submitted_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    file_name,
+                    executor,
+                    priority,
+                    build_profile,
+                    json.dumps(test_cases) if test_cases is not None else None,
+                    json.dumps(benchmark) if benchmark is not None else None,
+                    content.encode(),
+                    JobState.QUEUED,
+                    detached,
+                    interactive,
+                    profiled,
+                    worker,
+                    now,
+                    now,
+                ),
+            )
+            self._append_transition(job_id, JobState.QUEUED, now)
+
+    def record_state(self, job_id: str, state: JobState) -> None:
+        """Save the new state of a job. Jobs that are already over are left untouched,
+        as progress may be reported after the result has been saved."""
+        now = time.time()
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "UPDATE jobs SET state = ?, updated_at = ?"
+                " WHERE id = ? AND state NOT IN (?, ?, ?)",
+                (
+                    state,
+                    now,
+                    job_id,
+                    JobState.DONE,
+                    JobState.FAILED,
+                    JobState.CANCELLED,
+                ),
+            )
+            if cursor.rowcount:
+                self._append_transition(job_id, state, now)
+
+    def record_result(
+        self,
+        job_id: str,
+        state: JobState,
+        code: int | None,
+        output: str,
+        stats: ExecutionStats | None = None,
+    ) -> None:
+        """Save the outcome of a job. ``state`` must be a final state."""
+        assert state.is_final
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE jobs SET state = ?, code = ?, output = ?, stats = ?,"
+                " updated_at = ? WHERE id = ?",
+                (
+                    state,
+                    code,
+                    output,
+                    json.dumps(stats) if stats else None,
+                    now,
+                    job_id,
+                ),
+            )
+            self._append_transition(job_id, state, now)
+
+    def request_cancel(self, job_id: str) -> bool:
+        """Ask the server process running a job to cancel it, when it is run by another
+        one (See :py:mod:`sae302.server.supervisor`).
+
+        Returns
+        -------
+        bool
+            False if the job is unknown or already over.
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "UPDATE jobs SET cancel_requested = 1"
+                " WHERE id = ? AND state NOT IN (?, ?, ?)",
+                (job_id, JobState.DONE, JobState.FAILED, JobState.CANCELLED),
+            )
+        return cursor.rowcount > 0
+
+    def cancel_requests(self) -> list[str]:
+        """List the jobs that are not over, and that a client asked to cancel through
+        :py:meth:`request_cancel`."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id FROM jobs WHERE state IN (?, ?, ?, ?) AND cancel_requested",
+                (JobState.QUEUED, JobState.COMPILING, JobState.BUILT, JobState.RUNNING),
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def get(self, job_id: str) -> JobRecord | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return JobRecord(row) if row else None
+
+    def pending(self) -> list[JobRecord]:
+        """List the jobs that were not over, in the order they were submitted. Jobs that
+        were running when the server stopped are included, as they were interrupted.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT * FROM jobs WHERE state IN (?, ?, ?, ?) ORDER BY submitted_at",
+                (JobState.QUEUED, JobState.COMPILING, JobState.BUILT, JobState.RUNNING),
+            ).fetchall()
+        return [JobRecord(row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _migrate(self) -> None:
+        """Add the columns that journals created by older versions lack."""
+        columns = {
+            row["name"] for row in self._connection.execute("PRAGMA table_info(jobs)")
+        }
+        added = {
+            "build_profile": "TEXT",
+            "test_cases": "TEXT",
+            "benchmark": "TEXT",
+            "stats": "TEXT",
+            "detached": "INTEGER NOT NULL DEFAULT 0",
+            "interactive": "INTEGER NOT NULL DEFAULT 0",
+            "profiled": "INTEGER NOT NULL DEFAULT 0",
+            "cancel_requested": "INTEGER NOT NULL DEFAULT 0",
+            "worker": "INTEGER NOT NULL DEFAULT 0",
+        }
+        for column, definition in added.items():
+            if column not in columns:
+                with self._connection:
+                    self._connection.execute(
+                        f"ALTER TABLE jobs ADD COLUMN {column} {definition}"
+                    )
+
+    def _append_transition(self, job_id: str, state: JobState, at: float) -> None:
+        self._connection.execute(
+            "INSERT INTO transitions (job_id, state, at) VALUES (?, ?, ?)",
+            (job_id, state, at),
+        )
@@ -0,0 +1,197 @@
+"""Module used to profile programs, for profiled jobs.
+
+Each executor profiles its programs with the tool of its language:
+
+- Python scripts run under :py:mod:`cProfile` (See :py:data:`PYTHON_PROFILER`), whose
+  statistics are read with :py:mod:`pstats`.
+- C and C++ programs run under ``perf stat`` when the server has it, which reports the
+  hardware counters of the program. Otherwise, they are compiled with ``-pg``, and the
+  flat profile written when they exit is read with ``gprof``.
+
+The outputs of these tools are turned into a
+:py:class:`sae302.commons.messages.ProfileReport`, sent to the client next to the logs.
+"""
+
+from __future__ import annotations
+
+import os
+import pstats
+import re
+import typing
+
+if typing.TYPE_CHECKING:
+    from sae302.commons.messages import ProfileCounter, ProfiledFunction, ProfileReport
+
+MAX_FUNCTIONS = 30
+"""Number of functions kept in a report, the ones the program spent the most time in."""
+
+PYTHON_PROFILER = """\
+import cProfile
+import marshal
+import os
+import runpy
+import sys
+import sysconfig
+
+output, path = sys.argv[1:3]
+sys.argv = sys.argv[2:]
+sys.path[0] = os.path.dirname(path)
+
+profiler = cProfile.Profile()
+try:
+    profiler.runcall(runpy.run_path, path, run_name="__main__")
+except SystemExit:
+    raise
+except BaseException as e:
+    # Hide the frames of the profiler from the traceback.
+    traceback = e.__traceback__
+    while traceback and traceback.tb_frame.f_code.co_filename != path:
+        traceback = traceback.tb_next
+    sys.excepthook(type(e), e.with_traceback(traceback), traceback)
+    sys.exit(1)
+finally:
+    profiler.create_stats()
+    paths = sysconfig.get_paths()
+    libraries = tuple(
+        os.path.join(paths[name], "")
+        for name in ("stdlib", "platstdlib", "purelib", "platlib")
+    )
+
+    def is_kept(file):
+        if file == path:
+            return True
+        # Frozen modules, such as the import system, and built-in functions.
+        if file.startswith(("<", "~")):
+            return False
+        return not file.startswith(libraries)
+
+    stats = {}
+    for function, (cc, nc, tt, ct, callers) in profiler.stats.items():
+        # Built-in functions have no file: only their calls from kept code are kept.
+        if function[0] == "~":
+            callers = {
+                caller: values
+                for caller, values in callers.items()
+                if is_kept(caller[0])
+            }
+            if not callers:
+                continue
+            nc, cc, tt, ct = (sum(values) for values in zip(*callers.values()))
+        elif not is_kept(function[0]):
+            continue
+        stats[function] = (cc, nc, tt, ct, callers)
+    with open(output, "wb") as file:
+        marshal.dump(stats, file)
+"""
+"""The program running a Python script under :py:mod:`cProfile`.
+
+It is given the file the statistics are written to, then the script and its arguments.
+Unlike ``python -m cProfile``, the exit code of the script is kept.
+
+Only the functions of the script and of the modules next to it are kept in the
+statistics: the ones of the standard library, of the installed packages and of the
+frozen modules, mostly run by the interpreter to start the script and import modules,
+are left out. Built-in functions are kept for the calls made by the kept functions.
+"""
+
+_GPROF_HEADER = re.compile(r"\s*time\s+seconds\s+seconds\s+calls")
+_GPROF_LINE = re.compile(
+    r"\s*[\d.]+\s+[\d.]+\s+(?P<self>[\d.]+)\s+"
+    r"(?:(?P<calls>\d+)\s+[\d.]+\s+[\d.]+\s+)?(?P<name>.+)"
+)
+
+
+def report(
+    tool: str,
+    functions: list[ProfiledFunction],
+    counters: list[ProfileCounter] | None = None,
+) -> ProfileReport:
+    """Gather the measurements of a profiler, keeping the :py:data:`MAX_FUNCTIONS`
+    functions that took the most time."""
+    functions.sort(key=lambda function: (function["self_time"], function["calls"] or 0))
+    functions.reverse()
+    return {
+        "tool": tool,
+        "total_time": sum(function["self_time"] for function in functions),
+        "functions": functions[:MAX_FUNCTIONS],
+        "counters": counters or [],
+    }
+
+
+def read_pstats(path: str) -> ProfileReport:
+    """Read the statistics written by :py:data:`PYTHON_PROFILER`.
+
+    Raises
+    ------
+    OSError
+        The statistics could not be read, such as when the script was killed.
+    """
+    try:
+        stats = pstats.Stats(path)
+    except (TypeError, ValueError, EOFError) as e:
+        raise OSError(f"Invalid statistics in {path}: {e}") from e
+
+    functions: list[ProfiledFunction] = []
+    # The statistics are not part of the documented interface of pstats.
+    entries = stats.stats.items()  # type: ignore
+    for (file, line, name), (_, calls, self_time, total_time, _) in entries:
+        # Built-in functions have no file.
+        label = name if file == "~" else f"{name} ({os.path.basename(file)}:{line})"
+        functions.append(
+            {
+                "name": label,
+                "calls": calls,
+                "self_time": self_time,
+                "total_time": total_time,
+            }
+        )
+    return report("cProfile", functions)
+
+
+def read_gprof(output: str) -> ProfileReport:
+    """Read the flat profile printed by ``gprof -b -p``.
+
+    The time spent in each function is sampled, so functions that ran for less than a
+    sample (Usually 10 milliseconds) are reported with no time. The per-call times of
+    the flat profile are rounded, so only the time spent in the function itself is
+    reported.
+    """
+    functions: list[ProfiledFunction] = []
+    in_table = False
+    for line in output.splitlines():
+        if not in_table:
+            in_table = bool(_GPROF_HEADER.match(line))
+            continue
+        if not line.strip():
+            break
+        if match := _GPROF_LINE.match(line):
+            calls = match["calls"]
+            functions.append(
+                {
+                    "name": match["name"].strip(),
+                    "calls": int(calls) if calls else None,
+                    "self_time": float(match["self"]),
+                    "total_time": None,
+                }
+            )
+    return report("gprof", functions)
+
+
+def read_perf_stat(output: str) -> ProfileReport:
+    """Read the counters printed by ``perf stat -x ,``: one line per event, made of its
+    value, its unit and its name. Events the processor cannot count have no value."""
+    counters: list[ProfileCounter] = []
+    for line in output.splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        fields = line.split(",")
+        if len(fields) < 3:
+            continue
+        value, unit, event = fields[:3]
+        try:
+            number: float | None = float(value)
+        except ValueError:
+            # Such as "<not counted>" or "<not supported>".
+            number = None
+        counters.append({"name": event, "value": number, "unit": unit})
+    return report("perf stat", [], counters)
@@ -0,0 +1,347 @@
+"""Module used to discover the executors the server can use.
+
+Executors are declared in three places, the later ones taking precedence over the former
+ones:
+
+- The executors shipped with the server, in :py:mod:`sae302.server.executor`.
+- The ``sae302.executors`` entry points of the installed packages. A package providing a
+  Rust runner would for example declare in its ``pyproject.toml``:
+
+  .. code-block:: toml
+
+      [project.entry-points."sae302.executors"]
+      rust = "sae302_rust:RustExecutor"
+
+- The configuration file of the server, which can also change the settings of any
+  executor:
+
+  .. code-block:: toml
+
+      [executors.c]
+      flags = ["-O2", "-Wall"]
+      timeout = 10
+
+      [executors.rust]
+      target = "sae302_rust:RustExecutor"
+      suffixes = ["rs"]
+      image = "rust:1.82"
+      memory_limit = 268435456
+      output_limit = 1048576
+      spill_output = true
+
+      [executors.java]
+      enabled = false
+
+The configuration file also lists the build profiles clients can choose from, which
+replace the default ones (See :py:data:`DEFAULT_BUILD_PROFILES`). Only these profiles
+are allowed:
+
+.. code-block:: toml
+
+    [profiles]
+    debug = ["-O0", "-g"]
+    release = ["-O2"]
+
+Executor classes are only imported the first time they are needed. Declaring the
+``suffixes`` of an executor in the configuration file allows to pick executors by file
+type without importing the others.
+"""
+
+from __future__ import annotations
+
+import importlib.metadata
+import logging
+import pathlib
+import pkgutil
+import threading
+import tomllib
+import typing
+
+from sae302.server.executor import BaseExecutor, BuildProfile, ExecutorConfig
+
+_log = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "sae302.executors"
+"""The group of the entry points declaring executors."""
+
+BUILTIN_EXECUTORS: dict[str, str] = {
+    "python": "sae302.server.executor:PythonExecutor",
+    "java": "sae302.server.executor:JavaExecutor",
+    "cpp": "sae302.server.executor:CppExecutor",
+    "c": "sae302.server.executor:CExecutor",
+}
+"""The executors shipped with the server, by name."""
+
+DEFAULT_BUILD_PROFILES: dict[str, list[str]] = {
+    "debug": ["-O0", "-g"],
+    "release": ["-O2"],
+    "native": ["-O3", "-march=native"],
+    "sanitize": [
+        "-O1",
+        "-g",
+        "-fno-omit-frame-pointer",
+        "-fsanitize=address,undefined",
+    ],
+}
+"""The build profiles allowed when the configuration file does not list any, with their
+compiler flags."""
+
+ENTRY_KEYS = ("target", "suffixes", "enabled")
+"""Keys of the configuration file that describe where an executor is, not its
+settings."""
+
+
+class ExecutorEntry:
+    """An executor known by the registry, that may not be imported yet.
+
+    Parameters
+    ----------
+    name : str
+        The name of the executor, as used in the configuration file.
+    target : str
+        Where the executor class is, as ``module:class``.
+    """
+
+    def __init__(self, name: str, target: str):
+        self.name = name
+        self.target = target
+        self.suffixes: list[str] | None = None
+        """The suffixes declared in the configuration file. If None, the class is
+        imported to know them."""
+        self.enabled = True
+        self.config = ExecutorConfig()
+        self._executor: type[BaseExecutor] | None = None
+        self._is_broken = False
+
+    def load(self) -> type[BaseExecutor]:
+        """Import the executor class.
+
+        Raises
+        ------
+        ImportError
+            The executor could not be imported, or is not an executor.
+        """
+        if self._executor:
+            return self._executor
+        try:
+            executor = pkgutil.resolve_name(self.target)
+        except (ImportError, AttributeError, ValueError) as e:
+            raise ImportError(f"Could not import executor {self.name}: {e}") from e
+        if not (isinstance(executor, type) and issubclass(executor, BaseExecutor)):
+            raise ImportError(f"{self.target} is not an executor.")
+        _log.debug("Loaded executor %s from %s", self.name, self.target)
+        self._executor = executor
+        return executor
+
+    def create(
+        self, on_event: typing.Callable[[str, typing.Any], None] | None = None
+    ) -> BaseExecutor:
+        """Create an instance of the executor, with its settings."""
+        return self.load()(on_event, self.config)
+
+    def match(
+        self, friendly_name: str | None, supported_suffixes: list[str] | None
+    ) -> bool:
+        """Check whether this executor is the one requested by a client. The class is
+        imported only if the configuration file does not give enough information."""
+        if friendly_name and friendly_name.lower() == self.name.lower():
+            return True
+        if not friendly_name and self.suffixes is not None:
+            return any(suffix in self.suffixes for suffix in supported_suffixes or [])
+
+        executor = self._safe_load()
+        if not executor:
+            return False
+        if friendly_name:
+            return executor.friendly_name == friendly_name
+        return any(
+            suffix in executor.supported_suffixes for suffix in supported_suffixes or []
+        )
+
+    def _safe_load(self) -> type[BaseExecutor] | None:
+        if self._is_broken:
+            return None
+        try:
+            return self.load()
+        except ImportError as e:
+            _log.error("%s", e)
+            self._is_broken = True
+            return None
+
+    def __repr__(self) -> str:
+        return f"<ExecutorEntry name={self.name} target={self.target}>"
+
+
+class ExecutorRegistry:
+    """The executors the server can use, discovered from the built-in executors, the
+    entry points and the configuration file.
+
+    Parameters
+    ----------
+    config_path : pathlib.Path | None
+        The configuration file. Nothing is read if None, or if the file does not exist.
+    artifact_cache : pathlib.Path | None
+        The directory compiled programs are kept in. Programs are not kept if None.
+
+    Raises
+    ------
+    ValueError
+        The configuration file is not valid.
+    """
+
+    def __init__(
+        self,
+        config_path: pathlib.Path | None = None,
+        artifact_cache: pathlib.Path | None = None,
+    ):
+        self._lock = threading.Lock()
+        self.artifact_cache = artifact_cache
+        self.profiles: dict[str, BuildProfile] = {
+            name: BuildProfile(name, flags)
+            for name, flags in DEFAULT_BUILD_PROFILES.items()
+        }
+        self.entries: dict[str, ExecutorEntry] = {
+            name: ExecutorEntry(name, target)
+            for name, target in BUILTIN_EXECUTORS.items()
+        }
+        for entry_point in importlib.metadata.entry_points(group=ENTRY_POINT_GROUP):
+            _log.debug("Found executor %s from entry points.", entry_point.name)
+            self.entries[entry_point.name] = ExecutorEntry(
+                entry_point.name, entry_point.value
+            )
+
+        if config_path and config_path.exists():
+            self.load_config(config_path)
+        for entry in self.entries.values():
+            entry.config.artifact_cache = artifact_cache
+
+    def load_config(self, path: pathlib.Path) -> None:
+        """Apply a configuration file.
+
+        Raises
+        ------
+        ValueError
+            The configuration file is not valid.
+        """
+        try:
+            with path.open("rb") as file:
+                config = tomllib.load(file)
+        except tomllib.TOMLDecodeError as e:
+            raise ValueError(f"Invalid configuration file {path}: {e}") from e
+
+        tables = config.get("executors", {})
+        if not isinstance(tables, dict):
+            raise ValueError("executors must be a table.")
+        for name, table in tables.items():
+            if not isinstance(table, dict):
+                raise ValueError(f"executors.{name} must be a table.")
+            try:
+                self._configure(name, table)
+            except ValueError as e:
+                raise ValueError(f"Invalid settings for executor {name}: {e}") from e
+
+        if "profiles" in config:
+            self.profiles = self._parse_profiles(config["profiles"])
+        _log.debug("Read executors configuration from %s", path)
+
+    @staticmethod
+    def _parse_profiles(table: typing.Any) -> dict[str, BuildProfile]:
+        if not isinstance(table, dict):
+            raise ValueError("profiles must be a table.")
+        profiles: dict[str, BuildProfile] = {}
+        for name, flags in table.items():
+            if not (
+                isinstance(flags, list) and all(isinstance(flag, str) for flag in flags)
+            ):
+                raise ValueError(
+                    f"The flags of profile {name} must be a list of strings."
+                )
+            profiles[name] = BuildProfile(name, flags)
+        return profiles
+
+    def _configure(self, name: str, table: dict[str, typing.Any]) -> None:
+        target = table.get("target")
+        if target is not None and not isinstance(target, str):
+            raise ValueError("target must be a string, such as module:class.")
+        if target:
+            self.entries[name] = ExecutorEntry(name, target)
+        entry = self.entries.get(name)
+        if not entry:
+            raise ValueError("unknown executor, a target must be given.")
+
+        suffixes = table.get("suffixes")
+        if suffixes is not None and not (
+            isinstance(suffixes, list)
+            and all(isinstance(suffix, str) for suffix in suffixes)
+        ):
+            raise ValueError("suffixes must be a list of strings.")
+        entry.suffixes = suffixes
+        entry.enabled = bool(table.get("enabled", True))
+        entry.config = ExecutorConfig.from_table(
+            {key: value for key, value in table.items() if key not in ENTRY_KEYS}
+        )
+        entry.config.artifact_cache = self.artifact_cache
+
+    def find_executor(
+        self,
+        *,
+        friendly_name: str | None = None,
+        supported_suffixes: list[str] | None = None,
+    ) -> ExecutorEntry | None:
+        """Find the executor requested by a client, either by its name or by the suffix
+        of the file to execute.
+
+        Returns
+        -------
+        ExecutorEntry | None
+            The first enabled executor that matches, or None.
+
+        Raises
+        ------
+        RuntimeError
+            Neither ``friendly_name`` nor ``supported_suffixes`` are given.
+        """
+        if not friendly_name and not supported_suffixes:
+            raise RuntimeError("No arguments are given, yet at least one is required.")
+
+        with self._lock:
+            for entry in self.entries.values():
+                if entry.enabled and entry.match(friendly_name, supported_suffixes):
+                    return entry
+        return None
+
+    def find_profile(self, name: str | None) -> BuildProfile | None:
+        """Find a build profile requested by a client.
+
+        Returns
+        -------
+        BuildProfile | None
+            The profile, or None if no profile is requested.
+
+        Raises
+        ------
+        ValueError
+            The profile is not allowed by the server.
+        """
+        if not name:
+            return None
+        if profile := self.profiles.get(name):
+            return profile
+        raise ValueError(
+            f"Unknown build profile: {name}. Must be one of {', '.join(self.profiles)}."
+        )
+
+    def availability(self) -> dict[type[BaseExecutor], bool]:
+        """Import every enabled executor, and check whether it can be used.
+
+        Returns
+        -------
+        dict[type[BaseExecutor], bool]
+            The executors, and whether they are available.
+        """
+        availability: dict[type[BaseExecutor], bool] = {}
+        with self._lock:
+            for entry in self.entries.values():
+                if entry.enabled and (executor := entry._safe_load()):
+                    availability[executor] = entry.create().is_available
+        return availability
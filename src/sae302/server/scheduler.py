@@ -0,0 +1,576 @@
+"""Module used to decide which job the server must run next.
+
+Jobs are first ordered by their priority class. Inside a same class, clients are served
+in a round-robin fashion, so that a client sending a lot of files cannot starve the
+others. Each client also has a limit of jobs it can run at the same time.
+
+Jobs go through two stages, each with its own slots: their file is built, then ran. Once
+built, a job waits in a :py:class:`Handoff` for a free execution slot, so that files are
+compiled while the programs of earlier jobs run.
+"""
+
+from __future__ import annotations
+
+import collections
+import logging
+import queue
+import threading
+import time
+import typing
+import uuid
+
+from sae302.commons import messages
+from sae302.server.session import InteractiveSession
+
+if typing.TYPE_CHECKING:
+    from sae302.server.connection import Connection
+    from sae302.server.executor import (
+        BaseExecutor,
+        BuildProfile,
+        ExecutorConfig,
+        Program,
+    )
+    from sae302.server.journal import JobRecord
+
+_log = logging.getLogger(__name__)
+
+
+type PRIORITY = typing.Literal["interactive", "normal", "batch"]
+
+PRIORITIES: tuple[PRIORITY, ...] = ("interactive", "normal", "batch")
+"""Known priority classes, from the most to the least urgent."""
+DEFAULT_PRIORITY: PRIORITY = "normal"
+BATCH_PRIORITIES: tuple[PRIORITY, ...] = ("normal", "batch")
+"""Priority classes allowed for test suites and benchmarks, which run many times and
+nobody watches run: ``interactive`` is kept for single files."""
+
+
+class Job:
+    """A file that a client has requested to be executed.
+
+    Parameters
+    ----------
+    file_name : str
+        The name of the file to execute.
+    file_content : str
+        The content of the file to execute.
+    chosen_executor : str
+        The friendly name of the executor to use, or ``auto``.
+    build_profile : str | None
+        The build profile requested by the client, if any.
+    priority : PRIORITY
+        The priority class of the job.
+    connection : Connection | None
+        The connection of the client that submitted the job, if it is still known. Jobs
+        replayed from the journal after a restart do not have one.
+    detached : bool
+        If True, the client that submitted the job will not receive its result, unless
+        it subscribes to it.
+    job_id : str | None
+        The identifier of the job. A new one is generated if not given.
+    test_cases : list[messages.TestCase] | None
+        If given, the job is a test suite: the file is ran once for each case, and
+        checked against its expected output.
+    interactive : bool
+        If True, the input and the output of the program are streamed to and from the
+        client while it runs, through :py:attr:`session`.
+    benchmark : messages.BenchmarkSettings | None
+        If given, the job is a benchmark: the file is ran several times, and only the
+        times of the runs are sent back.
+    profiled : bool
+        If True, the program is profiled, and its profile is sent to the subscribers
+        before its logs. See :py:mod:`sae302.server.profiling`.
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        file_content: str,
+        chosen_executor: str,
+        build_profile: str | None = None,
+        priority: PRIORITY = DEFAULT_PRIORITY,
+        *,
+        connection: Connection | None = None,
+        detached: bool = False,
+        job_id: str | None = None,
+        test_cases: list["messages.TestCase"] | None = None,
+        interactive: bool = False,
+        benchmark: "messages.BenchmarkSettings | None" = None,
+        profiled: bool = False,
+    ):
+        self.id = job_id or uuid.uuid4().hex
+        self.file_name = file_name
+        self.file_content = file_content
+        self.chosen_executor = chosen_executor
+        self.build_profile = build_profile
+        self.priority = priority
+        self.connection = connection
+        self.detached = detached
+        self.test_cases = test_cases
+        self.benchmark = benchmark
+        self.profiled = profiled
+        self.session = InteractiveSession(self.id, self.reply) if interactive else None
+        """The streams of the job, if it is interactive."""
+        self.is_over = False
+        self.is_cancelled = False
+        self.pids: set[int] = set()
+        """The processes currently executing the job, as reported by its executor. Test
+        suites may run several at once."""
+        self.queue_position: int | None = None
+        """The last position in the queue sent to the subscribers."""
+        self.submitted_at = time.monotonic()
+        self.started_at: float | None = None
+        """When a build slot was given to the job."""
+        self.built_at: float | None = None
+        """When the job was handed over to the run stage."""
+        self.running_at: float | None = None
+        """When an execution slot was given to the job."""
+
+        self._lock = threading.Lock()
+        self._subscribers: set[Connection] = set()
+        if connection and not detached:
+            self._subscribers.add(connection)
+
+    @classmethod
+    def from_message(
+        cls,
+        message: (
+            messages.FileMessage | messages.TestSuiteMessage | messages.BenchmarkMessage
+        ),
+        connection: Connection,
+        resolve: typing.Callable[[str], str] | None = None,
+    ) -> Job:
+        """Create a job from a received file, test suite or benchmark.
+
+        Parameters
+        ----------
+        resolve : typing.Callable[[str], str] | None
+            Gives the content of a file uploaded beforehand from its hash, for messages
+            giving their files by hash (See
+            :py:meth:`sae302.server.blobs.BlobStore.read`).
+
+        Raises
+        ------
+        ValueError
+            The priority requested by the client, the test suite or the benchmark is not
+            valid, a file is given by an unknown hash, or the job is both interactive or
+            profiled and detached, or both interactive and profiled.
+        """
+        if isinstance(message, messages.TestSuiteMessage):
+            source, test_cases = message.read_suite(resolve)
+            return cls(
+                message.file_name,
+                source,
+                message.chosen_executor,
+                message.build_profile,
+                parse_priority(message.priority, "batch", BATCH_PRIORITIES),
+                connection=connection,
+                test_cases=test_cases,
+            )
+        if isinstance(message, messages.BenchmarkMessage):
+            source, benchmark = message.read_benchmark(resolve)
+            return cls(
+                message.file_name,
+                source,
+                message.chosen_executor,
+                message.build_profile,
+                parse_priority(message.priority, "batch", BATCH_PRIORITIES),
+                connection=connection,
+                benchmark=benchmark,
+            )
+        if message.interactive and message.detached:
+            raise ValueError("An interactive job cannot be detached.")
+        # The profile is only sent to the subscribers, it is not kept in the journal.
+        if message.profiled and message.detached:
+            raise ValueError("A profiled job cannot be detached.")
+        if message.profiled and message.interactive:
+            raise ValueError("An interactive job cannot be profiled.")
+        file_content = message.file_content
+        if message.blob:
+            if not resolve:
+                raise ValueError("Files cannot be given by hash.")
+            file_content = resolve(message.blob)
+        # Someone is waiting in front of an interactive job.
+        priority = message.priority or ("interactive" if message.interactive else None)
+        return cls(
+            message.file_name,
+            file_content,
+            message.chosen_executor,
+            message.build_profile,
+            parse_priority(priority),
+            connection=connection,
+            detached=message.detached,
+            interactive=message.interactive,
+            profiled=message.profiled,
+        )
+
+    @classmethod
+    def from_record(cls, record: "JobRecord") -> Job:
+        """Create a job back from the journal."""
+        return cls(
+            record.file_name,
+            record.content,
+            record.executor,
+            record.build_profile,
+            parse_priority(record.priority),
+            job_id=record.id,
+            detached=record.detached,
+            test_cases=record.test_cases,
+            interactive=record.interactive,
+            benchmark=record.benchmark,
+            profiled=record.profiled,
+        )
+
+    @property
+    def queue_time(self) -> float | None:
+        """The time, in seconds, the job waited for a build slot, then for an execution
+        slot, once it has one."""
+        if self.started_at is None:
+            return None
+        queue_time = self.started_at - self.submitted_at
+        if self.built_at is not None and self.running_at is not None:
+            queue_time += self.running_at - self.built_at
+        return queue_time
+
+    @property
+    def client(self) -> typing.Hashable:
+        """The key used to share slots between clients.
+        Jobs without a client are considered as their own client."""
+        return self.connection or self.id
+
+    def subscribe(self, connection: Connection) -> bool:
+        """Send the result of the job to the given connection too, once the job is over.
+
+        Returns
+        -------
+        bool
+            False if the job is already over, in which case the result must be fetched
+            from the journal.
+        """
+        with self._lock:
+            if self.is_over:
+                return False
+            self._subscribers.add(connection)
+            return True
+
+    def unsubscribe(self, connection: Connection) -> None:
+        with self._lock:
+            self._subscribers.discard(connection)
+
+    @property
+    def is_abandoned(self) -> bool:
+        """Whether nobody is waiting for the result of the job anymore.
+        Detached jobs are never abandoned, as their result may be fetched later."""
+        with self._lock:
+            return not self.detached and not self._subscribers
+
+    def reply(self, message: "messages.PackedMessage") -> None:
+        """Queue a message for every connection that subscribed to this job. It never
+        waits for the clients to read it."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        self._send(message, subscribers)
+
+    def finish(self, message: "messages.PackedMessage") -> None:
+        """Mark the job as over, and send its result to its subscribers."""
+        with self._lock:
+            self.is_over = True
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        self._send(message, subscribers)
+
+    def _send(
+        self, message: "messages.PackedMessage", connections: list[Connection]
+    ) -> None:
+        # Each connection discards the message once it has been written.
+        message.retain(len(connections))
+        try:
+            for connection in connections:
+                if not connection.send(message):
+                    _log.debug("Could not reply to job %s on %s", self.id, connection)
+        finally:
+            message.discard()
+
+    def __repr__(self) -> str:
+        return f"<Job id={self.id} file={self.file_name} priority={self.priority}>"
+
+
+def parse_priority(
+    value: str | None,
+    default: PRIORITY = DEFAULT_PRIORITY,
+    allowed: tuple[PRIORITY, ...] = PRIORITIES,
+) -> PRIORITY:
+    """Validate a priority given by a client.
+
+    Parameters
+    ----------
+    value : str | None
+        The priority, or None if the client did not give one.
+    default : PRIORITY
+        The priority used when the client did not give one.
+    allowed : tuple[PRIORITY, ...]
+        The priority classes the job may use.
+
+    Raises
+    ------
+    ValueError
+        The priority is not a known priority class, or is not allowed for this job.
+    """
+    if not value:
+        return default
+    if value not in allowed:
+        reason = (
+            "Unknown priority" if value not in PRIORITIES else "Priority not allowed"
+        )
+        raise ValueError(f"{reason}: {value}. Must be one of {', '.join(allowed)}.")
+    return typing.cast(PRIORITY, value)
+
+
+class FairScheduler:
+    """A queue of jobs, fairly shared between clients.
+
+    It is used in place of a :py:class:`queue.Queue`: :py:meth:`get` returns the next
+    job to run, and :py:meth:`task_done` must be called once that job is over, so that
+    its client can run another one.
+
+    Parameters
+    ----------
+    per_client_limit : int
+        The maximum number of jobs a single client can run at the same time.
+    """
+
+    def __init__(self, per_client_limit: int = 1):
+        self.per_client_limit = per_client_limit
+        self._condition = threading.Condition()
+        self._waiting: dict[
+            PRIORITY, collections.OrderedDict[typing.Hashable, collections.deque[Job]]
+        ] = {priority: collections.OrderedDict() for priority in PRIORITIES}
+        self._running: collections.Counter[typing.Hashable] = collections.Counter()
+        self._is_shutdown = False
+
+    def put(self, job: Job) -> None:
+        """Add a job at the end of its client's queue.
+
+        Raises
+        ------
+        queue.ShutDown
+            The scheduler has been shut down.
+        """
+        with self._condition:
+            if self._is_shutdown:
+                raise queue.ShutDown
+            clients = self._waiting[job.priority]
+            clients.setdefault(job.client, collections.deque()).append(job)
+            self._condition.notify()
+
+    def get(self) -> Job:
+        """Wait for the next job to run.
+
+        Raises
+        ------
+        queue.ShutDown
+            The scheduler has been shut down.
+        """
+        with self._condition:
+            while True:
+                if self._is_shutdown:
+                    raise queue.ShutDown
+                if job := self._pick():
+                    self._running[job.client] += 1
+                    return job
+                self._condition.wait()
+
+    def task_done(self, job: Job) -> None:
+        """Indicate that a job returned by :py:meth:`get` is over."""
+        with self._condition:
+            self._running[job.client] -= 1
+            if self._running[job.client] <= 0:
+                del self._running[job.client]
+            self._condition.notify_all()
+
+    def remove(self, job: Job) -> bool:
+        """Remove a job that is waiting to be run. Used when a job is cancelled.
+
+        Returns
+        -------
+        bool
+            False if the job was not waiting, because it is already running or over.
+        """
+        with self._condition:
+            clients = self._waiting[job.priority]
+            jobs = clients.get(job.client)
+            if not jobs or job not in jobs:
+                return False
+            jobs.remove(job)
+            if not jobs:
+                del clients[job.client]
+            return True
+
+    def waiting_order(self) -> list[Job]:
+        """List the waiting jobs in the order they are expected to run.
+
+        The order is only an estimation: the per-client limit is not taken into account,
+        as it depends on when the running jobs end.
+        """
+        order: list[Job] = []
+        with self._condition:
+            for priority in PRIORITIES:
+                # Round-robin over the clients, as done by _pick.
+                lines = collections.deque(
+                    collections.deque(jobs) for jobs in self._waiting[priority].values()
+                )
+                while lines:
+                    jobs = lines.popleft()
+                    order.append(jobs.popleft())
+                    if jobs:
+                        lines.append(jobs)
+        return order
+
+    def qsize(self) -> int:
+        """The number of jobs waiting to be run."""
+        with self._condition:
+            return sum(
+                len(jobs)
+                for clients in self._waiting.values()
+                for jobs in clients.values()
+            )
+
+    def shutdown(self) -> None:
+        """Wake up every waiting thread. Any further call will raise
+        :py:exc:`queue.ShutDown`."""
+        with self._condition:
+            self._is_shutdown = True
+            self._condition.notify_all()
+
+    def _pick(self) -> Job | None:
+        for priority in PRIORITIES:
+            clients = self._waiting[priority]
+            for client, jobs in clients.items():
+                if self._running[client] >= self.per_client_limit:
+                    continue
+                job = jobs.popleft()
+                if jobs:
+                    # The client goes back at the end of the line.
+                    clients.move_to_end(client)
+                else:
+                    del clients[client]
+                return job
+        return None
+
+
+class PreparedJob:
+    """A job whose file has been built, waiting to be ran.
+
+    Parameters
+    ----------
+    job : Job
+        The job.
+    executor : type[BaseExecutor]
+        The executor that built the file, and runs it.
+    config : ExecutorConfig
+        The settings of the executor.
+    profile : BuildProfile | None
+        The build profile the file was built with.
+    programs : list[tuple[str, Program]]
+        The programs built, by the name of their file: the file of the job, then the
+        baseline of a benchmark. Empty if the executor cannot prepare programs, in which
+        case the file is built and ran at once.
+    """
+
+    def __init__(
+        self,
+        job: Job,
+        executor: type["BaseExecutor"],
+        config: "ExecutorConfig",
+        profile: "BuildProfile | None",
+        programs: list[tuple[str, "Program"]],
+    ):
+        self.job = job
+        self.executor = executor
+        self.config = config
+        self.profile = profile
+        self.programs = programs
+
+    def release(self) -> None:
+        """Remove the temporary files of the programs."""
+        for _, program in self.programs:
+            program.release()
+
+
+class Handoff:
+    """The jobs waiting for an execution slot once built, handed over from the build
+    stage to the run stage. Jobs are ran by priority class, then in the order they were
+    built.
+
+    Parameters
+    ----------
+    capacity : int
+        The number of jobs that may wait. Once reached, the build stage waits too, so
+        that it does not build files far ahead of the runs.
+    """
+
+    def __init__(self, capacity: int = 1):
+        self.capacity = capacity
+        self._condition = threading.Condition()
+        self._waiting: list[PreparedJob] = []
+        self._is_shutdown = False
+
+    def put(self, prepared: PreparedJob) -> None:
+        """Wait for room, then add a built job.
+
+        Raises
+        ------
+        queue.ShutDown
+            The handoff has been shut down.
+        """
+        with self._condition:
+            while len(self._waiting) >= self.capacity and not self._is_shutdown:
+                self._condition.wait()
+            if self._is_shutdown:
+                raise queue.ShutDown
+            self._waiting.append(prepared)
+            self._condition.notify_all()
+
+    def get(self) -> PreparedJob:
+        """Wait for the next built job to run.
+
+        Raises
+        ------
+        queue.ShutDown
+            The handoff has been shut down.
+        """
+        with self._condition:
+            while not self._waiting and not self._is_shutdown:
+                self._condition.wait()
+            if self._is_shutdown:
+                raise queue.ShutDown
+            prepared = min(
+                self._waiting,
+                key=lambda prepared: PRIORITIES.index(prepared.job.priority),
+            )
+            self._waiting.remove(prepared)
+            self._condition.notify_all()
+            return prepared
+
+    def remove(self, job: Job) -> PreparedJob | None:
+        """Remove a job that is waiting to be ran. Used when a job is cancelled.
+
+        Returns
+        -------
+        PreparedJob | None
+            The built job, or None if it was not waiting.
+        """
+        with self._condition:
+            for prepared in self._waiting:
+                if prepared.job is job:
+                    self._waiting.remove(prepared)
+                    self._condition.notify_all()
+                    return prepared
+        return None
+
+    def shutdown(self) -> None:
+        """Wake up every waiting thread. Any further call will raise
+        :py:exc:`queue.ShutDown`."""
+        with self._condition:
+            self._is_shutdown = True
+            self._condition.notify_all()
@@ -0,0 +1,252 @@
+"""Module used to stream the input and the output of interactive jobs.
+
+The program of an interactive job reads from, and writes to, one end of a socket pair,
+which is handed over to the executor like any other argument. A thread of the server
+bridges the other end with the connection of the client.
+
+Both directions are flow controlled with credits (See
+:py:class:`sae302.commons.messages.CreditMessage`): the server reads the output of the
+program only while the client has room for it, so that a program printing faster than
+the client displays is paused by the socket pair instead of filling the memory of the
+server, and the client never sends more input than the server has room for.
+"""
+
+from __future__ import annotations
+
+import codecs
+import contextlib
+import logging
+import selectors
+import socket
+import threading
+import typing
+
+from sae302.commons import messages
+from sae302.server.capture import DEFAULT_OUTPUT_LIMIT, OutputCapture
+
+_log = logging.getLogger(__name__)
+
+READ_SIZE = 16 * 1024
+"""Largest chunk of output sent at once."""
+
+
+class InteractiveSession:
+    """The streams of an interactive job, between its program and its client.
+
+    Input received before the program starts is kept until it does. The output is also
+    captured, to be recorded as the logs of the job.
+
+    Parameters
+    ----------
+    job_id : str
+        The interactive job.
+    send : typing.Callable[[messages.PackedMessage], None]
+        Sends a message to the client, such as
+        :py:meth:`sae302.server.scheduler.Job.reply`.
+    """
+
+    def __init__(
+        self, job_id: str, send: typing.Callable[[messages.PackedMessage], None]
+    ):
+        self.job_id = job_id
+        self.capture = OutputCapture()
+        """The output of the program, as recorded in the logs."""
+
+        self._send = send
+        self._lock = threading.Lock()
+        self._input = bytearray()
+        """Input received from the client, not yet written to the program."""
+        self._input_eof = False
+        self._output_credit = messages.STREAM_WINDOW
+        self._is_closing = False
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._program_end: socket.socket | None = None
+        self._server_end: socket.socket | None = None
+        self._wakeup_reader: socket.socket | None = None
+        self._wakeup_writer: socket.socket | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self, output_limit: int | None = DEFAULT_OUTPUT_LIMIT) -> socket.socket:
+        """Start bridging the program with the client.
+
+        Parameters
+        ----------
+        output_limit : int | None
+            The number of bytes of output kept at the start and at the end of the logs.
+
+        Returns
+        -------
+        socket.socket
+            The end of the stream given to the program, as its standard input and
+            output. It stays open until :py:meth:`close`, so it may be sent to another
+            process meanwhile.
+        """
+        self.capture = OutputCapture(output_limit)
+        self._program_end, self._server_end = socket.socketpair()
+        self._server_end.setblocking(False)
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(False)
+        self._wakeup_writer.setblocking(False)
+        self._thread = threading.Thread(
+            target=self._bridge, name=f"Session-{self.job_id}", daemon=True
+        )
+        self._thread.start()
+        return self._program_end
+
+    def write(self, data: bytes, eof: bool = False) -> None:
+        """Queue input received from the client.
+
+        Raises
+        ------
+        ValueError
+            The client sent more input than its credit allowed.
+        """
+        with self._lock:
+            if len(self._input) + len(data) > messages.STREAM_WINDOW:
+                raise ValueError("More input was sent than allowed by the credit.")
+            if self._input_eof:
+                raise ValueError("The input has already been closed.")
+            self._input += data
+            self._input_eof = eof
+        self._wake()
+
+    def grant(self, amount: int) -> None:
+        """Let the server send more output, once the client has consumed some."""
+        with self._lock:
+            self._output_credit += amount
+        self._wake()
+
+    def close(self) -> None:
+        """Stop bridging, once the program has exited. The output left in the stream is
+        sent, whatever the credit of the client, as it is bounded by the size of the
+        socket buffers.
+        """
+        with self._lock:
+            self._is_closing = True
+        self._wake()
+        if self._thread:
+            self._thread.join()
+        for sock in (
+            self._program_end,
+            self._server_end,
+            self._wakeup_reader,
+            self._wakeup_writer,
+        ):
+            if sock:
+                sock.close()
+        self.capture.close()
+
+    def __enter__(self) -> InteractiveSession:
+        return self
+
+    def __exit__(self, *exc_info: typing.Any) -> None:
+        self.close()
+
+    def _wake(self) -> None:
+        if self._wakeup_writer:
+            with contextlib.suppress(BlockingIOError, OSError):
+                self._wakeup_writer.send(b"\0")
+
+    def _bridge(self) -> None:
+        assert self._server_end and self._wakeup_reader
+        output_over = False
+        input_over = False
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._wakeup_reader, selectors.EVENT_READ)
+            registered = 0
+            while True:
+                with self._lock:
+                    if self._is_closing:
+                        break
+                    events = 0
+                    if not output_over and self._output_credit > 0:
+                        events |= selectors.EVENT_READ
+                    if not input_over and (self._input or self._input_eof):
+                        events |= selectors.EVENT_WRITE
+                if events != registered:
+                    if not registered:
+                        selector.register(self._server_end, events)
+                    elif not events:
+                        selector.unregister(self._server_end)
+                    else:
+                        selector.modify(self._server_end, events)
+                    registered = events
+
+                for key, mask in selector.select():
+                    if key.fileobj is self._wakeup_reader:
+                        with contextlib.suppress(BlockingIOError):
+                            self._wakeup_reader.recv(1024)
+                        continue
+                    if mask & selectors.EVENT_READ:
+                        output_over = not self._read_output()
+                    if mask & selectors.EVENT_WRITE:
+                        input_over = not self._write_input()
+
+        if not output_over:
+            while self._read_output(limited=False):
+                pass
+        self._send_output(self._decoder.decode(b"", final=True))
+
+    def _read_output(self, limited: bool = True) -> bool:
+        """Send the output of the program that is ready.
+
+        Returns
+        -------
+        bool
+            False once there is no more output.
+        """
+        assert self._server_end
+        with self._lock:
+            size = min(self._output_credit, READ_SIZE) if limited else READ_SIZE
+        try:
+            data = self._server_end.recv(size)
+        except BlockingIOError:
+            return limited
+        except OSError:
+            return False
+        if not data:
+            return False
+        self.capture.feed(data)
+        self._send_output(self._decoder.decode(data))
+        return True
+
+    def _send_output(self, text: str) -> None:
+        if not text:
+            return
+        message = messages.OutputMessage.create_message(self.job_id, text)
+        with self._lock:
+            self._output_credit -= message.payload_length
+        self._send(message)
+
+    def _write_input(self) -> bool:
+        """Write the pending input to the program, and give the client credit for it.
+
+        Returns
+        -------
+        bool
+            False once the input is over.
+        """
+        assert self._server_end
+        with self._lock:
+            pending = bytes(self._input)
+            eof = self._input_eof
+        try:
+            written = self._server_end.send(pending) if pending else 0
+        except BlockingIOError:
+            return True
+        except OSError:
+            # The program does not read its input anymore.
+            _log.debug("Discarding the input of job %s", self.job_id)
+            return False
+        with self._lock:
+            del self._input[:written]
+            done = eof and not self._input
+        if written:
+            self._send(
+                messages.CreditMessage.create_message(self.job_id, "INPUT", written)
+            )
+        if done:
+            with contextlib.suppress(OSError):
+                self._server_end.shutdown(socket.SHUT_WR)
+            return False
+        return True
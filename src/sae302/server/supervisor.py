@@ -0,0 +1,455 @@
+"""Module used to run several server processes on the same port.
+
+Each worker process is a whole server: it binds the port with ``SO_REUSEPORT``, so that
+the kernel spreads the connections between the workers, and it has its own handlers and
+executors. Receiving, parsing and answering messages is then shared between several
+interpreters, instead of competing for a single GIL.
+
+The :py:class:`Supervisor` starts the workers, restarts the ones that crash, and gathers
+the counters they send (See :py:class:`WorkerStats`). The workers share the journal, the
+artifact cache and the blob store, but not their jobs. A client connected to another
+worker than the one running a job follows it through the journal, and asks for it to be
+cancelled through the journal too, which each worker reads every
+:py:data:`sae302.server.__main__.JOURNAL_POLL_INTERVAL` seconds.
+
+Jobs are saved with the index of the worker they were submitted to. Each worker replays
+its own pending jobs whenever it starts, so that the jobs of a worker that crashed are
+replayed once it is restarted. The first worker also replays the jobs of the workers
+that do not exist anymore, when the server is restarted with fewer workers.
+
+The processes of the jobs run in their own process groups, and some are started by the
+execution pools of the workers, so they are not killed with the group of a worker that
+crashed. On Linux, the supervisor is made the subreaper of the workers: the processes
+they leave behind become its children, and it kills them before restarting the worker,
+so that a replayed job does not run next to the copy that was interrupted.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import ctypes
+import json
+import logging
+import os
+import selectors
+import signal
+import sys
+import threading
+import time
+import typing
+
+_log = logging.getLogger(__name__)
+
+STATS_INTERVAL = 5.0
+"""Time, in seconds, between two reports of the counters of a worker."""
+STARTUP_GRACE = 2.0
+"""Time, in seconds, a worker must run for to be considered as started. A worker failing
+sooner the first time it is started is considered as misconfigured, and stops the whole
+server."""
+RESTART_DELAY = 1.0
+"""Time, in seconds, waited before restarting a worker that crashed. It doubles every
+time the worker crashes again right after being restarted."""
+MAX_RESTART_DELAY = 30.0
+COUNTERS = ("connections", "submitted_jobs")
+"""The counters of a worker, that only grow, as opposed to gauges such as the number of
+connected clients."""
+STOP_TIMEOUT = 10.0
+"""Time, in seconds, given to the workers to stop before they are killed."""
+ORPHANS_TIMEOUT = 5.0
+"""Time, in seconds, spent at most killing the processes left behind by a worker."""
+_PR_SET_CHILD_SUBREAPER = 36
+
+type WORKER_TARGET = typing.Callable[[int, int], None]
+"""The function running a worker, called with its index and the pipe its counters are
+sent into (See :py:meth:`WorkerStats.report_to`)."""
+
+
+class WorkerStats:
+    """The counters of a worker, sent to the supervisor every :py:data:`STATS_INTERVAL`
+    seconds.
+
+    The counters (See :py:data:`COUNTERS`) are added to the ones of the previous
+    processes of the worker when it is restarted. Gauges, such as the number of
+    connected clients, are read when sent.
+    """
+
+    def __init__(self):
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def add(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def report_to(self, fd: int, gauges: typing.Callable[[], dict[str, int]]) -> None:
+        """Send the counters and the gauges into a pipe, in the background, until it is
+        closed.
+
+        Parameters
+        ----------
+        fd : int
+            The pipe, read by the supervisor.
+        gauges : typing.Callable[[], dict[str, int]]
+            Called to read the gauges before sending them.
+        """
+        threading.Thread(target=self._report, args=(fd, gauges), daemon=True).start()
+
+    def send(self, fd: int, gauges: typing.Callable[[], dict[str, int]]) -> bool:
+        """Send the counters and the gauges into a pipe once, such as right before
+        stopping.
+
+        Returns
+        -------
+        bool
+            False if the supervisor is gone.
+        """
+        with self._lock:
+            values = dict(self.counters)
+        values.update(gauges())
+        try:
+            os.write(fd, json.dumps(values).encode() + b"\n")
+        except OSError:
+            return False
+        return True
+
+    def _report(self, fd: int, gauges: typing.Callable[[], dict[str, int]]) -> None:
+        while self.send(fd, gauges):
+            time.sleep(STATS_INTERVAL)
+
+
+class _Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.pid: int | None = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.restart_delay = RESTART_DELAY
+        self.restart_at: float | None = None
+        self.stats_fd: int | None = None
+        self.received = b""
+        self.values: dict[str, int] = {}
+        """The last counters and gauges sent by the worker."""
+        self.retired: dict[str, int] = {}
+        """The counters of the previous processes of the worker."""
+
+
+class Supervisor:
+    """Runs several workers, and restarts the ones that crash.
+
+    Parameters
+    ----------
+    workers : int
+        The number of worker processes.
+    target : WORKER_TARGET
+        The function running a worker, in the worker process. It must block until the
+        worker is stopped, which happens with a :py:exc:`KeyboardInterrupt`.
+    """
+
+    def __init__(self, workers: int, target: WORKER_TARGET):
+        self.target = target
+        self.workers = [_Worker(index) for index in range(workers)]
+        self._selector = selectors.DefaultSelector()
+        self._reported: dict[str, int] = {}
+
+    def run(self) -> int:
+        """Start the workers, and supervise them until the server is stopped, by
+        ``SIGINT`` or ``SIGTERM``.
+
+        Returns
+        -------
+        int
+            The exit code of the server: 1 if a worker failed to start.
+        """
+        signal.signal(signal.SIGTERM, _interrupt)
+        if not _become_subreaper():
+            _log.warning(
+                "The processes of the workers that crash will not be killed on this"
+                " system."
+            )
+        exit_code = 0
+        try:
+            for worker in self.workers:
+                self._start(worker)
+            last_report = time.monotonic()
+            while True:
+                for key, _ in self._selector.select(timeout=RESTART_DELAY / 2):
+                    self._receive(typing.cast(_Worker, key.data))
+                if not self._reap():
+                    exit_code = 1
+                    break
+                now = time.monotonic()
+                for worker in self.workers:
+                    if worker.restart_at is not None and now >= worker.restart_at:
+                        self._start(worker)
+                if now - last_report >= STATS_INTERVAL:
+                    self._report_stats()
+                    last_report = now
+        except KeyboardInterrupt:
+            _log.debug("Received KeyboardInterrupted!")
+        finally:
+            self._stop()
+            self._report_stats(force=True)
+            self._selector.close()
+        return exit_code
+
+    def _start(self, worker: _Worker) -> None:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self._run_worker(worker, write_fd)
+        os.close(write_fd)
+
+        worker.pid = pid
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+        worker.stats_fd = read_fd
+        worker.received = b""
+        worker.values = {}
+        self._selector.register(read_fd, selectors.EVENT_READ, worker)
+        _log.info("Started worker %s (PID %s).", worker.index, pid)
+
+    def _run_worker(self, worker: _Worker, stats_fd: int) -> typing.NoReturn:
+        """Run a worker, in the forked process, then exit it."""
+        code = 0
+        try:
+            for other in self.workers:
+                if other.stats_fd is not None:
+                    os.close(other.stats_fd)
+            self._selector.close()
+            # Put the worker and the processes it starts in their own group, so that
+            # they can be killed together if it crashes.
+            os.setpgid(0, 0)
+            # The supervisor decides when the workers stop.
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, _interrupt)
+            self.target(worker.index, stats_fd)
+        except KeyboardInterrupt:
+            pass
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException as e:
+            _log.exception(e)
+            code = 1
+        finally:
+            # os._exit skips the exit handlers, such as the one of multiprocessing
+            # releasing the semaphores of the execution pools.
+            with contextlib.suppress(Exception):
+                atexit._run_exitfuncs()
+            logging.shutdown()
+            with contextlib.suppress(Exception):
+                sys.stdout.flush()
+                sys.stderr.flush()
+            os._exit(code)
+
+    def _receive(self, worker: _Worker) -> None:
+        assert worker.stats_fd is not None
+        try:
+            data = os.read(worker.stats_fd, 4096)
+        except OSError:
+            data = b""
+        if not data:
+            self._selector.unregister(worker.stats_fd)
+            os.close(worker.stats_fd)
+            worker.stats_fd = None
+            return
+        *lines, worker.received = (worker.received + data).split(b"\n")
+        for line in lines:
+            with contextlib.suppress(ValueError):
+                worker.values = json.loads(line)
+
+    def _reap(self) -> bool:
+        """Handle the workers that exited.
+
+        Returns
+        -------
+        bool
+            False if a worker failed to start, in which case the server must stop.
+        """
+        for worker in self.workers:
+            if worker.pid is None:
+                continue
+            pid, status = os.waitpid(worker.pid, os.WNOHANG)
+            if not pid:
+                continue
+
+            worker.pid = None
+            # Kill the processes the worker started, such as its execution pools, and
+            # the ones they started, such as the jobs, before they are replayed.
+            with contextlib.suppress(ProcessLookupError, PermissionError):
+                os.killpg(pid, signal.SIGKILL)
+            self._kill_orphans()
+            # Read the last counters sent by the worker.
+            while worker.stats_fd is not None:
+                self._receive(worker)
+            for name in COUNTERS:
+                worker.retired[name] = worker.retired.get(name, 0) + worker.values.get(
+                    name, 0
+                )
+            worker.values = {}
+
+            description = _describe_status(status)
+            lifetime = time.monotonic() - worker.started_at
+            if lifetime < STARTUP_GRACE and not worker.restarts:
+                _log.critical(
+                    "Worker %s could not start: %s.", worker.index, description
+                )
+                return False
+            if lifetime < STARTUP_GRACE:
+                worker.restart_delay = min(worker.restart_delay * 2, MAX_RESTART_DELAY)
+            else:
+                worker.restart_delay = RESTART_DELAY
+            worker.restarts += 1
+            worker.restart_at = time.monotonic() + worker.restart_delay
+            _log.error(
+                "Worker %s %s, restarting it in %.0f s.",
+                worker.index,
+                description,
+                worker.restart_delay,
+            )
+        self._reap_orphans()
+        return True
+
+    def _orphans(self) -> list[int]:
+        """List the children of the supervisor that are not workers: the processes left
+        behind by the workers that exited, as the supervisor is their subreaper."""
+        workers = {worker.pid for worker in self.workers}
+        orphans = []
+        try:
+            entries = list(os.scandir("/proc"))
+        except OSError:
+            return []
+        for entry in entries:
+            if not entry.name.isdigit() or int(entry.name) in workers:
+                continue
+            try:
+                with open(f"{entry.path}/stat", "rb") as file:
+                    stat = file.read()
+            except OSError:
+                continue
+            # The name of the process, in parentheses, may contain spaces. It is
+            # followed by the state of the process, then its parent.
+            if int(stat[stat.rindex(b")") + 2 :].split()[1]) == os.getpid():
+                orphans.append(int(entry.name))
+        return orphans
+
+    def _kill_orphans(self) -> None:
+        """Kill the processes left behind by the workers, with their process groups. The
+        children of a killed process become orphans in turn, so this is repeated until
+        there are none left."""
+        deadline = time.monotonic() + ORPHANS_TIMEOUT
+        while orphans := self._orphans():
+            if time.monotonic() > deadline:
+                _log.error("Could not kill the processes %s.", orphans)
+                return
+            for pid in orphans:
+                with contextlib.suppress(ProcessLookupError, PermissionError):
+                    group = os.getpgid(pid)
+                    if group == os.getpgrp():
+                        os.kill(pid, signal.SIGKILL)
+                    else:
+                        os.killpg(group, signal.SIGKILL)
+                with contextlib.suppress(ChildProcessError):
+                    os.waitpid(pid, os.WNOHANG)
+            time.sleep(0.01)
+
+    def _reap_orphans(self) -> None:
+        """Wait for the processes left behind by the workers that exited on their own,
+        such as daemons started by the programs, so that they do not stay zombies."""
+        workers = {worker.pid for worker in self.workers}
+        while True:
+            try:
+                info = os.waitid(os.P_ALL, 0, os.WEXITED | os.WNOHANG | os.WNOWAIT)
+            except ChildProcessError:
+                return
+            if info is None or info.si_pid in workers:
+                return
+            os.waitpid(info.si_pid, 0)
+
+    def _report_stats(self, force: bool = False) -> None:
+        """Log the counters of every worker, added together, when they changed."""
+        totals = {
+            "workers": sum(worker.pid is not None for worker in self.workers),
+            "restarts": sum(worker.restarts for worker in self.workers),
+        }
+        for worker in self.workers:
+            for counters in (worker.values, worker.retired):
+                for name, value in counters.items():
+                    totals[name] = totals.get(name, 0) + value
+        if totals == self._reported and not force:
+            return
+        self._reported = totals
+        _log.info(
+            "%s worker(s) running, %s restart(s), %s client(s) connected (%s since"
+            " start), %s job(s) in progress (%s submitted since start).",
+            totals["workers"],
+            totals["restarts"],
+            totals.get("clients", 0),
+            totals.get("connections", 0),
+            totals.get("active_jobs", 0),
+            totals.get("submitted_jobs", 0),
+        )
+
+    def _stop(self) -> None:
+        """Ask the workers to stop, and wait for them, killing the ones that take too
+        long."""
+        running = {
+            worker.pid: worker for worker in self.workers if worker.pid is not None
+        }
+        for pid in running:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + STOP_TIMEOUT
+        while running:
+            for pid in list(running):
+                with contextlib.suppress(ChildProcessError):
+                    if not os.waitpid(pid, os.WNOHANG)[0]:
+                        continue
+                worker = running.pop(pid)
+                worker.pid = None
+                # Read the last counters sent by the worker.
+                while worker.stats_fd is not None:
+                    self._receive(worker)
+            if running and time.monotonic() > deadline:
+                _log.warning(
+                    "Killing %s worker(s) that did not stop in time.", len(running)
+                )
+                for pid in running:
+                    with contextlib.suppress(ProcessLookupError, PermissionError):
+                        os.killpg(pid, signal.SIGKILL)
+                deadline = float("inf")
+            time.sleep(0.1)
+        self._kill_orphans()
+
+
+def _interrupt(signum: int, frame: typing.Any) -> None:
+    """Stop the process like ``SIGINT`` does, once: the cleanup that follows is not
+    interrupted."""
+    signal.signal(signum, signal.SIG_IGN)
+    raise KeyboardInterrupt
+
+
+def _become_subreaper() -> bool:
+    """Make the processes left behind by the children of this process become its
+    children, rather than the ones of ``init``. Only Linux supports it.
+
+    Returns
+    -------
+    bool
+        False if the system does not support it.
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc.prctl(_PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def _describe_status(status: int) -> str:
+    if os.WIFSIGNALED(status):
+        return f"was killed by signal {signal.Signals(os.WTERMSIG(status)).name}"
+    return f"exited with code {os.waitstatus_to_exitcode(status)}"
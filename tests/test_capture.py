@@ -0,0 +1,48 @@
+from sae302.server.capture import OutputCapture
+
+
+def feed(capture: OutputCapture, data: bytes, chunk: int) -> None:
+    for start in range(0, len(data), chunk):
+        capture.feed(data[start : start + chunk])
+
+
+def test_short_output_is_kept():
+    capture = OutputCapture(limit=8)
+    feed(capture, b"0123456789abcdef", 3)
+
+    assert capture.elided == 0
+    assert capture.text() == "0123456789abcdef"
+
+
+def test_long_output_keeps_head_and_tail():
+    data = bytes(range(48, 48 + 40))
+    for chunk in (1, 3, 7, 40):
+        capture = OutputCapture(limit=8)
+        feed(capture, data, chunk)
+
+        assert capture.total == 40
+        assert capture.elided == 24
+        assert capture.text() == (
+            f"{data[:8].decode()}\n[... 24 bytes elided ...]\n{data[-8:].decode()}"
+        )
+
+
+def test_no_limit():
+    capture = OutputCapture(limit=None)
+    feed(capture, b"x" * 1000, 64)
+
+    assert capture.elided == 0
+    assert capture.text() == "x" * 1000
+
+
+def test_spill_keeps_whole_output():
+    data = bytes(range(48, 48 + 40))
+    capture = OutputCapture(limit=8, spill=True)
+    feed(capture, data, 5)
+    capture.close()
+
+    assert capture.spill_path is not None
+    try:
+        assert capture.spill_path.read_bytes() == data
+    finally:
+        capture.spill_path.unlink()
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from sae302.commons import delta
+
+
+def round_trip(base: str, text: str) -> list[delta.Instruction]:
+    signature = delta.signature(base, "blob")
+    instructions = delta.diff(text, signature)
+    assert delta.apply(base, signature["block_size"], instructions) == text
+    return instructions
+
+
+def test_unchanged_file_is_copied():
+    base = "".join(f"line {i}\n" for i in range(200))
+    instructions = round_trip(base, base)
+
+    # Every full block is copied at once, only the last partial one is sent.
+    assert isinstance(instructions[0], list)
+    assert all(isinstance(instruction, str) for instruction in instructions[1:])
+    assert sum(len(i) for i in instructions if isinstance(i, str)) < 64
+
+
+def test_edited_file_round_trips():
+    generator = random.Random(302)
+    base = "".join(f"print({generator.randrange(1000)}) # é€😀\n" for _ in range(500))
+    text = base
+    for _ in range(10):
+        position = generator.randrange(len(text))
+        removed = generator.randrange(20)
+        text = text[:position] + "inserted\n" + text[position + removed :]
+
+    instructions = round_trip(base, text)
+    sent = sum(len(i) for i in instructions if isinstance(i, str))
+    assert sent < len(text) / 2
+
+
+@pytest.mark.parametrize(
+    ("base", "text"), [("", "new"), ("old", ""), ("", ""), ("short", "shorter")]
+)
+def test_small_files_round_trip(base: str, text: str):
+    round_trip(base, text)
+
+
+@pytest.mark.parametrize(
+    "instructions", ["text", [[0, 0]], [[5, 1]], [[-1, 1]], [[0, True]], [1]]
+)
+def test_invalid_instructions(instructions):
+    with pytest.raises(ValueError):
+        delta.apply("x" * 100, 64, instructions)
@@ -0,0 +1,40 @@
+import json
+import resource
+
+from sae302.server.executor import PythonExecutor, RunReturn
+
+
+def usage(maxrss: int, utime: float = 1.0) -> resource.struct_rusage:
+    return resource.struct_rusage([utime, 0.0, maxrss, *[0] * 13])
+
+
+def test_measured_peak_is_kept(tmp_path):
+    startup = tmp_path / "usage"
+    startup.write_text(f"{json.dumps(list(usage(5000, 0.25)))}\n1234")
+    result = RunReturn(0, "", usage=usage(5000), max_rss=5000, max_rss_upper_bound=True)
+
+    PythonExecutor.exclude_startup(result, startup)
+
+    assert result.max_rss == 1234
+    assert not result.max_rss_upper_bound
+    assert result.usage is not None and result.usage.ru_utime == 0.75
+    assert "max_rss_upper_bound" not in result.stats()
+
+
+def test_unmeasured_peak_is_an_upper_bound(tmp_path):
+    startup = tmp_path / "usage"
+    startup.write_text(json.dumps(list(usage(5000))))
+    result = RunReturn(0, "", usage=usage(5000), max_rss=5000)
+
+    PythonExecutor.exclude_startup(result, startup)
+
+    assert result.stats()["max_rss"] == 5000
+    assert result.stats()["max_rss_upper_bound"]
+
+
+def test_missing_startup_usage(tmp_path):
+    result = RunReturn(0, "", usage=usage(5000), max_rss=5000)
+
+    PythonExecutor.exclude_startup(result, tmp_path / "missing")
+
+    assert result.usage is None and result.max_rss is None
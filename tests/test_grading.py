@@ -0,0 +1,52 @@
+from sae302.server import grading
+from sae302.server.executor import RunReturn
+
+
+def test_normalize_ignores_trailing_spaces_and_blank_lines():
+    assert grading.normalize("a  \nb\t\n\n  \n") == ["a", "b"]
+    assert grading.normalize("\na\r\n") == ["", "a"]
+    assert grading.normalize("") == []
+
+
+def test_diff_is_empty_for_equal_outputs():
+    assert grading.diff("1\n2\n", "1  \n2\n\n") == ""
+    assert grading.diff("1\n2", "1\n3") != ""
+
+
+def test_long_diffs_are_elided():
+    expected = "\n".join(str(i) for i in range(100))
+    lines = grading.diff(expected, "").splitlines()
+
+    assert len(lines) == grading.MAX_DIFF_LINES + 1
+    assert lines[-1].startswith("... ")
+
+
+def test_grade():
+    case = {"name": "sum", "stdin": "1 2", "expected": "3\n"}
+
+    passed = grading.grade(case, RunReturn(0, "3  \n\n", duration=0.1))
+    assert passed["status"] == "PASSED"
+    assert "diff" not in passed
+
+    failed = grading.grade(case, RunReturn(0, "4\n"))
+    assert failed["status"] == "FAILED"
+    assert "-3" in failed["diff"] and "+4" in failed["diff"]
+
+    timed_out = grading.grade(case, RunReturn(0, "", timed_out=True))
+    assert timed_out["status"] == "TIMEOUT"
+
+
+def test_grade_checks_exit_code():
+    case = {"name": "code", "stdin": "", "expected": "3", "code": 2}
+
+    assert grading.grade(case, RunReturn(2, "3"))["status"] == "PASSED"
+    failed = grading.grade(case, RunReturn(0, "3"))
+    assert failed["status"] == "FAILED"
+    assert failed["diff"] == "Exit code 0, expected 2."
+
+
+def test_error():
+    result = grading.error({"name": "case", "stdin": "", "expected": ""}, "Boom")
+
+    assert result["status"] == "ERROR"
+    assert result["diff"] == "Boom"
@@ -0,0 +1,39 @@
+from sae302.commons import messages
+from sae302.server import __main__ as server
+from sae302.server.journal import JobJournal, JobState
+from sae302.server.scheduler import FairScheduler, Job
+
+
+class FakeConnection:
+    def __init__(self):
+        self.sent: list[messages.PackedMessage] = []
+
+    def send(self, message: messages.PackedMessage) -> bool:
+        self.sent.append(message)
+        return True
+
+
+def test_unexpected_build_error_fails_the_job(tmp_path, monkeypatch):
+    journal = JobJournal(tmp_path / "journal.sqlite3")
+    connection = FakeConnection()
+    job = Job("a.py", "print(1)", "auto", connection=connection)
+    job.subscribe(connection)
+    journal.record_submission(job.id, job.file_name, "auto", "normal", "print(1)")
+
+    handler = server.BuildHandler(journal, None, None)
+    handler.queue = FairScheduler()
+    handler.queue.put(job)
+
+    def build(job: Job):
+        # Stop the handler once this job is handled.
+        handler.queue.shutdown()
+        raise RuntimeError("Boom")
+
+    monkeypatch.setattr(handler, "build", build)
+    handler.run()
+
+    record = journal.get(job.id)
+    assert record is not None and record.state == JobState.FAILED
+    assert "Boom" in record.output
+    assert job.is_over
+    assert len(connection.sent) == 1
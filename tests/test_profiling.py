@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+from sae302.server import profiling
+
+SCRIPT = """\
+import dataclasses
+import json
+
+
+def busy(n):
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+
+print(json.dumps(busy(200_000)))
+"""
+
+
+def test_report_is_about_the_script(tmp_path):
+    script = tmp_path / "hot.py"
+    script.write_text(SCRIPT)
+    statistics = tmp_path / "hot.prof"
+    subprocess.run(
+        [sys.executable, "-c", profiling.PYTHON_PROFILER, statistics, script],
+        check=True,
+        capture_output=True,
+    )
+
+    names = [
+        function["name"]
+        for function in profiling.read_pstats(str(statistics))["functions"]
+    ]
+
+    assert names[0] == "busy (hot.py:5)"
+    assert "<module> (hot.py:1)" in names
+    # Neither the import system, runpy nor json.
+    assert all("hot.py" in name or name.startswith("<built-in") for name in names)
@@ -0,0 +1,71 @@
+import threading
+import typing
+
+from sae302.server.scheduler import FairScheduler, Job
+
+
+def make_job(connection: typing.Any, name: str, priority="normal") -> Job:
+    return Job(name, "", "auto", priority=priority, connection=connection)
+
+
+def test_clients_are_served_round_robin():
+    scheduler = FairScheduler(per_client_limit=3)
+    first, second = object(), object()
+    for name in ("a1", "a2", "a3"):
+        scheduler.put(make_job(first, name))
+    for name in ("b1", "b2"):
+        scheduler.put(make_job(second, name))
+
+    expected = ["a1", "b1", "a2", "b2", "a3"]
+    assert [job.file_name for job in scheduler.waiting_order()] == expected
+    assert [scheduler.get().file_name for _ in range(5)] == expected
+    assert scheduler.qsize() == 0
+
+
+def test_higher_priorities_go_first():
+    scheduler = FairScheduler(per_client_limit=3)
+    client = object()
+    scheduler.put(make_job(client, "batch", "batch"))
+    scheduler.put(make_job(client, "normal"))
+    scheduler.put(make_job(client, "interactive", "interactive"))
+
+    assert [scheduler.get().file_name for _ in range(3)] == [
+        "interactive",
+        "normal",
+        "batch",
+    ]
+
+
+def test_per_client_limit():
+    scheduler = FairScheduler(per_client_limit=1)
+    first, second = object(), object()
+    scheduler.put(make_job(first, "a1"))
+    scheduler.put(make_job(first, "a2"))
+    scheduler.put(make_job(second, "b1"))
+
+    running = scheduler.get()
+    assert running.file_name == "a1"
+    # The first client already runs a job: the other one goes first.
+    assert scheduler.get().file_name == "b1"
+
+    picked: list[Job] = []
+    waiter = threading.Thread(target=lambda: picked.append(scheduler.get()))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive() and not picked
+
+    scheduler.task_done(running)
+    waiter.join(5)
+    assert [job.file_name for job in picked] == ["a2"]
+
+
+def test_removed_jobs_are_not_run():
+    scheduler = FairScheduler()
+    client = object()
+    removed = make_job(client, "removed")
+    scheduler.put(removed)
+    scheduler.put(make_job(client, "kept"))
+
+    assert scheduler.remove(removed)
+    assert not scheduler.remove(removed)
+    assert scheduler.get().file_name == "kept"
@@ -0,0 +1,124 @@
+import os
+import pathlib
+import re
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from sae302.commons import messages
+from sae302.server.supervisor import STARTUP_GRACE
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="Needs SO_REUSEPORT and /proc."
+)
+
+BUSY_SCRIPT = """\
+import os
+
+with open({pids!r}, "a") as file:
+    file.write(f"{{os.getpid()}}\\n")
+while True:
+    pass
+"""
+
+
+def wait_until(predicate, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while not (result := predicate()):
+        if time.monotonic() > deadline:
+            raise TimeoutError
+        time.sleep(0.05)
+    return result
+
+
+def is_running(pid: int) -> bool:
+    try:
+        stat = pathlib.Path(f"/proc/{pid}/stat").read_text()
+    except OSError:
+        return False
+    return stat[stat.rindex(")") + 2] != "Z"
+
+
+def first_job_id(client: socket.socket) -> str:
+    buffer = messages.MessageBuffer()
+    while not buffer.is_complete:
+        buffer.push(client.recv(65536))
+    message = buffer.get_message(client)
+    assert isinstance(message, messages.JobMessage)
+    return message.job_id
+
+
+def test_crashed_worker_job_runs_once(tmp_path):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    pids = tmp_path / "pids"
+    script = tmp_path / "busy.py"
+    script.write_text(BUSY_SCRIPT.format(pids=str(pids)))
+    log = tmp_path / "server.log"
+    journal = tmp_path / "journal.sqlite3"
+    src = pathlib.Path(__file__).parents[1] / "src"
+    with log.open("w") as output:
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "sae302.server",
+                str(port),
+                "--workers",
+                "2",
+                "--journal",
+                str(journal),
+                "--executors",
+                str(tmp_path / "executors.toml"),
+                "--artifact-cache",
+                str(tmp_path / "artifacts"),
+                "--blob-store",
+                str(tmp_path / "blobs"),
+            ],
+            env={**os.environ, "PYTHONPATH": str(src)},
+            stdin=subprocess.DEVNULL,
+            stdout=output,
+            stderr=output,
+        )
+    try:
+        client = wait_until(lambda: _connect(port))
+        with client:
+            messages.FileMessage.create_message(script, "python", detached=True).send(
+                client
+            )
+            job_id = first_job_id(client)
+        wait_until(lambda: pids.exists() and pids.read_text())
+        with sqlite3.connect(journal) as database:
+            (worker,) = database.execute(
+                "SELECT worker FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+
+        # A worker crashing sooner is considered as misconfigured.
+        time.sleep(STARTUP_GRACE)
+        started = re.findall(r"Started worker (\d) \(PID (\d+)\)", log.read_text())
+        os.kill(int(dict(started)[str(worker)]), signal.SIGKILL)
+        # The job is replayed once the worker is restarted.
+        wait_until(lambda: len(pids.read_text().split()) == 2)
+        first, replayed = map(int, pids.read_text().split())
+        assert not is_running(first)
+        assert is_running(replayed)
+
+        with wait_until(lambda: _connect(port)) as client:
+            messages.CancelMessage.create_message(job_id).send(client)
+            wait_until(lambda: not is_running(replayed))
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait(15)
+
+
+def _connect(port: int) -> socket.socket | None:
+    try:
+        return socket.create_connection(("127.0.0.1", port))
+    except OSError:
+        return None